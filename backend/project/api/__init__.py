@@ -0,0 +1,2 @@
+# api/__init__.py
+"""FastAPI application (api/main.py) and its routers (api/endpoints/)."""
@@ -1,6 +1,4 @@
 # api/endpoints/__init__.py
-from .batches import router as batches
-from .settings import router as settings
-from .processing import router as processing   # ← this line was missing
+from . import batches, settings, processing, search, export
 
-__all__ = ["batches", "settings", "processing"]
\ No newline at end of file
+__all__ = ["batches", "settings", "processing", "search", "export"]
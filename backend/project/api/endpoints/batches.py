@@ -4,54 +4,180 @@ Batch management endpoints.
 List, view, delete, and reprocess document batches.
 """
 
+import base64
+import json
+import time
 from datetime import datetime, timedelta, timezone
-from typing import List, Optional
+from typing import Dict, Optional, Tuple
 
 from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy import and_, func, or_, select
 from sqlalchemy.orm import Session
 
-from core.database import get_db, Batch, ProcessingStatus
-from core.models import BatchResponse
-from watcher.processor import ProcessManager  # We'll use this to trigger reprocessing
+from core import search
+from core.database import get_db, Batch, Document, Page, Field, ProcessingStatus
+from core.models import (
+    BatchListResponse,
+    BatchResponse,
+    BatchSummaryResponse,
+    BatchTimingsResponse,
+    PageTimings,
+)
+from core.queue import job_queue  # Reprocessing is picked up by any running worker
 
 router = APIRouter(prefix="/batches", tags=["Batches"])
 
-# Global process manager instance (or inject via dependency later)
-process_manager = ProcessManager()
+
+def _batch_summary_query():
+    """
+    Batch columns plus per-batch aggregates as correlated subqueries.
+
+    Runs as a single SQL statement and never touches the documents/pages/
+    fields relationships, so no page text is loaded.
+    """
+    document_count = (
+        select(func.count(Document.id))
+        .where(Document.batch_id == Batch.id)
+        .correlate(Batch)
+        .scalar_subquery()
+    )
+    page_count = (
+        select(func.count(Page.id))
+        .join(Document, Page.document_id == Document.id)
+        .where(Document.batch_id == Batch.id)
+        .correlate(Batch)
+        .scalar_subquery()
+    )
+    avg_confidence = (
+        select(func.avg(Page.ocr_confidence))
+        .join(Document, Page.document_id == Document.id)
+        .where(Document.batch_id == Batch.id)
+        .correlate(Batch)
+        .scalar_subquery()
+    )
+    field_count = (
+        select(func.count(Field.id))
+        .join(Page, Field.page_id == Page.id)
+        .join(Document, Page.document_id == Document.id)
+        .where(Document.batch_id == Batch.id)
+        .correlate(Batch)
+        .scalar_subquery()
+    )
+    return select(
+        Batch.id,
+        Batch.filename,
+        Batch.original_path,
+        Batch.file_size,
+        Batch.status,
+        Batch.created_at,
+        Batch.processed_at,
+        Batch.processing_time,
+        Batch.error_message,
+        document_count.label("document_count"),
+        page_count.label("page_count"),
+        field_count.label("field_count"),
+        avg_confidence.label("avg_confidence"),
+    )
+
+
+# Cached totals for the list endpoint: (status, days) -> (expires_at, total)
+TOTAL_CACHE_TTL = 30.0  # seconds
+_total_cache: Dict[Tuple[Optional[str], int], Tuple[float, int]] = {}
+
+
+def encode_cursor(created_at: datetime, batch_id: int) -> str:
+    """Opaque cursor pointing just after (created_at, id)."""
+    raw = json.dumps([created_at.isoformat(), batch_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """Inverse of encode_cursor; raises ValueError on a malformed cursor."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, batch_id = json.loads(base64.urlsafe_b64decode(padded))
+        return datetime.fromisoformat(created_at), int(batch_id)
+    except Exception as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
+
+def _count_batches(db: Session, status: Optional[ProcessingStatus], days: int, since_date: datetime) -> int:
+    """COUNT(*) for the list filters, cached for TOTAL_CACHE_TTL seconds."""
+    key = (status.value if status else None, days)
+    now = time.monotonic()
+    cached = _total_cache.get(key)
+    if cached and cached[0] > now:
+        return cached[1]
+
+    query = select(func.count(Batch.id)).where(Batch.created_at >= since_date)
+    if status:
+        query = query.where(Batch.status == status)
+    total = db.scalar(query) or 0
+    _total_cache[key] = (now + TOTAL_CACHE_TTL, total)
+    return total
 
 
 @router.get(
     "/",
-    response_model=List[BatchResponse],
+    response_model=BatchListResponse,
     summary="List batches",
-    description="Retrieve batches with optional status and date filtering. Defaults to last 7 days."
+    description=(
+        "Retrieve batch summaries (columns + page/field counts) with optional status "
+        "and date filtering, newest first. Defaults to last 7 days. Paginate by passing "
+        "`next_cursor` back as `cursor`. Use GET /batches/{id} for full details."
+    )
 )
 async def get_batches(
     db: Session = Depends(get_db),
     status: Optional[ProcessingStatus] = None,
     limit: int = Query(100, ge=1, le=1000, description="Max items per page"),
-    offset: int = Query(0, ge=0, description="Pagination offset"),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
     days: int = Query(7, ge=1, le=365, description="Filter: show batches from last N days"),
+    include_total: bool = Query(False, description="Also return the (cached) total count"),
 ):
     """
-    Get paginated list of batches.
+    Get a page of batch summaries using keyset pagination over (created_at, id).
+
+    Unlike OFFSET, the cost of a page does not grow with how deep into the
+    history it is: each page is an index range scan starting at the cursor.
     """
-    query = db.query(Batch)
+    query = _batch_summary_query()
 
     if status:
-        query = query.filter(Batch.status == status)
+        query = query.where(Batch.status == status)
 
     since_date = datetime.now(timezone.utc) - timedelta(days=days)
-    query = query.filter(Batch.created_at >= since_date)
+    query = query.where(Batch.created_at >= since_date)
 
-    batches = (
-        query.order_by(Batch.created_at.desc())
-        .offset(offset)
-        .limit(limit)
-        .all()
-    )
+    if cursor:
+        try:
+            cursor_created_at, cursor_id = decode_cursor(cursor)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        query = query.where(
+            or_(
+                Batch.created_at < cursor_created_at,
+                and_(Batch.created_at == cursor_created_at, Batch.id < cursor_id),
+            )
+        )
 
-    return batches
+    # Fetch one extra row to know whether there is a next page
+    rows = db.execute(
+        query.order_by(Batch.created_at.desc(), Batch.id.desc()).limit(limit + 1)
+    ).mappings().all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor(last["created_at"], last["id"])
+
+    return BatchListResponse(
+        items=[BatchSummaryResponse.model_validate(row) for row in rows],
+        total=_count_batches(db, status, days, since_date) if include_total else None,
+        per_page=limit,
+        next_cursor=next_cursor,
+    )
 
 
 @router.get(
@@ -68,6 +194,39 @@ async def get_batch(batch_id: int, db: Session = Depends(get_db)):
     return batch
 
 
+@router.get(
+    "/{batch_id}/timings",
+    response_model=BatchTimingsResponse,
+    responses={404: {"description": "Batch not found"}}
+)
+async def get_batch_timings(batch_id: int, db: Session = Depends(get_db)):
+    """Per-stage and per-page timing breakdown of a processed batch."""
+    batch = db.get(Batch, batch_id)
+    if not batch:
+        raise HTTPException(status_code=404, detail="Batch not found")
+
+    pages = db.execute(
+        select(Page.page_number, Page.extraction_method, Page.timings)
+        .join(Document, Page.document_id == Document.id)
+        .where(Document.batch_id == batch_id)
+        .order_by(Document.id, Page.page_number)
+    ).mappings()
+    return BatchTimingsResponse(
+        batch_id=batch.id,
+        filename=batch.filename,
+        processing_time=batch.processing_time,
+        stage_timings=batch.stage_timings or {},
+        pages=[
+            PageTimings(
+                page_number=row["page_number"],
+                extraction_method=row["extraction_method"],
+                timings=row["timings"] or {},
+            )
+            for row in pages
+        ],
+    )
+
+
 @router.delete(
     "/{batch_id}",
     status_code=status.HTTP_200_OK,
@@ -85,6 +244,7 @@ async def delete_batch(batch_id: int, db: Session = Depends(get_db)):
     if not batch:
         raise HTTPException(status_code=404, detail="Batch not found")
 
+    search.remove_batch(db, batch_id)
     db.delete(batch)
     db.commit()
 
@@ -119,20 +279,19 @@ async def reprocess_batch(batch_id: int, db: Session = Depends(get_db)):
     batch.processed_at = None
     batch.processing_time = None
     batch.error_message = None
-    batch.started_at = None
 
-    db.commit()
-
-    # Actually trigger processing immediately
+    # Queue in the same transaction as the reset
     try:
-        process_manager.process_file(batch)
+        job_id = job_queue.enqueue(batch.id, session=db)
+        db.commit()
         return {
             "detail": f"Batch {batch_id} queued for reprocessing",
-            "status": "queued"
+            "status": "queued",
+            "job_id": job_id,
         }
     except Exception as e:
         db.rollback()
         raise HTTPException(
             status_code=500,
             detail=f"Failed to queue reprocessing: {str(e)}"
-        )
\ No newline at end of file
+        )
@@ -0,0 +1,67 @@
+# api/endpoints/export.py
+"""
+Streaming bulk export of extracted documents, pages, fields and line items
+(NDJSON / CSV / Parquet).
+"""
+
+from datetime import datetime
+from typing import Iterator, List, Literal, Optional
+
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import StreamingResponse
+
+from core import export
+from core.database import SessionLocal, DocumentType, ProcessingStatus
+
+router = APIRouter(prefix="/export", tags=["Export"])
+
+
+def _stream(filters: export.ExportFilters, fmt: str) -> Iterator[bytes]:
+    """
+    Own the session for the lifetime of the stream; a request-scoped
+    dependency session would be closed before the body is sent.
+    """
+    db = SessionLocal()
+    try:
+        yield from export.stream_export(db, filters, fmt)
+    finally:
+        db.close()
+
+
+@router.get(
+    "",
+    summary="Export extracted data",
+    description=(
+        "Stream one record per document, page, field and line item (tagged with "
+        "`record_type`, with batch and document context) without materializing the "
+        "result set. Read-only: batch status is not changed. "
+        "Formats: ndjson, csv, parquet (needs pyarrow on the server)."
+    ),
+    response_class=StreamingResponse,
+    responses={501: {"description": "Format not available on this server"}},
+)
+def export_fields(
+    format: Literal["ndjson", "csv", "parquet"] = Query("ndjson", description="Output format"),
+    batch_id: List[int] = Query([], description="Restrict to these batch ids"),
+    status: Optional[ProcessingStatus] = None,
+    doc_type: Optional[DocumentType] = None,
+    date_from: Optional[datetime] = Query(None, description="Batches created on/after"),
+    date_to: Optional[datetime] = Query(None, description="Batches created on/before"),
+):
+    # Checked here: once streaming has started the 200 status is already sent
+    if format == "parquet" and not export.parquet_available():
+        raise HTTPException(status_code=501, detail="Parquet export requires pyarrow on the server")
+
+    filters = export.ExportFilters(
+        batch_ids=batch_id,
+        status=status,
+        doc_type=doc_type,
+        date_from=date_from,
+        date_to=date_to,
+    )
+    filename = f"export_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{format}"
+    return StreamingResponse(
+        _stream(filters, format),
+        media_type=export.MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
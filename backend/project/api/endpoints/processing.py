@@ -1,14 +1,19 @@
 # api/endpoints/processing.py
-from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
+from core import timings as stage_timings
 from core.database import get_db, ProcessingStatus, Batch
+from core.models import TimingSummaryResponse
+from core.queue import job_queue
 
 router = APIRouter()
 
 @router.post("/batches/{batch_id}/trigger")
 async def trigger_processing(
     batch_id: int,
-    background_tasks: BackgroundTasks,
     db: Session = Depends(get_db)
 ):
     """
@@ -22,9 +27,59 @@ async def trigger_processing(
     if batch.status != ProcessingStatus.PENDING:
         raise HTTPException(status_code=400, detail=f"Batch is already {batch.status}")
 
-    # Here you would normally add the real background processing task
-    # For now we just mark it as processing
-    batch.status = ProcessingStatus.PROCESSING
+    # Queue it; any running worker will pick it up
+    job_id = job_queue.enqueue(batch.id, session=db)
     db.commit()
 
-    return {"message": f"Processing triggered for batch {batch_id}", "status": batch.status}
\ No newline at end of file
+    return {"message": f"Processing triggered for batch {batch_id}", "status": batch.status, "job_id": job_id}
+
+
+@router.post("/processing/start-pending")
+async def start_pending():
+    """
+    Queue every PENDING batch that has no job yet: batches created with
+    auto_start_processing off, or before the job queue existed. Respects
+    the queue_max_pending admission limit; call again for the rest.
+    """
+    free = job_queue.admission()["free"]
+    queued = job_queue.enqueue_orphans(limit=free if free >= 0 else None, min_age_seconds=0) if free else 0
+    return {"queued": queued, "admission": job_queue.admission()}
+
+
+@router.get("/processing/queue")
+async def queue_depth():
+    """Number of jobs per queue state (queued, leased, done, dead) and admission state."""
+    return {**job_queue.depth(), "admission": job_queue.admission()}
+
+
+@router.get("/processing/ocr-cache")
+async def ocr_cache_stats():
+    """
+    OCR result cache size and limits. Hit/miss counts happen in the workers'
+    OCR pools: see invoice_ocr_cache_total on their /metrics endpoints.
+    """
+    from watcher.ocr_cache import ocr_cache  # Deferred: the watcher package imports the processing stack
+
+    stats = ocr_cache.stats()
+    return {k: stats[k] for k in ("enabled", "entries", "bytes", "max_bytes")}
+
+
+@router.get("/processing/timings", response_model=TimingSummaryResponse)
+async def timing_summary(
+    date_from: Optional[datetime] = Query(None, description="Processed on/after (default: last 24h)"),
+    date_to: Optional[datetime] = Query(None, description="Processed on/before"),
+    filename: Optional[str] = Query(None, max_length=200, description="Filename contains (e.g. a vendor name)"),
+    limit: int = Query(10000, ge=1, le=100000, description="Most recent batches to aggregate"),
+    db: Session = Depends(get_db),
+):
+    """Per-stage latency percentiles (p50/p90/p95/p99) over recently processed batches."""
+    if date_from is None and date_to is None:
+        date_from = datetime.now(timezone.utc) - timedelta(days=1)
+    rows = stage_timings.batch_timings(db, date_from, date_to, filename, limit)
+    return TimingSummaryResponse(
+        batches=len(rows),
+        date_from=date_from,
+        date_to=date_to,
+        filename=filename,
+        stages=stage_timings.summarize(rows),
+    )
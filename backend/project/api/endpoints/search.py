@@ -0,0 +1,49 @@
+# api/endpoints/search.py
+"""
+Full-text search over OCR text and extracted field values.
+"""
+
+from datetime import datetime
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.orm import Session
+
+from core import search as search_index
+from core.database import get_db, DocumentType, ProcessingStatus
+from core.models import SearchHit, SearchResponse
+
+router = APIRouter(prefix="/search", tags=["Search"])
+
+
+@router.get(
+    "",
+    response_model=SearchResponse,
+    summary="Search documents",
+    description=(
+        "Ranked full-text search over page text and extracted fields "
+        "(invoice numbers, vendor names, totals...). Matching terms are "
+        "highlighted with <mark> in the snippet."
+    )
+)
+async def search(
+    q: str = Query(..., min_length=1, max_length=200, description="Search terms"),
+    doc_type: Optional[DocumentType] = None,
+    status: Optional[ProcessingStatus] = None,
+    date_from: Optional[datetime] = Query(None, description="Batches created on/after"),
+    date_to: Optional[datetime] = Query(None, description="Batches created on/before"),
+    limit: int = Query(20, ge=1, le=100, description="Max results per page"),
+    offset: int = Query(0, ge=0, le=10000, description="Pagination offset"),
+    db: Session = Depends(get_db),
+):
+    """Search pages, best matches first."""
+    filters = search_index.SearchFilters(
+        doc_type=doc_type, status=status, date_from=date_from, date_to=date_to
+    )
+    rows = search_index.search(db, q, filters, limit=limit, offset=offset)
+    return SearchResponse(
+        query=q,
+        items=[SearchHit.model_validate(row) for row in rows],
+        limit=limit,
+        offset=offset,
+    )
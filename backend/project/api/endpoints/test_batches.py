@@ -0,0 +1,70 @@
+# api/endpoints/test_batches.py
+"""Keyset pagination of the batch list."""
+
+import asyncio
+from datetime import datetime, timezone
+
+from sqlalchemy import text
+
+from api.endpoints.batches import decode_cursor, encode_cursor, get_batches
+from core.database import Batch, engine, migrate_schema
+
+
+def _page(db, cursor, limit=3):
+    return asyncio.run(get_batches(
+        db=db, status=None, limit=limit, cursor=cursor, days=7, include_total=False,
+    ))
+
+
+def _walk(db, limit=3):
+    ids, cursor = [], None
+    for _ in range(100):
+        page = _page(db, cursor, limit)
+        ids += [item.id for item in page.items]
+        cursor = page.next_cursor
+        if cursor is None:
+            return ids
+    raise AssertionError(f"Pagination did not terminate: {ids[:20]}...")
+
+
+def test_cursor_round_trip():
+    created_at = datetime(2026, 3, 1, 12, 30, 5, 123456)
+    assert decode_cursor(encode_cursor(created_at, 42)) == (created_at, 42)
+
+
+def test_walks_same_second_rows_exactly_once(db):
+    # Rows stamped by the database (CURRENT_TIMESTAMP, whole seconds), as
+    # written before created_at had a Python default ...
+    second = datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+    with engine.begin() as conn:
+        for n in range(5):
+            conn.execute(text(
+                "INSERT INTO batches (filename, original_path, file_hash, status, created_at) "
+                f"VALUES ('legacy{n}.pdf', '/hot/legacy{n}.pdf', 'md5:{n:032x}', 'COMPLETED', '{second}')"
+            ))
+        conn.execute(text("DELETE FROM schema_migrations"))  # Not yet upgraded
+    migrate_schema(engine)  # As on startup
+
+    # ... and rows written from Python since
+    db.add_all(
+        Batch(filename=f"new{n}.pdf", original_path=f"/hot/new{n}.pdf", file_hash=f"blake2b:{n:064x}")
+        for n in range(4)
+    )
+    db.commit()
+
+    ids = _walk(db)
+    assert sorted(ids) == list(range(1, 10))
+    assert len(ids) == len(set(ids))
+    assert ids[:4] == [9, 8, 7, 6]  # Newest first
+    assert ids[4:] == [5, 4, 3, 2, 1]  # Same second: by id
+
+
+def test_invalid_cursor_is_rejected(db):
+    from fastapi import HTTPException
+
+    try:
+        _page(db, "not-a-cursor")
+    except HTTPException as e:
+        assert e.status_code == 400
+    else:
+        raise AssertionError("Expected a 400")
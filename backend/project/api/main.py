@@ -15,13 +15,15 @@ from typing import Generator
 import uvicorn
 from fastapi import FastAPI, Depends, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import Response
 from fastapi.staticfiles import StaticFiles
 from sqlalchemy.orm import Session
 from sqlalchemy import text
 
+from core import metrics
 from core.config import config
-from core.database import SessionLocal, engine
-from api.endpoints import batches, settings, processing
+from core.database import SessionLocal, engine, init_db
+from api.endpoints import batches, settings, processing, search, export
 
 # --------------------------------------------------------------------------- #
 # Logging Configuration
@@ -75,6 +77,8 @@ def get_db() -> Generator[Session, None, None]:
 app.include_router(batches.router, prefix="/api/v1", tags=["Batches"])
 app.include_router(settings.router, prefix="/api/v1", tags=["Settings"])
 app.include_router(processing.router, prefix="/api/v1", tags=["Processing"])
+app.include_router(search.router, prefix="/api/v1", tags=["Search"])
+app.include_router(export.router, prefix="/api/v1", tags=["Export"])
 
 # --------------------------------------------------------------------------- #
 # Static Files (processed page images, previews, etc.)
@@ -140,6 +144,12 @@ async def health_check(db: Session = Depends(get_db)):
         raise HTTPException(status_code=503, detail=f"Service unhealthy: {str(e)}")
 
 
+@app.get("/metrics", tags=["Health"], include_in_schema=False)
+def prometheus_metrics():
+    """Prometheus scrape endpoint (queue depth plus any work done in this process)."""
+    return Response(content=metrics.render(), media_type=metrics.CONTENT_TYPE)
+
+
 # --------------------------------------------------------------------------- #
 # Startup / Shutdown Events
 # --------------------------------------------------------------------------- #
@@ -158,9 +168,10 @@ async def startup_event():
         Path(path).mkdir(parents=True, exist_ok=True)
         logger.info(f"Ensured directory exists: {path}")
 
-    # Test DB connection on startup
+    # Test DB connection on startup, and bring an older schema up to date
     with engine.connect() as conn:
         conn.execute(text("SELECT 1"))
+    init_db()
     logger.info("Database connection successful")
 
 
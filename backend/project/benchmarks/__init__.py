@@ -0,0 +1,12 @@
+# benchmarks/__init__.py
+"""
+Reproducible pipeline benchmarks.
+
+- benchmarks/corpus.py: deterministic synthetic invoice corpus generator
+- benchmarks/run.py: end-to-end harness (HotFolderHandler ingest +
+  ProcessManager processing) writing a JSON report comparable across commits
+- benchmarks/extraction.py: field extraction speed and recall, rule engine
+  vs the original three-regex extractor
+
+    python -m benchmarks.run --files 100 --seed 42 --output bench.json
+"""
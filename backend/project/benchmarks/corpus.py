@@ -0,0 +1,260 @@
+# benchmarks/corpus.py
+"""
+Deterministic synthetic invoice corpus.
+
+Same seed and file count -> byte-identical files, so benchmark runs on
+different commits process exactly the same input. Kinds:
+
+- born_digital: one-page PDF with a real text layer (text-layer fast path)
+- scanned:      one-page PDF containing only a noisy, slightly skewed
+                raster of an invoice (OCR path)
+- statement:    multi-page born-digital account statement (3-8 pages)
+- png / tiff:   scanned-style invoice images
+
+Every invoice carries an invoice number, a date and a total in the layout
+the basic field extractor understands.
+
+    python -m benchmarks.corpus --files 200 --seed 42 --output corpus/
+"""
+
+import hashlib
+import io
+import json
+import random
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+import fitz  # PyMuPDF
+import numpy as np
+from PIL import Image
+
+KINDS = ("born_digital", "scanned", "statement", "png", "tiff")
+DEFAULT_WEIGHTS = {"born_digital": 40, "scanned": 25, "statement": 15, "png": 10, "tiff": 10}
+
+VENDORS = [
+    "Acme Solutions", "Globex Corporation", "Initech Supplies", "Umbrella Logistics",
+    "Stark Industrial", "Wayne Components", "Hooli Cloud Services", "Vandelay Imports",
+    "Soylent Foods", "Tyrell Engineering", "Cyberdyne Systems", "Wonka Confectionery",
+]
+ITEMS = [
+    "Consulting hours", "Steel brackets", "Cloud hosting", "Freight charges", "Printer toner",
+    "Safety gloves", "Software license", "Office chairs", "Cable assemblies", "Maintenance fee",
+]
+
+PAGE_WIDTH, PAGE_HEIGHT = 612, 792  # US Letter, points
+SCAN_DPI = 150
+
+# Fixed metadata: PyMuPDF would otherwise embed the current time
+_PDF_METADATA = {
+    "producer": "benchmarks.corpus",
+    "creator": "benchmarks.corpus",
+    "creationDate": "D:20250101000000",
+    "modDate": "D:20250101000000",
+}
+
+
+# =============================================================================
+# Content
+# =============================================================================
+
+
+def _invoice_lines(rng: random.Random, number: int) -> List[str]:
+    vendor = rng.choice(VENDORS)
+    lines = [
+        vendor,
+        f"{rng.randint(10, 9999)} Market Street, Springfield",
+        "",
+        "INVOICE",
+        f"Invoice #: INV-2025-{number:05d}",
+        f"Date: {rng.randint(1, 12):02d}/{rng.randint(1, 28):02d}/2025",
+        f"Bill To: Customer {rng.randint(100, 999)}",
+        "",
+        "Description                      Qty     Unit      Amount",
+    ]
+    total = 0.0
+    for _ in range(rng.randint(3, 12)):
+        qty = rng.randint(1, 50)
+        unit = round(rng.uniform(5, 500), 2)
+        amount = qty * unit
+        total += amount
+        lines.append(f"{rng.choice(ITEMS):<32} {qty:>3} {unit:>9.2f} {amount:>11.2f}")
+    lines += ["", f"Total: ${total:,.2f}", "Payment due within 30 days"]
+    return lines
+
+
+def _statement_pages(rng: random.Random, number: int) -> List[List[str]]:
+    vendor = rng.choice(VENDORS)
+    pages = []
+    balance = round(rng.uniform(1000, 50000), 2)
+    for page_number in range(1, rng.randint(3, 8) + 1):
+        lines = [f"{vendor} - Account Statement", f"Statement #: STM-2025-{number:05d}  Page {page_number}", ""]
+        for _ in range(35):
+            change = round(rng.uniform(-2000, 2000), 2)
+            balance += change
+            lines.append(
+                f"{rng.randint(1, 12):02d}/{rng.randint(1, 28):02d}/2025  "
+                f"{rng.choice(ITEMS):<28} {change:>11.2f} {balance:>12.2f}"
+            )
+        pages.append(lines)
+    pages[-1] += ["", f"Total: ${balance:,.2f}"]
+    return pages
+
+
+def _draw_page(doc: fitz.Document, lines: Sequence[str]) -> fitz.Page:
+    page = doc.new_page(width=PAGE_WIDTH, height=PAGE_HEIGHT)
+    y = 60
+    for line in lines:
+        size = 16 if line in ("INVOICE",) else 10
+        page.insert_text((50, y), line, fontsize=size, fontname="cour")
+        y += size + 6
+    return page
+
+
+def _save_pdf(doc: fitz.Document) -> bytes:
+    doc.set_metadata(_PDF_METADATA)
+    return doc.tobytes(garbage=4, deflate=True, no_new_id=True)
+
+
+# =============================================================================
+# Rasterization ("scanner" simulation)
+# =============================================================================
+
+
+def _scan(lines: Sequence[str], rng: random.Random, np_rng: np.random.Generator) -> Image.Image:
+    """Render an invoice page and degrade it like a cheap office scanner."""
+    doc = fitz.open()
+    page = _draw_page(doc, lines)
+    pix = page.get_pixmap(dpi=SCAN_DPI, colorspace=fitz.csGRAY)
+    gray = np.frombuffer(pix.samples, dtype=np.uint8).reshape(pix.height, pix.width).astype(np.int16)
+    doc.close()
+
+    gray += np_rng.normal(0, 12, gray.shape).astype(np.int16)          # sensor noise
+    specks = np_rng.random(gray.shape) < 0.0015                        # dust
+    gray[specks] = 0
+    image = Image.fromarray(np.clip(gray, 0, 255).astype(np.uint8), mode="L")
+    return image.rotate(rng.uniform(-1.5, 1.5), resample=Image.BILINEAR, fillcolor=255)
+
+
+def _image_pdf(image: Image.Image) -> bytes:
+    buffer = io.BytesIO()
+    image.save(buffer, format="PNG", optimize=False)
+    doc = fitz.open()
+    page = doc.new_page(width=PAGE_WIDTH, height=PAGE_HEIGHT)
+    page.insert_image(page.rect, stream=buffer.getvalue())
+    data = _save_pdf(doc)
+    doc.close()
+    return data
+
+
+def _image_bytes(image: Image.Image, fmt: str) -> bytes:
+    buffer = io.BytesIO()
+    if fmt == "TIFF":
+        image.save(buffer, format="TIFF", compression="tiff_lzw", dpi=(SCAN_DPI, SCAN_DPI))
+    else:
+        image.save(buffer, format="PNG", dpi=(SCAN_DPI, SCAN_DPI))
+    return buffer.getvalue()
+
+
+# =============================================================================
+# Corpus
+# =============================================================================
+
+
+def generate_file(kind: str, index: int, seed: int) -> tuple:
+    """Build one corpus file. Returns (filename, bytes, page count)."""
+    rng = random.Random(f"{seed}:{index}")
+    np_rng = np.random.default_rng([seed, index])
+    stem = f"{index:05d}_{kind}"
+
+    if kind == "born_digital":
+        doc = fitz.open()
+        _draw_page(doc, _invoice_lines(rng, index))
+        data = _save_pdf(doc)
+        doc.close()
+        return f"{stem}.pdf", data, 1
+    if kind == "statement":
+        doc = fitz.open()
+        pages = _statement_pages(rng, index)
+        for lines in pages:
+            _draw_page(doc, lines)
+        data = _save_pdf(doc)
+        doc.close()
+        return f"{stem}.pdf", data, len(pages)
+    if kind == "scanned":
+        return f"{stem}.pdf", _image_pdf(_scan(_invoice_lines(rng, index), rng, np_rng)), 1
+    if kind == "png":
+        return f"{stem}.png", _image_bytes(_scan(_invoice_lines(rng, index), rng, np_rng), "PNG"), 1
+    if kind == "tiff":
+        return f"{stem}.tif", _image_bytes(_scan(_invoice_lines(rng, index), rng, np_rng), "TIFF"), 1
+    raise ValueError(f"Unknown corpus kind: {kind}")
+
+
+def plan(files: int, seed: int, weights: Optional[Dict[str, int]] = None) -> List[str]:
+    """Deterministic kind for each of `files` corpus entries."""
+    weights = weights or DEFAULT_WEIGHTS
+    kinds = [k for k in KINDS if weights.get(k)]
+    rng = random.Random(seed)
+    return rng.choices(kinds, weights=[weights[k] for k in kinds], k=files)
+
+
+def generate_corpus(
+    output_dir: str,
+    files: int,
+    seed: int = 42,
+    weights: Optional[Dict[str, int]] = None,
+) -> Dict:
+    """
+    Write the corpus to `output_dir` and return its manifest (also saved as
+    manifest.json): per-file kind/pages/bytes and a fingerprint over all
+    file digests, to check two runs used identical input.
+    """
+    out = Path(output_dir)
+    out.mkdir(parents=True, exist_ok=True)
+
+    entries = []
+    fingerprint = hashlib.sha256()
+    for index, kind in enumerate(plan(files, seed, weights)):
+        filename, data, pages = generate_file(kind, index, seed)
+        (out / filename).write_bytes(data)
+        digest = hashlib.sha256(data).hexdigest()
+        fingerprint.update(digest.encode())
+        entries.append({"file": filename, "kind": kind, "pages": pages, "bytes": len(data), "sha256": digest})
+
+    manifest = {
+        "seed": seed,
+        "files": len(entries),
+        "pages": sum(e["pages"] for e in entries),
+        "bytes": sum(e["bytes"] for e in entries),
+        "kinds": {k: sum(1 for e in entries if e["kind"] == k) for k in KINDS},
+        "fingerprint": fingerprint.hexdigest(),
+        "entries": entries,
+    }
+    (out / "manifest.json").write_text(json.dumps(manifest, indent=2))
+    return manifest
+
+
+def parse_weights(spec: str) -> Dict[str, int]:
+    """"born_digital=3,scanned=1" -> {"born_digital": 3, "scanned": 1}."""
+    weights = {}
+    for part in spec.split(","):
+        kind, _, weight = part.partition("=")
+        if kind.strip() not in KINDS:
+            raise ValueError(f"Unknown corpus kind: {kind} (choose from {', '.join(KINDS)})")
+        weights[kind.strip()] = int(weight or 1)
+    return weights
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Generate a synthetic invoice corpus")
+    parser.add_argument("--files", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--mix", type=parse_weights, default=None,
+                        help="Kind weights, e.g. born_digital=3,scanned=1 (default: all kinds)")
+    parser.add_argument("--output", "-o", default="corpus")
+    args = parser.parse_args()
+
+    result = generate_corpus(args.output, args.files, args.seed, args.mix)
+    print(f"{result['files']} files, {result['pages']} pages, {result['bytes'] / 1e6:.1f} MB "
+          f"-> {args.output} (fingerprint {result['fingerprint'][:12]})")
@@ -0,0 +1,235 @@
+# benchmarks/extraction.py
+"""
+Field extraction benchmark: template rule engine vs the three-regex baseline.
+
+Builds a labelled set of synthetic invoice pages in several layouts, renders
+each to PDF and reads it back through the text-layer path (real word
+boxes), then measures for every extractor:
+
+- speed: pages/sec over the whole set (best of --repeat runs)
+- recall / precision per field (invoice_number, date, total_amount) against
+  the known values, after normalizing amounts and whitespace
+- line items (watcher/tables.py): ms/page, row recall / precision (all of
+  description, quantity, unit price and amount right) and how many pages'
+  item sums reconcile with the extracted total or subtotal
+
+Layouts:
+- inline:  "Invoice #: ...", "Date: mm/dd/yyyy", "Total: $..." (the corpus layout)
+- stacked: label on one line, value below; written-out dates; Subtotal and
+           VAT lines before "Total Amount Due"
+- columns: label and value in separate columns; ISO dates; "Grand Total"
+
+    python -m benchmarks.extraction --pages 300 --seed 42 --output extraction.json
+"""
+
+import json
+import random
+import re
+import time
+from typing import Any, Callable, Dict, List, Sequence, Tuple
+
+import fitz  # PyMuPDF
+
+from watcher.extraction import extract_basic_fields, extract_document
+from watcher.page_text import PageText
+from watcher.tables import extract_line_items, reconcile
+from watcher.text_layer import analyze_text_layer
+
+LAYOUTS = ("inline", "stacked", "columns")
+FIELDS = ("invoice_number", "date", "total_amount")
+MONTHS = ["January", "February", "March", "April", "May", "June", "July",
+          "August", "September", "October", "November", "December"]
+ITEMS = ["Consulting hours", "Steel brackets", "Cloud hosting", "Freight charges", "Printer toner"]
+
+Placed = Tuple[float, float, str]  # (x, y, text)
+
+
+def _items(rng: random.Random) -> Tuple[List[Tuple[str, int, float, float]], float]:
+    rows, subtotal = [], 0.0
+    for _ in range(rng.randint(2, 8)):
+        qty, unit = rng.randint(1, 40), round(rng.uniform(5, 400), 2)
+        rows.append((rng.choice(ITEMS), qty, unit, round(qty * unit, 2)))
+        subtotal += qty * unit
+    return rows, round(subtotal, 2)
+
+
+def _page(layout: str, rng: random.Random, index: int) -> Tuple[List[Placed], Dict[str, Any]]:
+    """Text placements of one invoice page and its ground truth."""
+    number = f"INV-{rng.randint(2020, 2025)}-{index:06d}"
+    day, month, year = rng.randint(1, 28), rng.randint(1, 12), rng.randint(2020, 2025)
+    rows, subtotal = _items(rng)
+    placed: List[Placed] = [(50, 50, rng.choice(["Globex Corporation", "Initech Supplies", "Vandelay Imports"]))]
+    y = 120
+
+    if layout == "inline":
+        date = f"{month:02d}/{day:02d}/{year}"
+        total = subtotal
+        placed += [(50, 80, "INVOICE"), (50, y, f"Invoice #: {number}"), (50, y + 16, f"Date: {date}")]
+    elif layout == "stacked":
+        date = f"{day:02d} {MONTHS[month - 1]} {year}"
+        total = round(subtotal * 1.19, 2)
+        placed += [(400, 50, "Invoice"), (50, 80, "TAX INVOICE"),
+                   (50, y, "Invoice No:"), (50, y + 14, number),
+                   (200, y, "Invoice Date:"), (200, y + 14, date),
+                   (350, y, "Due Date:"), (350, y + 14, f"{min(day + 14, 28):02d} {MONTHS[month - 1]} {year}")]
+    else:
+        date = f"{year}-{month:02d}-{day:02d}"
+        total = round(subtotal * 1.08, 2)
+        placed += [(50, y, "Invoice Number"), (200, y, number),
+                   (50, y + 16, "Issue Date"), (200, y + 16, date),
+                   (50, y + 32, "Customer ID"), (200, y + 32, f"C-{rng.randint(1000, 9999)}")]
+
+    y += 70
+    placed += [(50, y, "Description"), (300, y, "Qty"), (370, y, "Unit"), (460, y, "Amount")]
+    for description, qty, unit, amount in rows:
+        y += 16
+        placed += [(50, y, description), (300, y, str(qty)), (370, y, f"{unit:.2f}"), (460, y, f"{amount:,.2f}")]
+
+    y += 30
+    if layout == "inline":
+        placed.append((50, y, f"Total: ${total:,.2f}"))
+    elif layout == "stacked":
+        placed += [(300, y, "Subtotal"), (460, y, f"{subtotal:,.2f}"),
+                   (300, y + 16, "VAT 19%"), (460, y + 16, f"{total - subtotal:,.2f}"),
+                   (300, y + 32, "Total Amount Due"), (460, y + 32, f"${total:,.2f}")]
+    else:
+        placed += [(300, y, "Subtotal"), (460, y, f"{subtotal:,.2f}"),
+                   (300, y + 16, "Tax 8%"), (460, y + 16, f"{total - subtotal:,.2f}"),
+                   (300, y + 32, "Grand Total"), (460, y + 32, f"${total:,.2f}")]
+    placed.append((50, y + 70, "Payment due within 30 days"))
+
+    truth = {"invoice_number": number, "date": date, "total_amount": f"{total:.2f}", "line_items": rows}
+    return placed, truth
+
+
+def build_dataset(pages: int, seed: int) -> List[Tuple[str, PageText, Dict[str, Any]]]:
+    """(layout, page text with word boxes, truth) for `pages` pages, layouts in rotation."""
+    rng = random.Random(seed)
+    dataset = []
+    doc = fitz.open()
+    for index in range(pages):
+        layout = LAYOUTS[index % len(LAYOUTS)]
+        placed, truth = _page(layout, rng, index)
+        page = doc.new_page(width=612, height=792)
+        for x, y, text in placed:
+            page.insert_text((x, y), text, fontsize=10, fontname="helv")
+        page_text, _ = analyze_text_layer(page)
+        dataset.append((layout, page_text, truth))
+    doc.close()
+    return dataset
+
+
+def _normalize(name: str, value: str) -> str:
+    if name == "total_amount":
+        digits = re.sub(r"[^\d.]", "", value.replace(",", ""))
+        try:
+            return f"{float(digits):.2f}"
+        except ValueError:
+            return value
+    return " ".join(value.split())
+
+
+def _score(predictions: Sequence[Dict[str, str]], dataset) -> Dict[str, Dict[str, float]]:
+    scores = {}
+    for name in FIELDS:
+        expected = len(dataset)
+        predicted = sum(1 for p in predictions if name in p)
+        correct = sum(
+            1 for p, (_, _, truth) in zip(predictions, dataset)
+            if name in p and _normalize(name, p[name]) == _normalize(name, truth[name])
+        )
+        scores[name] = {
+            "recall": correct / expected if expected else 0.0,
+            "precision": correct / predicted if predicted else 0.0,
+        }
+    return scores
+
+
+def _run(extract: Callable[[PageText], List[tuple]], dataset, repeat: int) -> Tuple[float, List[Dict[str, str]]]:
+    best = float("inf")
+    predictions: List[Dict[str, str]] = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        results = [extract(page_text) for _, page_text, _ in dataset]
+        best = min(best, time.perf_counter() - start)
+        predictions = [{name: value for name, value, _ in fields} for fields in results]
+    return best, predictions
+
+
+def _score_line_items(dataset, repeat: int) -> Dict[str, float]:
+    best = float("inf")
+    results = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        results = [extract_line_items(page_text) for _, page_text, _ in dataset]
+        best = min(best, time.perf_counter() - start)
+
+    expected = predicted = correct = reconciled = 0
+    for items, (_, page_text, truth) in zip(results, dataset):
+        rows = {(d, float(q), u, a) for d, q, u, a in truth["line_items"]}
+        found = {(i.description, i.quantity, i.unit_price, i.amount) for i in items}
+        expected += len(truth["line_items"])
+        predicted += len(items)
+        correct += len(rows & found)
+        status = reconcile(items, extract_document([page_text])[0])["status"]
+        reconciled += status.startswith("matched")
+    return {
+        "seconds": best,
+        "ms_per_page": 1000 * best / len(dataset) if dataset else 0.0,
+        "row_recall": correct / expected if expected else 0.0,
+        "row_precision": correct / predicted if predicted else 0.0,
+        "reconciled": reconciled / len(dataset) if dataset else 0.0,
+    }
+
+
+def benchmark(pages: int = 300, seed: int = 42, repeat: int = 3) -> Dict:
+    dataset = build_dataset(pages, seed)
+    extractors = {
+        "baseline": lambda page: extract_basic_fields(page.text),
+        "rule_engine": lambda page: extract_document([page])[0],
+        "rule_engine_text_only": lambda page: extract_document([PageText(text=page.text)])[0],
+    }
+    extract_document([dataset[0][1]])  # load and compile the templates outside the timing
+
+    report = {"pages": pages, "seed": seed, "layouts": list(LAYOUTS), "extractors": {}}
+    for name, extract in extractors.items():
+        seconds, predictions = _run(extract, dataset, repeat)
+        by_layout = {
+            layout: _score(
+                [p for p, d in zip(predictions, dataset) if d[0] == layout],
+                [d for d in dataset if d[0] == layout],
+            )
+            for layout in LAYOUTS
+        }
+        report["extractors"][name] = {
+            "seconds": seconds,
+            "pages_per_sec": pages / seconds if seconds else 0.0,
+            "fields": _score(predictions, dataset),
+            "by_layout": by_layout,
+        }
+    report["line_items"] = _score_line_items(dataset, repeat)
+    return report
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmark field extraction speed and recall")
+    parser.add_argument("--pages", type=int, default=300)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs (best is reported)")
+    parser.add_argument("--output", "-o", default="extraction.json")
+    args = parser.parse_args()
+
+    result = benchmark(args.pages, args.seed, args.repeat)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(result, f, indent=2)
+    for name, stats in result["extractors"].items():
+        recall = ", ".join(f"{field} {s['recall']:.0%}" for field, s in stats["fields"].items())
+        print(f"{name:<22} {stats['pages_per_sec']:>9.0f} pages/s   recall: {recall}")
+    tables = result["line_items"]
+    print(
+        f"{'line_items':<22} {tables['ms_per_page']:>9.2f} ms/page   "
+        f"row recall {tables['row_recall']:.0%}, precision {tables['row_precision']:.0%}, "
+        f"reconciled {tables['reconciled']:.0%}"
+    )
@@ -0,0 +1,271 @@
+# benchmarks/run.py
+"""
+End-to-end pipeline benchmark.
+
+Generates (or reuses) a deterministic corpus, then runs it through the real
+pipeline against a throwaway SQLite database and folders in --workdir:
+
+1. ingest:  HotFolderHandler.ingest on `ingest_threads` threads
+            (validate, hash, duplicate check, batch insert, enqueue)
+2. process: ProcessManager workers + OCR pool until the queue drains
+
+and writes a JSON report: ingest files/s and MB/s, pages/s, batch
+processing time and end-to-end latency percentiles, DB write rate, the
+per-stage breakdown (core/timings.py) and failures, plus the git commit
+and environment so reports from different commits can be compared.
+
+    python -m benchmarks.run --files 200 --seed 42 --output bench.json
+
+Nothing outside --workdir is touched: settings are applied with
+config.override() and never saved to config.json.
+"""
+
+import json
+import os
+import platform
+import shutil
+import subprocess
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from core.config import config
+from benchmarks.corpus import DEFAULT_WEIGHTS, generate_corpus, parse_weights
+
+REPORT_VERSION = 1
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        result = subprocess.run(
+            ["git", "rev-parse", "HEAD"], cwd=config.PROJECT_ROOT,
+            capture_output=True, text=True, timeout=10,
+        )
+        commit = result.stdout.strip()
+        if commit and result.returncode == 0:
+            dirty = subprocess.run(
+                ["git", "status", "--porcelain", "--untracked-files=no"], cwd=config.PROJECT_ROOT,
+                capture_output=True, text=True, timeout=10,
+            ).stdout.strip()
+            return f"{commit}-dirty" if dirty else commit
+    except (OSError, subprocess.SubprocessError):
+        pass
+    return None
+
+
+def _tesseract_version() -> Optional[str]:
+    try:
+        import pytesseract
+        return str(pytesseract.get_tesseract_version())
+    except Exception:
+        return None
+
+
+def _environment() -> Dict[str, Any]:
+    return {
+        "git_commit": _git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "tesseract": _tesseract_version(),
+    }
+
+
+def _configure(workdir: Path, args) -> None:
+    """Point every path and the database at the work dir (before core.database is imported)."""
+    storage = workdir / "storage"
+    config.override({
+        "hot_folder": str(workdir / "hot"),
+        "processed_folder": str(storage / "processed"),
+        "error_folder": str(storage / "errors"),
+        "archive_folder": str(storage / "archive"),
+        "temp_folder": str(storage / "temp_processing"),
+        "dedupe_index_path": str(storage / "dedupe.idx"),
+        "database_url": f"sqlite:///{storage / 'benchmark.db'}",
+        "auto_start_processing": True,
+        "embedded_workers": False,       # ProcessManager is started explicitly for phase 2
+        "queue_max_pending": 0,          # admit the whole corpus up front
+        "metrics_port": 0,
+        "ingest_threads": args.ingest_threads or config.ingest_threads,
+        "parallel_workers": args.workers or config.parallel_workers,
+        "ocr_processes": args.ocr_processes or config.get("ocr_processes", 0),
+    })
+    for key in ("hot_folder", "processed_folder", "error_folder", "archive_folder", "temp_folder"):
+        Path(config.get(key)).mkdir(parents=True, exist_ok=True)
+
+
+def _ingest(files: List[Path]) -> Dict[str, Any]:
+    from watcher.main import HotFolderHandler
+
+    handler = HotFolderHandler()
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=config.ingest_threads, thread_name_prefix="bench-ingest") as pool:
+        list(pool.map(lambda p: handler.ingest(str(p)), files))
+    elapsed = time.perf_counter() - start
+    handler.shutdown()
+
+    size = sum(p.stat().st_size for p in files)
+    return {
+        "files": len(files),
+        "bytes": size,
+        "seconds": elapsed,
+        "files_per_sec": len(files) / elapsed if elapsed else 0.0,
+        "mb_per_sec": size / 1e6 / elapsed if elapsed else 0.0,
+    }
+
+
+def _process(timeout: float) -> Dict[str, Any]:
+    from core.queue import job_queue
+    from watcher.processor import ProcessManager
+
+    start = time.perf_counter()
+    manager = ProcessManager()
+    try:
+        while job_queue.pending() and time.perf_counter() - start < timeout:
+            time.sleep(0.2)
+        elapsed = time.perf_counter() - start
+        timed_out = bool(job_queue.pending())
+    finally:
+        manager.shutdown(wait=True)
+    return {"seconds": elapsed, "timed_out": timed_out, "workers": manager.max_workers}
+
+
+def _collect(process_seconds: float) -> Dict[str, Any]:
+    """Throughput, latency and failure figures from the benchmark database."""
+    from sqlalchemy import func, select
+    from core.database import Batch, Field, Job, JobStatus, Page, ProcessingStatus, SessionLocal
+    from core.timings import percentile, summarize
+
+    session = SessionLocal()
+    try:
+        batches = session.execute(
+            select(Batch.status, Batch.created_at, Batch.processed_at, Batch.stage_timings)
+        ).all()
+        pages = session.scalar(select(func.count(Page.id))) or 0
+        fields = session.scalar(select(func.count(Field.id))) or 0
+        dead_jobs = session.scalar(select(func.count(Job.id)).where(Job.status == JobStatus.DEAD)) or 0
+    finally:
+        session.close()
+
+    completed = [b for b in batches if b.status == ProcessingStatus.COMPLETED]
+    timings = [b.stage_timings for b in completed if b.stage_timings]
+    processing = sorted(t["total"] for t in timings if "total" in t)
+    latency = sorted(
+        (b.processed_at.replace(tzinfo=None) - b.created_at.replace(tzinfo=None)).total_seconds()
+        for b in completed if b.processed_at and b.created_at
+    )
+    db_write_seconds = sum(t.get("db_write", 0.0) for t in timings)
+
+    def _dist(values: List[float]) -> Dict[str, float]:
+        return {"p50": percentile(values, 50), "p95": percentile(values, 95),
+                "max": values[-1] if values else 0.0}
+
+    return {
+        "batches": {
+            "total": len(batches),
+            "completed": len(completed),
+            "error": sum(1 for b in batches if b.status == ProcessingStatus.ERROR),
+            "unfinished": sum(1 for b in batches if b.status in (ProcessingStatus.PENDING,
+                                                                ProcessingStatus.PROCESSING)),
+            "dead_jobs": dead_jobs,
+        },
+        "pages": pages,
+        "pages_per_sec": pages / process_seconds if process_seconds else 0.0,
+        "batch_processing_seconds": _dist(processing),
+        "end_to_end_latency_seconds": _dist(latency),
+        "db_write": {
+            "rows": pages + fields,
+            "seconds": db_write_seconds,
+            "rows_per_sec": (pages + fields) / db_write_seconds if db_write_seconds else 0.0,
+        },
+        "stages": summarize(timings),
+    }
+
+
+def run(args) -> Dict[str, Any]:
+    workdir = Path(args.workdir).resolve()
+    for stale in ("hot", "storage"):  # Fresh database and folders; a generated corpus is kept
+        shutil.rmtree(workdir / stale, ignore_errors=True)
+    workdir.mkdir(parents=True, exist_ok=True)
+    _configure(workdir, args)
+
+    corpus_dir = Path(args.corpus).resolve() if args.corpus else workdir / "corpus"
+    manifest_path = corpus_dir / "manifest.json"
+    if args.corpus and manifest_path.exists():
+        manifest = json.loads(manifest_path.read_text())
+    else:
+        manifest = generate_corpus(str(corpus_dir), args.files, args.seed, args.mix)
+
+    # Imported only now: the engine is created from the overridden database_url
+    from core.database import init_db
+    init_db()
+
+    hot = Path(config.hot_folder)
+    files = []
+    for entry in manifest["entries"]:
+        target = hot / entry["file"]
+        shutil.copyfile(corpus_dir / entry["file"], target)
+        files.append(target)
+
+    ingest = _ingest(files)
+    process = _process(args.timeout)
+    results = _collect(process["seconds"])
+
+    return {
+        "version": REPORT_VERSION,
+        "started_at": datetime.now(timezone.utc).isoformat(),
+        "environment": _environment(),
+        "settings": {
+            "ingest_threads": config.ingest_threads,
+            "parallel_workers": config.parallel_workers,
+            "ocr_processes": config.ocr_processes,
+            "ocr_threads_per_process": config.ocr_threads_per_process,
+            "hash_algorithm": config.hash_algorithm,
+            "text_layer_first": config.text_layer_first,
+            "ocr_engine": config.ocr_engine,
+            "ocr_preprocessing": config.ocr_preprocessing if config.ocr_preprocessing_enabled else None,
+        },
+        "corpus": {k: manifest[k] for k in ("seed", "files", "pages", "bytes", "kinds", "fingerprint")},
+        "ingest": ingest,
+        "process": process,
+        "results": results,
+    }
+
+
+def main() -> None:
+    import argparse
+    import logging
+
+    parser = argparse.ArgumentParser(description="Benchmark the invoice processing pipeline")
+    parser.add_argument("--files", type=int, default=100, help="Corpus size")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--mix", type=parse_weights, default=None,
+                        help=f"Corpus kind weights (default: {','.join(f'{k}={v}' for k, v in DEFAULT_WEIGHTS.items())})")
+    parser.add_argument("--corpus", help="Reuse a corpus generated by benchmarks.corpus")
+    parser.add_argument("--workdir", default=str(config.PROJECT_ROOT / "storage" / "benchmark"))
+    parser.add_argument("--workers", type=int, help="Batch worker threads (parallel_workers)")
+    parser.add_argument("--ocr-processes", type=int, help="OCR pool processes (ocr_processes)")
+    parser.add_argument("--ingest-threads", type=int, help="Ingest threads (ingest_threads)")
+    parser.add_argument("--timeout", type=float, default=3600, help="Max seconds to wait for processing")
+    parser.add_argument("--output", "-o", default="benchmark.json")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    report = run(args)
+    Path(args.output).write_text(json.dumps(report, indent=2, default=str))
+
+    results = report["results"]
+    print(
+        f"{report['corpus']['files']} files / {results['pages']} pages: "
+        f"ingest {report['ingest']['files_per_sec']:.1f} files/s ({report['ingest']['mb_per_sec']:.1f} MB/s), "
+        f"{results['pages_per_sec']:.2f} pages/s, "
+        f"batch p50/p95 {results['batch_processing_seconds']['p50']:.2f}/"
+        f"{results['batch_processing_seconds']['p95']:.2f}s, "
+        f"{results['batches']['error']} errors -> {args.output}"
+    )
+
+
+if __name__ == "__main__":
+    main()
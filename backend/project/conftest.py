@@ -0,0 +1,79 @@
+# conftest.py
+"""
+Shared pytest setup.
+
+Every path and the database are pointed at a throwaway directory with
+config.override() (never saved to config.json) before any test module
+imports core.database, so the tests don't touch storage/.
+
+    python -m pytest -q
+
+core/test_config.py and core/test_db.py are print-style scripts that do
+their work at import (reload core.config, rewrite config.json and storage/,
+drop the configured database), so they are not collected; run them directly.
+"""
+
+import shutil
+import tempfile
+from pathlib import Path
+
+import pytest
+
+from core.config import config
+
+_WORKDIR = Path(tempfile.mkdtemp(prefix="invoice-tests-"))
+config.override({
+    "hot_folder": str(_WORKDIR / "hot"),
+    "processed_folder": str(_WORKDIR / "processed"),
+    "error_folder": str(_WORKDIR / "errors"),
+    "archive_folder": str(_WORKDIR / "archive"),
+    "temp_folder": str(_WORKDIR / "temp_processing"),
+    "dedupe_index_path": str(_WORKDIR / "dedupe.idx"),
+    "ocr_cache_dir": str(_WORKDIR / "ocr_cache"),
+    "database_url": f"sqlite:///{_WORKDIR / 'test.db'}",
+    "metrics_port": 0,
+})
+
+collect_ignore = ["core/test_config.py", "core/test_db.py"]
+
+
+def pytest_sessionfinish(session, exitstatus):
+    shutil.rmtree(_WORKDIR, ignore_errors=True)
+
+
+@pytest.fixture
+def db():
+    """A session on an empty schema."""
+    from sqlalchemy import text
+
+    from core.database import SessionLocal, engine, init_db
+
+    init_db(drop_all=True)
+    with engine.begin() as conn:
+        conn.execute(text("DELETE FROM search_index"))  # Not part of Base.metadata
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+
+
+@pytest.fixture
+def override_config():
+    """
+    config.override() for one test: call it with a dict of values, which are
+    put back afterwards. Uses the current core.config.config, whatever
+    imported it first.
+    """
+    import core.config
+
+    current = core.config.config
+    previous = {}
+
+    def override(values):
+        for key in values:
+            previous.setdefault(key, current.get(key))
+        current.override(values)
+
+    yield override
+    current.override(previous)
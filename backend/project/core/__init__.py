@@ -0,0 +1,2 @@
+# core/__init__.py
+"""Configuration, database, queue and shared services."""
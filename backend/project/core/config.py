@@ -9,6 +9,7 @@ to sensible defaults, and automatically creates required directories.
 
 import json
 import logging
+import os
 from pathlib import Path
 from typing import Any, Dict, List
 from typing import cast
@@ -35,6 +36,35 @@ class Config:
     PROJECT_ROOT = Path(__file__).parent.parent.resolve()
     CONFIG_FILE = PROJECT_ROOT / "config.json"
 
+    DEFAULT_SQLITE_PRAGMAS: Dict[str, Any] = {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "busy_timeout": 5000,           # ms to wait on a locked database
+        "mmap_size": 268435456,         # 256 MB memory-mapped I/O
+        "cache_size": -65536,           # negative = KiB, i.e. 64 MB page cache
+        "foreign_keys": "ON",
+    }
+
+    # OCR input preprocessing per ocr_engine (see watcher/preprocess.py)
+    DEFAULT_OCR_PREPROCESSING: Dict[str, Dict[str, Any]] = {
+        "tesseract": {
+            "dpi": 300,                 # effective resolution handed to the engine
+            "max_megapixels": 12,       # cap for oversized pages
+            "grayscale": True,
+            "binarize": True,           # Otsu threshold
+            "deskew": True,
+            "crop_margins": True,
+        },
+        "easyocr": {
+            "dpi": 200, "max_megapixels": 8,
+            "grayscale": True, "binarize": False, "deskew": True, "crop_margins": True,
+        },
+        "google_vision": {
+            "dpi": 200, "max_megapixels": 20,
+            "grayscale": False, "binarize": False, "deskew": False, "crop_margins": False,
+        },
+    }
+
     def __new__(cls) -> "Config":
         """Implement singleton pattern."""
         if cls._instance is None:
@@ -45,6 +75,7 @@ class Config:
     def __init__(self) -> None:
         """Initialize only once."""
         if not getattr(self, "_initialized", False):
+            self._overrides: Dict[str, Any] = {}
             self._load_config()
             self._initialized = True
 
@@ -57,20 +88,74 @@ class Config:
             "archive_folder": str(self.PROJECT_ROOT / "storage" / "archive"),
             "temp_folder": str(self.PROJECT_ROOT / "storage" / "temp_processing"),
             "database_url": f"sqlite:///{self.PROJECT_ROOT / 'storage' / 'database.db'}",
+
+            # SQLite: applied to every connection (see core/database.py)
+            "sqlite_pragmas": dict(self.DEFAULT_SQLITE_PRAGMAS),
+            # PostgreSQL and other server backends: connection pool
+            "db_pool_size": 10,
+            "db_max_overflow": 20,
+            "db_pool_timeout": 30,              # seconds to wait for a connection
+            "db_pool_recycle": 1800,            # seconds before a connection is replaced
+
             "extraction_engine": "rule_based",  # rule_based, ml_based, hybrid
+            "extraction_templates_dir": str(self.PROJECT_ROOT / "watcher" / "templates"),  # watcher/rules.py
             "ocr_engine": "tesseract",          # tesseract, easyocr, google_vision
             "watch_subfolders": False,
             "file_patterns": ["*.pdf", "*.jpg", "*.jpeg", "*.png", "*.tiff", "*.tif"],
             "poll_interval": 5,                 # seconds between folder scans
+            "stability_check_interval": 1.0,    # seconds between size/mtime checks of new files
+            "stability_checks": 2,              # unchanged checks before a file counts as complete
+            "ingest_threads": 2,                # threads hashing/recording complete files
+            "hash_algorithm": "blake2b",        # blake2b | sha256 | md5 | xxh3_128 (needs xxhash)
+            "dedupe_index_path": str(self.PROJECT_ROOT / "storage" / "dedupe.idx"),
+            "dedupe_capacity": 1_000_000,       # files before the Bloom filters are resized
+            "dedupe_false_positive_rate": 0.001,
             "max_file_size_mb": 50,
             "api_host": "0.0.0.0",
             "api_port": 8000,
             "log_level": "INFO",
+            "metrics_port": 9101,               # watcher/worker /metrics endpoint (0 = disabled)
             "enable_notifications": False,
             "notification_email": "",
             "auto_start_processing": True,
             "parallel_workers": 2,
 
+            # Durable job queue (see core/queue.py)
+            "queue_lease_seconds": 300,         # visibility timeout of a leased job
+            "queue_max_attempts": 3,
+            "queue_retry_backoff_seconds": 30,  # doubled after every failed attempt
+            "queue_poll_interval": 1.0,         # seconds an idle worker waits between polls
+            "embedded_workers": True,           # False: watcher only ingests; run watcher.worker
+            "queue_max_pending": 1000,          # admission limit on queued + leased jobs (0 = unbounded)
+            "queue_priority": "fifo",           # fifo, small_first, subfolder
+            "queue_subfolder_priorities": {},   # subfolder policy: {"urgent": -10, "bulk": 10}
+
+            # Text-layer-first PDF extraction (skip OCR for born-digital pages)
+            "text_layer_first": True,
+            "text_layer_min_chars": 30,
+            "text_layer_max_garbage_ratio": 0.1,
+            "text_layer_min_glyph_coverage": 0.02,
+
+            # Page-level OCR process pool (0 = one process per CPU)
+            "ocr_processes": 0,
+            "ocr_threads_per_process": 1,
+            "ocr_language": "eng",              # Tesseract language(s), e.g. "eng+deu"
+
+            # OCR input normalization: render/resample DPI, grayscale, binarize,
+            # deskew, crop (per engine; user values override key by key)
+            "ocr_preprocessing_enabled": True,
+            "ocr_preprocessing": {engine: dict(p) for engine, p in self.DEFAULT_OCR_PREPROCESSING.items()},
+
+            # Content-addressed OCR result cache (see watcher/ocr_cache.py)
+            "ocr_cache_enabled": True,
+            "ocr_cache_dir": str(self.PROJECT_ROOT / "storage" / "ocr_cache"),
+            "ocr_cache_max_mb": 512,            # LRU eviction above this size
+
+            # Page previews for the UI, written off the OCR hot path
+            "preview_format": "jpeg",          # jpeg, webp, png, none
+            "preview_max_width": 1200,          # pixels; 0 = keep render size
+            "preview_quality": 80,
+
             # === ADD THESE LINES ===
             "allowed_origins": [
                 "http://localhost:3000",
@@ -113,6 +198,9 @@ class Config:
             "error_folder",
             "archive_folder",
             "temp_folder",
+            "dedupe_index_path",
+            "ocr_cache_dir",
+            "extraction_templates_dir",
         ]
         for key in path_keys:
             if key in self._config:
@@ -176,10 +264,24 @@ class Config:
         self._config.update(updates)
         self._save_config()
 
+    def override(self, updates: Dict[str, Any]) -> None:
+        """
+        Change values for this process only, without saving to disk
+        (benchmarks, tools). OCR pool processes re-apply them on start-up.
+        """
+        self._overrides.update(updates)
+        self._config.update(updates)
+
+    @property
+    def overrides(self) -> Dict[str, Any]:
+        """Values set with override() in this process."""
+        return dict(self._overrides)
+
     def reload(self) -> None:
         """Force reload configuration from disk (useful after external edit)."""
         logger.info("Reloading configuration from disk...")
         self._load_config()
+        self._config.update(self._overrides)
 
     # ================================================================
     # Convenience Properties
@@ -209,10 +311,35 @@ class Config:
     def database_url(self) -> str:
         return cast(str, self.get("database_url"))
 
+    @property
+    def sqlite_pragmas(self) -> Dict[str, Any]:
+        """SQLite PRAGMAs; user values override the defaults key by key."""
+        return {**self.DEFAULT_SQLITE_PRAGMAS, **(self.get("sqlite_pragmas") or {})}
+
+    @property
+    def db_pool_size(self) -> int:
+        return max(1, int(self.get("db_pool_size", 10)))
+
+    @property
+    def db_max_overflow(self) -> int:
+        return max(0, int(self.get("db_max_overflow", 20)))
+
+    @property
+    def db_pool_timeout(self) -> int:
+        return int(self.get("db_pool_timeout", 30))
+
+    @property
+    def db_pool_recycle(self) -> int:
+        return int(self.get("db_pool_recycle", 1800))
+
     @property
     def extraction_engine(self) -> str:
         return cast(str, self.get("extraction_engine", "rule_based"))
 
+    @property
+    def extraction_templates_dir(self) -> str:
+        return cast(str, self.get("extraction_templates_dir"))
+
     @property
     def ocr_engine(self) -> str:
         return cast(str, self.get("ocr_engine", "tesseract"))
@@ -225,6 +352,38 @@ class Config:
     def poll_interval(self) -> int:
         return int(self.get("poll_interval", 5))
 
+    @property
+    def auto_start_processing(self) -> bool:
+        return bool(self.get("auto_start_processing", True))
+
+    @property
+    def stability_check_interval(self) -> float:
+        return float(self.get("stability_check_interval", 1.0))
+
+    @property
+    def stability_checks(self) -> int:
+        return max(1, int(self.get("stability_checks", 2)))
+
+    @property
+    def ingest_threads(self) -> int:
+        return max(1, int(self.get("ingest_threads", 2)))
+
+    @property
+    def hash_algorithm(self) -> str:
+        return str(self.get("hash_algorithm", "blake2b")).lower()
+
+    @property
+    def dedupe_index_path(self) -> str:
+        return cast(str, self.get("dedupe_index_path"))
+
+    @property
+    def dedupe_capacity(self) -> int:
+        return max(1000, int(self.get("dedupe_capacity", 1_000_000)))
+
+    @property
+    def dedupe_false_positive_rate(self) -> float:
+        return min(0.5, max(1e-9, float(self.get("dedupe_false_positive_rate", 0.001))))
+
     @property
     def max_file_size_mb(self) -> int:
         return int(self.get("max_file_size_mb", 50))
@@ -248,6 +407,109 @@ class Config:
     @property
     def watch_subfolders(self) -> bool:
         return bool(self.get("watch_subfolders", False))
+
+    @property
+    def queue_lease_seconds(self) -> int:
+        return max(10, int(self.get("queue_lease_seconds", 300)))
+
+    @property
+    def queue_max_attempts(self) -> int:
+        return max(1, int(self.get("queue_max_attempts", 3)))
+
+    @property
+    def queue_retry_backoff_seconds(self) -> float:
+        return float(self.get("queue_retry_backoff_seconds", 30))
+
+    @property
+    def queue_poll_interval(self) -> float:
+        return float(self.get("queue_poll_interval", 1.0))
+
+    @property
+    def metrics_port(self) -> int:
+        return int(self.get("metrics_port", 9101))
+
+    @property
+    def queue_max_pending(self) -> int:
+        return int(self.get("queue_max_pending", 1000))
+
+    @property
+    def queue_priority(self) -> str:
+        return str(self.get("queue_priority", "fifo")).lower()
+
+    @property
+    def queue_subfolder_priorities(self) -> Dict[str, int]:
+        return dict(self.get("queue_subfolder_priorities") or {})
+
+    @property
+    def embedded_workers(self) -> bool:
+        """Whether the watcher processes jobs itself, or only ingests files."""
+        return bool(self.get("embedded_workers", True))
+
+    @property
+    def ocr_processes(self) -> int:
+        """Size of the OCR process pool; 0 (default) means one per CPU."""
+        processes = int(self.get("ocr_processes", 0))
+        return processes if processes > 0 else max(1, os.cpu_count() or 1)
+
+    @property
+    def ocr_threads_per_process(self) -> int:
+        """OMP_THREAD_LIMIT for each Tesseract invocation."""
+        return max(1, int(self.get("ocr_threads_per_process", 1)))
+
+    @property
+    def ocr_language(self) -> str:
+        return cast(str, self.get("ocr_language", "eng"))
+
+    @property
+    def ocr_preprocessing_enabled(self) -> bool:
+        return bool(self.get("ocr_preprocessing_enabled", True))
+
+    @property
+    def ocr_preprocessing(self) -> Dict[str, Any]:
+        """Preprocessing profile of the configured ocr_engine, defaults merged key by key."""
+        engine = self.ocr_engine
+        defaults = self.DEFAULT_OCR_PREPROCESSING.get(engine, self.DEFAULT_OCR_PREPROCESSING["tesseract"])
+        return {**defaults, **((self.get("ocr_preprocessing") or {}).get(engine) or {})}
+
+    @property
+    def ocr_cache_enabled(self) -> bool:
+        return bool(self.get("ocr_cache_enabled", True))
+
+    @property
+    def ocr_cache_dir(self) -> str:
+        return cast(str, self.get("ocr_cache_dir"))
+
+    @property
+    def ocr_cache_max_mb(self) -> int:
+        return max(0, int(self.get("ocr_cache_max_mb", 512)))
+
+    @property
+    def preview_format(self) -> str:
+        return cast(str, self.get("preview_format", "jpeg")).lower()
+
+    @property
+    def preview_max_width(self) -> int:
+        return max(0, int(self.get("preview_max_width", 1200)))
+
+    @property
+    def preview_quality(self) -> int:
+        return min(100, max(1, int(self.get("preview_quality", 80))))
+
+    @property
+    def text_layer_first(self) -> bool:
+        return bool(self.get("text_layer_first", True))
+
+    @property
+    def text_layer_min_chars(self) -> int:
+        return int(self.get("text_layer_min_chars", 30))
+
+    @property
+    def text_layer_max_garbage_ratio(self) -> float:
+        return float(self.get("text_layer_max_garbage_ratio", 0.1))
+
+    @property
+    def text_layer_min_glyph_coverage(self) -> float:
+        return float(self.get("text_layer_min_glyph_coverage", 0.02))
     
     @property
     def allowed_origins(self) -> List[str]:
@@ -7,22 +7,25 @@ Defines the full relational schema:
     batches ↔ documents ↔ pages ↔ fields
 
 Features:
-- Duplicate prevention via file_hash (SHA256)
+- Duplicate prevention via file_hash ("<algorithm>:<hex>") + quick_hash prefilter
 - Full audit trail (created_at, processed_at, processing_time)
 - JSON columns for flexible metadata/coordinates
 - Proper cascading deletes
 - Performance indexes on common query fields
 - Thread-safe session factory
+- Backend-aware engine (SQLite WAL + pragmas, pooled PostgreSQL)
 """
 
 from __future__ import annotations
 
 import enum
-from datetime import datetime
+import logging
+from datetime import datetime, timezone
 from typing import List, Optional
 
 from sqlalchemy import (
     create_engine,
+    event,
     Column,
     Integer,
     String,
@@ -35,7 +38,13 @@ from sqlalchemy import (
     ForeignKey,
     Index,
     func,
+    inspect,
+    insert,
+    select,
+    text,
 )
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import (
     DeclarativeBase,
     Mapped,
@@ -43,8 +52,13 @@ from sqlalchemy.orm import (
     relationship,
     sessionmaker,
 )
+from sqlalchemy.pool import QueuePool, StaticPool
+from sqlalchemy.sql.sqltypes import SchemaType
+
 from core.config import config
 
+logger = logging.getLogger(__name__)
+
 # =============================================================================
 # SQLAlchemy 2.0+ Base & Session
 # =============================================================================
@@ -55,15 +69,57 @@ class Base(DeclarativeBase):
     pass
 
 
+def _set_sqlite_pragmas(dbapi_connection, connection_record) -> None:
+    """Apply the configured PRAGMAs to every new SQLite connection."""
+    cursor = dbapi_connection.cursor()
+    try:
+        for name, value in config.sqlite_pragmas.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+    finally:
+        cursor.close()
+
+
+def create_db_engine(url: str) -> Engine:
+    """
+    Backend-aware engine factory.
+
+    SQLite:
+        - WAL journaling so readers (API) don't block the writer (workers)
+        - synchronous, busy_timeout, mmap_size, cache_size and foreign_keys
+          from `sqlite_pragmas`, applied on every new connection
+        - connections may be shared across threads (watcher/worker pools)
+        - in-memory databases use a single static connection
+
+    Other backends (PostgreSQL):
+        - real QueuePool sized by db_pool_size / db_max_overflow
+        - pre-ping and recycle to survive server-side connection drops
+    """
+    if url.startswith("sqlite"):
+        busy_timeout_ms = int(config.sqlite_pragmas.get("busy_timeout", 5000))
+        kwargs = {
+            "connect_args": {"check_same_thread": False, "timeout": busy_timeout_ms / 1000},
+        }
+        if ":memory:" in url or url in ("sqlite://", "sqlite:///"):
+            kwargs["poolclass"] = StaticPool
+
+        sqlite_engine = create_engine(url, echo=False, **kwargs)
+        event.listen(sqlite_engine, "connect", _set_sqlite_pragmas)
+        return sqlite_engine
+
+    return create_engine(
+        url,
+        echo=False,  # Set to True only in debug mode
+        poolclass=QueuePool,
+        pool_pre_ping=True,
+        pool_size=config.db_pool_size,
+        max_overflow=config.db_max_overflow,
+        pool_timeout=config.db_pool_timeout,
+        pool_recycle=config.db_pool_recycle,
+    )
+
+
 # Thread-local session factory
-engine = create_engine(
-    config.database_url,
-    echo=False,  # Set to True only in debug mode
-    future=True,  # Enables SQLAlchemy 2.0 behavior
-    pool_pre_ping=True,
-    pool_size=10,
-    max_overflow=20,
-)
+engine = create_db_engine(config.database_url)
 
 SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False, expire_on_commit=False)
 
@@ -84,9 +140,126 @@ def init_db(drop_all: bool = False) -> None:
     Args:
         drop_all: If True, drops all tables first (use only in tests!)
     """
+    from core.search import init_search_index  # Imports the models defined below
+
     if drop_all:
         Base.metadata.drop_all(bind=engine)
     Base.metadata.create_all(bind=engine)
+    migrate_schema(engine)
+    init_search_index(engine)
+
+
+def migrate_schema(bind: Engine) -> None:
+    """
+    Bring tables created by an older version up to the current models.
+
+    `create_all` only creates missing tables, so this adds missing columns
+    (all nullable or server-defaulted), widens String columns that grew
+    (not needed on SQLite, which ignores lengths) and creates missing
+    indexes. Idempotent: a current schema is left untouched.
+
+    Then applies the one-off data migrations (`DATA_MIGRATIONS`) this
+    database hasn't had yet, each recorded in `schema_migrations` so that
+    later starts don't rescan the tables.
+    """
+    with bind.begin() as conn:
+        inspector = inspect(conn)
+        for table in Base.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing = {c["name"]: c for c in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in existing:
+                    _add_column(conn, column)
+                elif bind.dialect.name != "sqlite":
+                    _widen_column(conn, column, existing[column.name]["type"])
+
+            indexes = {ix["name"] for ix in inspector.get_indexes(table.name)}
+            for index in table.indexes:
+                if index.name not in indexes:
+                    logger.info(f"Creating index {index.name}")
+                    index.create(conn)
+
+    with bind.connect() as conn:
+        applied = set(conn.scalars(select(SchemaMigration.name)))
+    for name, migration in DATA_MIGRATIONS:
+        if name in applied:
+            continue
+        try:
+            with bind.begin() as conn:
+                migration(conn)
+                conn.execute(insert(SchemaMigration).values(name=name, applied_at=utcnow()))
+            logger.info(f"Applied data migration {name}")
+        except IntegrityError:
+            logger.info(f"Data migration {name} was applied by another process")
+
+
+def _add_column(conn: Connection, column: Column) -> None:
+    if isinstance(column.type, SchemaType):
+        column.type.create(conn, checkfirst=True)  # e.g. a PostgreSQL ENUM type
+    ddl = f"ALTER TABLE {column.table.name} ADD COLUMN {column.name} {column.type.compile(conn.dialect)}"
+    if column.server_default is not None:
+        ddl += f" DEFAULT {_default_sql(conn, column)}"
+    logger.info(f"Adding column {column.table.name}.{column.name}")
+    conn.execute(text(ddl))
+
+
+def _widen_column(conn: Connection, column: Column, current) -> None:
+    length = getattr(column.type, "length", None)
+    current_length = getattr(current, "length", None)
+    if length and current_length and current_length < length:
+        logger.info(f"Widening column {column.table.name}.{column.name} to {length}")
+        conn.execute(text(
+            f"ALTER TABLE {column.table.name} ALTER COLUMN {column.name} "
+            f"TYPE {column.type.compile(conn.dialect)}"
+        ))
+
+
+def _normalize_sqlite_datetimes(conn: Connection) -> None:
+    """
+    SQLite stores datetimes as text and compares them as text. Rows that got
+    their timestamp from CURRENT_TIMESTAMP ("YYYY-MM-DD HH:MM:SS") don't
+    compare correctly with values written from Python (".ffffff" appended),
+    which breaks keyset pagination; give them the Python format. New rows
+    get theirs from Python (`utcnow`), so this is needed once.
+    """
+    if conn.dialect.name != "sqlite":
+        return
+    for table in Base.metadata.sorted_tables:
+        for column in table.columns:
+            if isinstance(column.type, DateTime) and column.server_default is not None:
+                conn.execute(text(
+                    f"UPDATE {table.name} SET {column.name} = {column.name} || '.000000' "
+                    f"WHERE length({column.name}) = 19"
+                ))
+
+
+def _prefix_legacy_file_hashes(conn: Connection) -> None:
+    """Hashes stored before the "<algorithm>:<hex>" format were bare MD5 hex digests."""
+    updated = conn.execute(text(
+        "UPDATE batches SET file_hash = 'md5:' || file_hash WHERE file_hash NOT LIKE '%:%'"
+    )).rowcount
+    if updated:
+        logger.info(f"Prefixed {updated} legacy MD5 file hash(es) with 'md5:'")
+
+
+# One-off data migrations, applied in order, once per database (see migrate_schema)
+DATA_MIGRATIONS = [
+    ("sqlite_datetime_format", _normalize_sqlite_datetimes),
+    ("md5_file_hash_prefix", _prefix_legacy_file_hashes),
+]
+
+
+def _default_sql(conn: Connection, column: Column) -> str:
+    arg = column.server_default.arg
+    if isinstance(arg, str):
+        return "'" + arg.replace("'", "''") + "'"
+    return str(arg.compile(dialect=conn.dialect))
+
+
+def utcnow() -> datetime:
+    """Timestamp default written from Python, so every row has the same stored format."""
+    return datetime.now(timezone.utc)
 
 
 # =============================================================================
@@ -103,6 +276,18 @@ class ProcessingStatus(enum.StrEnum):
     ERROR = "error"
 
 
+class JobStatus(enum.StrEnum):
+    QUEUED = "queued"      # Waiting for a worker (possibly delayed by retry backoff)
+    LEASED = "leased"      # Claimed by a worker; lease renewed by heartbeats
+    DONE = "done"
+    DEAD = "dead"          # Dead-letter: retries exhausted or permanent failure
+
+
+class ExtractionMethod(enum.StrEnum):
+    TEXT_LAYER = "text_layer"
+    OCR = "ocr"
+
+
 class DocumentType(enum.StrEnum):
     INVOICE = "invoice"
     RECEIPT = "receipt"
@@ -123,15 +308,17 @@ class Batch(Base):
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     filename: Mapped[str] = mapped_column(String, nullable=False, index=True)
     original_path: Mapped[str] = mapped_column(String, nullable=False)
-    file_hash: Mapped[str] = mapped_column(String(64), unique=True, nullable=False, index=True)
+    file_hash: Mapped[str] = mapped_column(String(80), unique=True, nullable=False, index=True)  # "<algorithm>:<hex>"
+    quick_hash: Mapped[Optional[str]] = mapped_column(String(64), index=True)  # "<size>:<head/tail digest>"
     file_size: Mapped[Optional[int]] = mapped_column(Integer)  # bytes
 
     status: Mapped[ProcessingStatus] = mapped_column(
         SQLEnum(ProcessingStatus), default=ProcessingStatus.PENDING, index=True
     )
-    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=utcnow, server_default=func.now())
     processed_at: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True), nullable=True)
     processing_time: Mapped[Optional[float]] = mapped_column(Float, nullable=True)  # seconds
+    stage_timings: Mapped[Optional[dict]] = mapped_column(JSON, nullable=True)  # stage -> seconds
     error_message: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
 
     # Relationships
@@ -144,7 +331,7 @@ class Batch(Base):
 
     __table_args__ = (
         Index("ix_batches_status_created", status, created_at.desc()),
-        Index("ix_batches_file_hash", file_hash),
+        Index("ix_batches_created_id", created_at.desc(), id.desc()),  # Keyset pagination
     )
 
     def __repr__(self) -> str:
@@ -158,7 +345,7 @@ class Document(Base):
     __tablename__ = "documents"
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
-    batch_id: Mapped[int] = mapped_column(ForeignKey("batches.id", ondelete="CASCADE"))
+    batch_id: Mapped[int] = mapped_column(ForeignKey("batches.id", ondelete="CASCADE"), index=True)
 
     doc_type: Mapped[DocumentType] = mapped_column(
         SQLEnum(DocumentType), default=DocumentType.UNKNOWN, index=True
@@ -194,6 +381,10 @@ class Page(Base):
     original_text: Mapped[Optional[str]] = mapped_column(Text)
     processed_text: Mapped[Optional[str]] = mapped_column(Text)
     ocr_confidence: Mapped[Optional[float]] = mapped_column(Float)
+    extraction_method: Mapped[Optional[ExtractionMethod]] = mapped_column(
+        SQLEnum(ExtractionMethod), nullable=True, index=True
+    )
+    timings: Mapped[Optional[dict]] = mapped_column(JSON, nullable=True)  # stage -> seconds
 
     # Relationships
     document: Mapped[Document] = relationship("Document", back_populates="pages")
@@ -203,6 +394,13 @@ class Page(Base):
         cascade="all, delete-orphan",
         lazy="selectin",
     )
+    line_items: Mapped[List["LineItem"]] = relationship(
+        "LineItem",
+        back_populates="page",
+        cascade="all, delete-orphan",
+        order_by="LineItem.row_number",
+        lazy="selectin",
+    )
 
     __table_args__ = (Index("ix_pages_document_page", document_id, page_number),)
 
@@ -225,6 +423,79 @@ class Field(Base):
     page: Mapped[Page] = relationship("Page", back_populates="fields")
 
     __table_args__ = (
-        Index("ix_fields_name", name),
         Index("ix_fields_page_name", page_id, name),
-    )
\ No newline at end of file
+    )
+
+
+class LineItem(Base):
+    """One invoice table row, from word-box geometry (watcher/tables.py)."""
+    __tablename__ = "line_items"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    page_id: Mapped[int] = mapped_column(ForeignKey("pages.id", ondelete="CASCADE"))
+    row_number: Mapped[int] = mapped_column(Integer, nullable=False)  # 1-indexed within the page
+
+    description: Mapped[Optional[str]] = mapped_column(Text)
+    quantity: Mapped[Optional[float]] = mapped_column(Float)
+    unit_price: Mapped[Optional[float]] = mapped_column(Float)
+    amount: Mapped[Optional[float]] = mapped_column(Float)
+    confidence: Mapped[Optional[float]] = mapped_column(Float)
+    coordinates: Mapped[Optional[dict]] = mapped_column(JSON, nullable=True)  # row box
+
+    page: Mapped[Page] = relationship("Page", back_populates="line_items")
+
+    __table_args__ = (
+        Index("ix_line_items_page_row", page_id, row_number),
+    )
+
+
+class Job(Base):
+    """
+    Durable work item for the processing queue (see core/queue.py).
+
+    A job is leased by one worker at a time; if the worker dies the lease
+    expires (visibility timeout) and another worker picks the job up.
+    """
+    __tablename__ = "jobs"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    batch_id: Mapped[int] = mapped_column(ForeignKey("batches.id", ondelete="CASCADE"), index=True)
+
+    status: Mapped[JobStatus] = mapped_column(SQLEnum(JobStatus), default=JobStatus.QUEUED)
+    attempts: Mapped[int] = mapped_column(Integer, default=0, server_default="0")
+    max_attempts: Mapped[int] = mapped_column(Integer, default=3, server_default="3")
+    priority: Mapped[int] = mapped_column(Integer, default=0, server_default="0")  # lower runs first
+    available_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=utcnow, server_default=func.now())
+
+    lease_owner: Mapped[Optional[str]] = mapped_column(String(100), nullable=True)
+    lease_expires_at: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True), nullable=True)
+    heartbeat_at: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True), nullable=True)
+
+    last_error: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=utcnow, server_default=func.now())
+    finished_at: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True), nullable=True)
+
+    __table_args__ = (
+        Index("ix_jobs_status_priority_available", status, priority, available_at),  # claim order
+        Index("ix_jobs_status_lease", status, lease_expires_at),
+        # At most one active job per batch, even when enqueued concurrently
+        Index(
+            "ux_jobs_active_batch", batch_id, unique=True,
+            sqlite_where=status.in_([JobStatus.QUEUED, JobStatus.LEASED]),
+            postgresql_where=status.in_([JobStatus.QUEUED, JobStatus.LEASED]),
+        ),
+    )
+
+    def __repr__(self) -> str:
+        return f"<Job id={self.id} batch={self.batch_id} status='{self.status}' attempts={self.attempts}>"
+
+
+class SchemaMigration(Base):
+    """A one-off data migration already applied to this database (see migrate_schema)."""
+    __tablename__ = "schema_migrations"
+
+    name: Mapped[str] = mapped_column(String(100), primary_key=True)
+    applied_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=utcnow)
+
+    def __repr__(self) -> str:
+        return f"<SchemaMigration name='{self.name}' applied_at={self.applied_at}>"
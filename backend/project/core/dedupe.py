@@ -0,0 +1,279 @@
+"""
+core/dedupe.py
+
+Bounded-memory duplicate index for incoming files.
+
+Instead of holding every Batch.file_hash ever recorded in a Python set,
+each process keeps two Bloom filters (full hashes and quick signatures,
+a few MB for a million files) persisted to `dedupe_index_path`:
+
+- "definitely new": answered from memory, no database access
+- "maybe seen": confirmed with one lookup on the unique file_hash index
+
+Rows hashed with another algorithm than `hash_algorithm` (MD5 digests from
+before the "<algorithm>:<hex>" format, prefixed "md5:" by init_db(), or a
+changed setting) are still matched: the index records which algorithms
+occur, `algorithms()` tells ingest to compute those digests too (same read
+pass) and `is_duplicate()` checks them as aliases. Older rows have no quick
+signature, so aliases skip that filter.
+
+The database stays the source of truth. The unique constraint on
+Batch.file_hash is what finally rejects a duplicate, so races between
+watcher processes (or hosts) that both miss in their filters are still
+caught, as an IntegrityError on insert.
+
+Persistence: the file stores the filter bits plus a watermark (highest
+Batch.id folded in). Startup loads the file and only reads batches newer
+than the watermark, so it does not depend on history size. A missing,
+corrupt or outgrown file is rebuilt from the database in one streaming
+pass. Processes on the same host share the file: each save re-syncs from
+the database first, so no process drops another's entries.
+"""
+
+import hashlib
+import json
+import logging
+import math
+import os
+import threading
+from pathlib import Path
+from typing import Optional, Sequence, Set, Tuple
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from core.config import config
+from core.database import Batch, SessionLocal
+
+logger = logging.getLogger(__name__)
+
+_MAGIC = b"DEDUPE1\n"
+_SAVE_EVERY = 1000  # adds between automatic saves
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter over string keys (double hashing on a BLAKE2b digest)."""
+
+    def __init__(self, num_bits: int, num_hashes: int, bits: Optional[bytearray] = None):
+        self.num_bits = num_bits
+        self.num_hashes = num_hashes
+        self.bits = bits if bits is not None else bytearray((num_bits + 7) // 8)
+
+    @classmethod
+    def for_capacity(cls, capacity: int, false_positive_rate: float) -> "BloomFilter":
+        capacity = max(1, capacity)
+        num_bits = math.ceil(-capacity * math.log(false_positive_rate) / math.log(2) ** 2)
+        num_hashes = max(1, round(num_bits / capacity * math.log(2)))
+        return cls(num_bits, num_hashes)
+
+    def _positions(self, key: str):
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        for i in range(self.num_hashes):
+            yield (h1 + i * h2) % self.num_bits
+
+    def add(self, key: str) -> None:
+        for pos in self._positions(key):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+
+    def __contains__(self, key: str) -> bool:
+        return all(self.bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(key))
+
+
+class DuplicateIndex:
+    """
+    Process-wide duplicate check for (file_hash, quick_hash) fingerprints.
+
+    Thread-safe. Use the module-level `duplicate_index`.
+    """
+
+    def __init__(self, path: Optional[str] = None, session_factory=SessionLocal):
+        self.path = Path(path or config.dedupe_index_path)
+        self.session_factory = session_factory
+        self._lock = threading.Lock()
+        self._loaded = False
+        self._hashes: Optional[BloomFilter] = None
+        self._signatures: Optional[BloomFilter] = None
+        self._algorithms: Set[str] = set()  # hash algorithms of the rows folded in
+        self._count = 0          # entries folded in
+        self._watermark = 0      # highest Batch.id folded in
+        self._capacity = 0
+        self._unsaved = 0
+
+    # ------------------------------------------------------------------ #
+    # Queries
+    # ------------------------------------------------------------------ #
+
+    def algorithms(self) -> Tuple[str, ...]:
+        """The configured hash algorithm, then any other algorithm found in the database."""
+        self._ensure_loaded()
+        with self._lock:
+            others = sorted(self._algorithms - {config.hash_algorithm})
+        return (config.hash_algorithm, *others)
+
+    def is_duplicate(
+        self, file_hash: str, quick_hash: Optional[str] = None, aliases: Sequence[str] = ()
+    ) -> bool:
+        """
+        True if a batch with this file_hash, or with one of its `aliases` (the
+        same file's digests under `algorithms()[1:]`), exists. Filters first,
+        then the unique index.
+        """
+        self._ensure_loaded()
+        with self._lock:
+            candidates = [alias for alias in aliases if alias in self._hashes]
+            if (quick_hash is None or quick_hash in self._signatures) and file_hash in self._hashes:
+                candidates.append(file_hash)
+        if not candidates:
+            return False
+
+        session = self.session_factory()
+        try:
+            return session.scalar(select(Batch.id).where(Batch.file_hash.in_(candidates)).limit(1)) is not None
+        finally:
+            session.close()
+
+    def add(self, file_hash: str, quick_hash: Optional[str] = None) -> None:
+        """Record a newly created batch's fingerprint."""
+        self._ensure_loaded()
+        with self._lock:
+            # Bits only: the entry is counted when _sync() folds in its row
+            self._set_bits(file_hash, quick_hash)
+            self._unsaved += 1
+            save = self._unsaved >= _SAVE_EVERY
+        if save:
+            self.save()
+
+    def _set_bits(self, file_hash: str, quick_hash: Optional[str]) -> None:
+        self._hashes.add(file_hash)
+        algorithm, separator, _ = file_hash.partition(":")
+        if separator:
+            self._algorithms.add(algorithm)
+        if quick_hash:
+            self._signatures.add(quick_hash)
+
+    # ------------------------------------------------------------------ #
+    # Load / sync / persist
+    # ------------------------------------------------------------------ #
+
+    def _ensure_loaded(self) -> None:
+        if self._loaded:
+            return
+        with self._lock:
+            if self._loaded:
+                return
+            if not self._load():
+                self._rebuild()
+            self._sync()
+            self._loaded = True
+
+    def _reset(self, capacity: int) -> None:
+        rate = config.dedupe_false_positive_rate
+        self._capacity = capacity
+        self._hashes = BloomFilter.for_capacity(capacity, rate)
+        self._signatures = BloomFilter.for_capacity(capacity, rate)
+        self._algorithms = set()
+        self._count = 0
+        self._watermark = 0
+
+    def _load(self) -> bool:
+        """Load the persisted filters. False if missing, unreadable or outgrown."""
+        try:
+            with open(self.path, "rb") as f:
+                if f.readline() != _MAGIC:
+                    raise ValueError("bad header")
+                header = json.loads(f.readline())
+                hashes = bytearray(f.read((header["hash_bits"] + 7) // 8))
+                signatures = bytearray(f.read((header["signature_bits"] + 7) // 8))
+            if len(signatures) != (header["signature_bits"] + 7) // 8:
+                raise ValueError("truncated")
+        except FileNotFoundError:
+            return False
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"Ignoring unreadable duplicate index {self.path}: {e}")
+            return False
+
+        if "algorithms" not in header:
+            logger.info("Duplicate index predates hash algorithm tracking, rebuilding")
+            return False
+        if header["count"] > header["capacity"]:
+            logger.info(f"Duplicate index is over capacity ({header['count']}), rebuilding")
+            return False
+
+        self._capacity = header["capacity"]
+        self._count = header["count"]
+        self._watermark = header["watermark"]
+        self._algorithms = set(header["algorithms"])
+        self._hashes = BloomFilter(header["hash_bits"], header["num_hashes"], hashes)
+        self._signatures = BloomFilter(header["signature_bits"], header["num_hashes"], signatures)
+        logger.info(f"Loaded duplicate index: {self._count} files up to batch #{self._watermark}")
+        return True
+
+    def _rebuild(self) -> None:
+        """Start empty, sized for the batches table; the following _sync() folds in every row."""
+        session = self.session_factory()
+        try:
+            total = session.scalar(select(func.count(Batch.id))) or 0
+            self._reset(max(config.dedupe_capacity, total * 2))
+            logger.info(f"Rebuilding duplicate index from {total} batches...")
+        finally:
+            session.close()
+
+    def _sync(self) -> int:
+        """Fold in batches created (by any process) since the watermark."""
+        session = self.session_factory()
+        try:
+            return self._fold(session, Batch.id > self._watermark)
+        finally:
+            session.close()
+
+    def _fold(self, session: Session, condition) -> int:
+        stmt = (
+            select(Batch.id, Batch.file_hash, Batch.quick_hash)
+            .where(condition)
+            .order_by(Batch.id)
+            .execution_options(yield_per=10_000)
+        )
+        added = 0
+        for batch_id, file_hash, quick_hash in session.execute(stmt):
+            self._set_bits(file_hash, quick_hash)
+            self._watermark = batch_id
+            added += 1
+        self._count += added
+        if self._count > self._capacity:
+            logger.warning(
+                f"Duplicate index holds {self._count} files (capacity {self._capacity}); "
+                f"false positives will rise until it is rebuilt on next start"
+            )
+        return added
+
+    def save(self) -> None:
+        """Sync from the database, then atomically write the filters to disk."""
+        self._ensure_loaded()
+        with self._lock:
+            self._sync()
+            header = {
+                "capacity": self._capacity,
+                "count": self._count,
+                "watermark": self._watermark,
+                "num_hashes": self._hashes.num_hashes,
+                "hash_bits": self._hashes.num_bits,
+                "signature_bits": self._signatures.num_bits,
+                "algorithms": sorted(self._algorithms),
+            }
+            tmp_path = self.path.with_suffix(f".{os.getpid()}.tmp")
+            try:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                with open(tmp_path, "wb") as f:
+                    f.write(_MAGIC)
+                    f.write(json.dumps(header).encode() + b"\n")
+                    f.write(self._hashes.bits)
+                    f.write(self._signatures.bits)
+                os.replace(tmp_path, self.path)
+                self._unsaved = 0
+            except OSError as e:
+                logger.error(f"Failed to save duplicate index {self.path}: {e}")
+
+
+duplicate_index = DuplicateIndex()
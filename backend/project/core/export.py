@@ -0,0 +1,433 @@
+"""
+core/export.py
+
+Streaming bulk export of extracted data.
+
+Walks documents, pages, fields and line items of the selected batches with
+a server-side cursor (`yield_per`) over one ordered UNION ALL query, so
+memory stays flat no matter how many rows are exported. Every output row is
+one record, tagged with `record_type`:
+
+- document: type, confidence and metadata (including the line-item
+  reconciliation), once per document
+- page: page number, extraction method and OCR confidence, once per page
+  (so pages without fields are exported too)
+- field: name, value, correction, confidence, validation status and box
+- line_item: row number, description, quantity, unit price and amount
+
+All records carry the batch and document context; columns a record type
+doesn't have are empty. Records are ordered by batch, document and page,
+with the document first and each page before its fields and line items.
+
+Formats:
+
+- ndjson: one JSON object per line
+- csv: header + one line per record
+- parquet: columnar, one row group per chunk (requires pyarrow)
+
+Exports are read-only by default. With `mark_exporting` (the CLI), a
+batch is in the EXPORTING status while its records are streamed and returns
+to COMPLETED once they are written; a batch left EXPORTING by an interrupted
+export is restored by the next marking export that includes it. GET
+/api/v1/export never changes batch state: a client can disconnect at any
+point, and concurrent downloads would reset each other's status.
+
+Used by GET /api/v1/export and by the CLI:
+
+    python -m core.export --format csv --output export.csv --status completed
+"""
+
+import csv
+import importlib.util
+import io
+import json
+import logging
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set
+
+from sqlalchemy import cast, func, literal, null, select, union_all, update
+from sqlalchemy.orm import Session
+
+from core.database import (
+    Batch, Document, DocumentType, Field, LineItem, Page, ProcessingStatus, SessionLocal
+)
+
+logger = logging.getLogger(__name__)
+
+EXPORT_FORMATS = ("ndjson", "csv", "parquet")
+
+MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+RECORD_TYPES = ("document", "page", "field", "line_item")
+
+# Export column -> model column its values come from (and whose type the
+# empty values of other record types get). `confidence` and `coordinates`
+# are shared: each record type fills them from its own table.
+_SOURCES = {
+    "batch_id": Batch.id,
+    "filename": Batch.filename,
+    "batch_status": Batch.status,
+    "created_at": Batch.created_at,
+    "processed_at": Batch.processed_at,
+    "document_id": Document.id,
+    "doc_type": Document.doc_type,
+    "metadata": Document.extra_metadata,
+    "page_id": Page.id,
+    "page_number": Page.page_number,
+    "extraction_method": Page.extraction_method,
+    "field_id": Field.id,
+    "field_name": Field.name,
+    "value": Field.value,
+    "corrected_value": Field.corrected_value,
+    "validation_status": Field.validation_status,
+    "line_item_id": LineItem.id,
+    "row_number": LineItem.row_number,
+    "description": LineItem.description,
+    "quantity": LineItem.quantity,
+    "unit_price": LineItem.unit_price,
+    "amount": LineItem.amount,
+    "confidence": Field.confidence,
+    "coordinates": Field.coordinates,
+}
+
+COLUMNS = ["record_type", *_SOURCES]
+
+_JSON_COLUMNS = ("metadata", "coordinates")
+_ENUM_COLUMNS = ("batch_status", "doc_type", "extraction_method")
+
+DEFAULT_CHUNK_SIZE = 5000
+
+
+@dataclass
+class ExportFilters:
+    """Which batches to export. Empty filters export everything."""
+    batch_ids: List[int] = field(default_factory=list)
+    status: Optional[ProcessingStatus] = None
+    doc_type: Optional[DocumentType] = None
+    date_from: Optional[datetime] = None
+    date_to: Optional[datetime] = None
+
+
+def parquet_available() -> bool:
+    """Whether the optional pyarrow dependency for Parquet exports is installed."""
+    return importlib.util.find_spec("pyarrow") is not None
+
+
+def _record_select(record_type: str, columns: Dict[str, Any], page_sort, record_id, filters: ExportFilters):
+    """One record type's SELECT, with every export column (typed NULL if absent)."""
+    common = {name: _SOURCES[name] for name in ("batch_id", "filename", "batch_status", "created_at",
+                                                 "processed_at", "document_id", "doc_type")}
+    values = {**common, **columns}
+    stmt = select(
+        literal(record_type).label("record_type"),
+        *[
+            (values[name] if name in values else cast(null(), source.type)).label(name)
+            for name, source in _SOURCES.items()
+        ],
+        page_sort.label("page_sort"),
+        literal(RECORD_TYPES.index(record_type)).label("kind"),
+        record_id.label("record_id"),
+    ).join(Batch, Document.batch_id == Batch.id)
+
+    if filters.batch_ids:
+        stmt = stmt.where(Batch.id.in_(filters.batch_ids))
+    if filters.status == ProcessingStatus.COMPLETED:
+        # Batches being exported by a concurrent export are completed too
+        stmt = stmt.where(Batch.status.in_([ProcessingStatus.COMPLETED, ProcessingStatus.EXPORTING]))
+    elif filters.status:
+        stmt = stmt.where(Batch.status == filters.status)
+    if filters.doc_type:
+        stmt = stmt.where(Document.doc_type == filters.doc_type)
+    if filters.date_from:
+        stmt = stmt.where(Batch.created_at >= filters.date_from)
+    if filters.date_to:
+        stmt = stmt.where(Batch.created_at <= filters.date_to)
+    return stmt
+
+
+def _export_query(filters: ExportFilters):
+    documents = _record_select(
+        "document",
+        {"confidence": Document.confidence, "metadata": Document.extra_metadata},
+        literal(0), Document.id, filters,
+    ).select_from(Document)
+    page_columns = {"page_id": Page.id, "page_number": Page.page_number}
+    pages = _record_select(
+        "page",
+        {**page_columns, "extraction_method": Page.extraction_method, "confidence": Page.ocr_confidence},
+        Page.page_number, Page.id, filters,
+    ).select_from(Page).join(Document, Page.document_id == Document.id)
+    fields = _record_select(
+        "field",
+        {
+            **page_columns,
+            "field_id": Field.id,
+            "field_name": Field.name,
+            "value": Field.value,
+            "corrected_value": Field.corrected_value,
+            "validation_status": Field.validation_status,
+            "confidence": Field.confidence,
+            "coordinates": Field.coordinates,
+        },
+        Page.page_number, Field.id, filters,
+    ).select_from(Field).join(Page, Field.page_id == Page.id).join(Document, Page.document_id == Document.id)
+    line_items = _record_select(
+        "line_item",
+        {
+            **page_columns,
+            "line_item_id": LineItem.id,
+            "row_number": LineItem.row_number,
+            "description": LineItem.description,
+            "quantity": LineItem.quantity,
+            "unit_price": LineItem.unit_price,
+            "amount": LineItem.amount,
+            "confidence": LineItem.confidence,
+            "coordinates": LineItem.coordinates,
+        },
+        Page.page_number, LineItem.id, filters,
+    ).select_from(LineItem).join(Page, LineItem.page_id == Page.id).join(Document, Page.document_id == Document.id)
+
+    records = union_all(documents, pages, fields, line_items).subquery("records")
+    return select(*[records.c[name] for name in COLUMNS]).order_by(
+        records.c.batch_id, records.c.document_id, records.c.page_sort, records.c.kind, records.c.record_id
+    )
+
+
+def iter_chunks(
+    session: Session,
+    filters: ExportFilters,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    mark_exporting: bool = False,
+) -> Iterator[List[Dict[str, Any]]]:
+    """
+    Yield lists of export rows, `chunk_size` at a time, from a server-side cursor.
+
+    With `mark_exporting`, the batches of a chunk are EXPORTING until the
+    consumer asks for the next chunk (by which point it has written this
+    one) and then COMPLETED again; the batch the chunk ends in stays
+    EXPORTING until its remaining records have gone out too.
+    """
+    stmt = _export_query(filters).execution_options(yield_per=chunk_size)
+    exporting: Set[int] = set()
+    try:
+        for partition in session.execute(stmt).mappings().partitions():
+            rows = [_serialize(row) for row in partition]
+            if mark_exporting:
+                exporting |= _set_exporting({row["batch_id"] for row in rows} - exporting)
+            yield rows
+            if mark_exporting:
+                finished = exporting - {rows[-1]["batch_id"]}
+                _set_completed(finished)
+                exporting -= finished
+    finally:
+        if mark_exporting:
+            _set_completed(exporting)
+
+
+def _set_exporting(batch_ids: Iterable[int]) -> Set[int]:
+    """Move completed batches to EXPORTING; returns the ids that were moved."""
+    batch_ids = list(batch_ids)
+    if not batch_ids:
+        return set()
+    session = SessionLocal()
+    try:
+        moved = session.scalars(
+            update(Batch)
+            .where(
+                Batch.id.in_(batch_ids),
+                Batch.status.in_([ProcessingStatus.COMPLETED, ProcessingStatus.EXPORTING]),
+            )
+            .values(status=ProcessingStatus.EXPORTING)
+            .returning(Batch.id)
+        ).all()
+        session.commit()
+        return set(moved)
+    finally:
+        session.close()
+
+
+def _set_completed(batch_ids: Iterable[int]) -> None:
+    """Return exported batches to COMPLETED (unless something else changed them meanwhile)."""
+    batch_ids = list(batch_ids)
+    if not batch_ids:
+        return
+    session = SessionLocal()
+    try:
+        session.execute(
+            update(Batch)
+            .where(Batch.id.in_(batch_ids), Batch.status == ProcessingStatus.EXPORTING)
+            .values(status=ProcessingStatus.COMPLETED)
+        )
+        session.commit()
+    except Exception as e:
+        session.rollback()
+        logger.error(f"Failed to reset {len(batch_ids)} batch(es) from EXPORTING: {e}")
+    finally:
+        session.close()
+
+
+def _serialize(row) -> Dict[str, Any]:
+    out = dict(row)
+    for key in ("created_at", "processed_at"):
+        if out[key] is not None:
+            out[key] = out[key].isoformat()
+    for key in _ENUM_COLUMNS:
+        if out[key] is not None:
+            out[key] = str(out[key])
+    return out
+
+
+# =============================================================================
+# Writers (each yields bytes as soon as a chunk is encoded)
+# =============================================================================
+
+
+def stream_ndjson(chunks: Iterator[List[Dict[str, Any]]]) -> Iterator[bytes]:
+    for chunk in chunks:
+        yield "".join(json.dumps(row, ensure_ascii=False) + "\n" for row in chunk).encode()
+
+
+def stream_csv(chunks: Iterator[List[Dict[str, Any]]]) -> Iterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=COLUMNS)
+    writer.writeheader()
+    for chunk in chunks:
+        for row in chunk:
+            writer.writerow(_encode_json_columns(row))
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+
+def _encode_json_columns(row: Dict[str, Any]) -> Dict[str, Any]:
+    """JSON columns as JSON text, for the flat formats."""
+    return {
+        **row,
+        **{key: json.dumps(row[key]) for key in _JSON_COLUMNS if row[key] is not None},
+    }
+
+
+class _DrainableSink(io.RawIOBase):
+    """Write-only file object whose contents can be drained between writes."""
+
+    def __init__(self) -> None:
+        self._chunks: List[bytes] = []
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self._chunks.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def stream_parquet(chunks: Iterator[List[Dict[str, Any]]]) -> Iterator[bytes]:
+    """Encode each chunk as a Parquet row group and yield it immediately."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    types = {
+        "batch_id": pa.int64(),
+        "document_id": pa.int64(),
+        "page_id": pa.int64(),
+        "page_number": pa.int32(),
+        "field_id": pa.int64(),
+        "line_item_id": pa.int64(),
+        "row_number": pa.int32(),
+        "quantity": pa.float64(),
+        "unit_price": pa.float64(),
+        "amount": pa.float64(),
+        "confidence": pa.float64(),
+    }
+    schema = pa.schema([(name, types.get(name, pa.string())) for name in COLUMNS])
+
+    sink = _DrainableSink()
+    writer = pq.ParquetWriter(sink, schema, compression="zstd")
+    for chunk in chunks:
+        rows = [_encode_json_columns(row) for row in chunk]
+        columns = {name: [row[name] for row in rows] for name in COLUMNS}
+        writer.write_table(pa.Table.from_pydict(columns, schema=schema))
+        yield sink.drain()
+    writer.close()
+    yield sink.drain()
+
+
+_WRITERS = {
+    "ndjson": stream_ndjson,
+    "csv": stream_csv,
+    "parquet": stream_parquet,
+}
+
+
+def stream_export(
+    session: Session,
+    filters: ExportFilters,
+    fmt: str,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    mark_exporting: bool = False,
+) -> Iterator[bytes]:
+    """
+    Encoded export stream in the requested format. Raises before anything is
+    streamed if the format is unknown or its optional dependency is missing.
+    `mark_exporting`: see `iter_chunks`.
+    """
+    if fmt not in _WRITERS:
+        raise ValueError(f"Unsupported export format: {fmt}")
+    if fmt == "parquet" and not parquet_available():
+        raise RuntimeError("Parquet export requires pyarrow (pip install pyarrow)")
+    return _WRITERS[fmt](iter_chunks(session, filters, chunk_size, mark_exporting))
+
+
+if __name__ == "__main__":
+    import argparse
+    import sys
+
+    parser = argparse.ArgumentParser(
+        description="Stream extracted documents, pages, fields and line items to a file"
+    )
+    parser.add_argument("--format", choices=EXPORT_FORMATS, default="ndjson")
+    parser.add_argument("--output", "-o", help="Output file (default: stdout)")
+    parser.add_argument("--batch-id", type=int, action="append", default=[])
+    parser.add_argument("--status", type=ProcessingStatus)
+    parser.add_argument("--doc-type", type=DocumentType)
+    parser.add_argument("--since", type=datetime.fromisoformat, help="Created on/after (ISO date)")
+    parser.add_argument("--until", type=datetime.fromisoformat, help="Created on/before (ISO date)")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument("--no-mark-exporting", dest="mark_exporting", action="store_false",
+                        help="Leave batch status alone (default: EXPORTING while streamed)")
+    args = parser.parse_args()
+
+    export_filters = ExportFilters(
+        batch_ids=args.batch_id,
+        status=args.status,
+        doc_type=args.doc_type,
+        date_from=args.since,
+        date_to=args.until,
+    )
+    db = SessionLocal()
+    out = open(args.output, "wb") if args.output else sys.stdout.buffer
+    try:
+        for data in stream_export(db, export_filters, args.format, args.chunk_size, args.mark_exporting):
+            out.write(data)
+    finally:
+        if args.output:
+            out.close()
+        db.close()
@@ -0,0 +1,167 @@
+"""
+core/metrics.py
+
+Prometheus metrics for the processing pipeline (prometheus_client).
+
+Exposition:
+
+- API: GET /metrics (api/main.py)
+- watcher / standalone worker: `start_http_server()` on `metrics_port`
+  (`python -m watcher.worker --metrics-port 9102` to run several per host)
+
+By default each process exposes its own values. To serve one aggregated
+view from several processes on a host (uvicorn --workers, several workers
+behind one port), start all of them with PROMETHEUS_MULTIPROC_DIR pointing
+at an empty directory: values are then written to per-process files there
+and every endpoint renders the sum (prometheus_client multiprocess mode).
+The variable must be set before the process starts.
+
+Per-page stages run in the OCR process pool; their timings travel back on
+`PageResult.timings` and are observed here in the parent process, so the
+pool processes never record metrics themselves.
+
+Pipeline metrics:
+    invoice_stage_seconds{stage}          hash, detect, classify, pages, text_layer,
+                                          render, ocr, extraction, db_write, archive,
+                                          total (see core/timings.py)
+    invoice_pages_total{method}           rate() = pages/sec
+    invoice_batches_total{outcome}        completed, retry, dead
+    invoice_errors_total{stage, type}     exception class name
+    invoice_ingested_files_total{result}  created, duplicate
+    invoice_ocr_confidence                page confidence (0-1)
+    invoice_ocr_cache_total{result}       hit, miss (watcher/ocr_cache.py)
+    invoice_active_jobs                   jobs being processed (summed over live processes)
+    invoice_queue_jobs{status}            queue depth (read at scrape time)
+"""
+
+import atexit
+import logging
+import os
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional
+
+import prometheus_client
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram
+from prometheus_client import multiprocess
+from prometheus_client.core import GaugeMetricFamily
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPE = CONTENT_TYPE_LATEST
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+CONFIDENCE_BUCKETS = (0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9, 0.95, 1.0)
+
+MULTIPROCESS = bool(os.environ.get("PROMETHEUS_MULTIPROC_DIR"))
+
+# =============================================================================
+# Pipeline metrics
+# =============================================================================
+
+stage_seconds = Histogram(
+    "invoice_stage_seconds", "Time spent per pipeline stage", ["stage"], buckets=LATENCY_BUCKETS
+)
+pages_total = Counter(
+    "invoice_pages_total", "Pages processed, by extraction method", ["method"]
+)
+batches_total = Counter(
+    "invoice_batches_total", "Batch processing attempts, by outcome", ["outcome"]
+)
+errors_total = Counter(
+    "invoice_errors_total", "Errors, by pipeline stage and exception type", ["stage", "type"]
+)
+ingested_files_total = Counter(
+    "invoice_ingested_files_total", "Hot-folder files ingested, by result", ["result"]
+)
+ocr_confidence = Histogram(
+    "invoice_ocr_confidence", "Page extraction confidence (0-1)", buckets=CONFIDENCE_BUCKETS
+)
+ocr_cache_total = Counter(
+    "invoice_ocr_cache_total", "OCR result cache lookups, by result", ["result"]
+)
+line_item_reconciliation_total = Counter(
+    "invoice_line_item_reconciliation_total",
+    "Documents by line-item sum vs. total reconciliation outcome", ["status"]
+)
+active_jobs = Gauge(
+    "invoice_active_jobs", "Jobs currently being processed", multiprocess_mode="livesum"
+)
+
+
+class _QueueDepthCollector:
+    """invoice_queue_jobs{status}, read from the database at scrape time (once, whatever the process count)."""
+
+    @staticmethod
+    def _family() -> GaugeMetricFamily:
+        return GaugeMetricFamily("invoice_queue_jobs", "Jobs in the durable queue, by status", labels=["status"])
+
+    def describe(self):
+        """Names only, so registering doesn't query the database."""
+        yield self._family()
+
+    def collect(self):
+        from core.queue import job_queue  # Deferred: core.queue needs the database at import
+
+        gauge = self._family()
+        try:
+            depth = job_queue.depth()
+        except Exception as e:
+            logger.warning(f"Metric invoice_queue_jobs unavailable: {e}")
+            depth = {}
+        for status, count in depth.items():
+            gauge.add_metric([status], count)
+        yield gauge
+
+
+if MULTIPROCESS:
+    # Values live in per-process files; render them through a registry that merges them
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    atexit.register(multiprocess.mark_process_dead, os.getpid())  # Drop this process's live gauges
+else:
+    registry = REGISTRY
+registry.register(_QueueDepthCollector())
+
+
+def render() -> bytes:
+    """All metrics in the Prometheus text exposition format."""
+    return prometheus_client.generate_latest(registry)
+
+
+def record_error(stage: str, error: BaseException) -> None:
+    errors_total.labels(stage=stage, type=type(error).__name__).inc()
+
+
+@contextmanager
+def timed(stage: str, timings: Optional[Dict[str, float]] = None) -> Iterator[None]:
+    """
+    Time a pipeline stage: observe it in `invoice_stage_seconds` and, if
+    given, add it to a `timings` dict (persisted with the batch).
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        stage_seconds.labels(stage=stage).observe(elapsed)
+        if timings is not None:
+            timings[stage] = timings.get(stage, 0.0) + elapsed
+
+
+# =============================================================================
+# Standalone exposition (watcher / worker processes)
+# =============================================================================
+
+
+def start_http_server(port: int, host: str = "0.0.0.0") -> bool:
+    """Serve /metrics on a daemon thread. Returns False if disabled (port 0) or the port is taken."""
+    if not port:
+        return False
+    try:
+        prometheus_client.start_http_server(port, addr=host, registry=registry)
+    except OSError as e:
+        logger.warning(f"Metrics endpoint not started on port {port}: {e}")
+        return False
+    logger.info(f"Serving metrics on http://{host}:{port}/metrics")
+    return True
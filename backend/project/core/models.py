@@ -41,6 +41,12 @@ class ProcessingStatus(StrEnum):
     ERROR = "error"
 
 
+class ExtractionMethod(StrEnum):
+    """How the text of a page was obtained."""
+    TEXT_LAYER = "text_layer"
+    OCR = "ocr"
+
+
 class DocumentType(StrEnum):
     """Supported document types with automatic detection fallback."""
     INVOICE = "invoice"
@@ -83,21 +89,55 @@ class FieldData(BaseModel):
     model_config = ConfigDict(from_attributes=True)
 
 
+class LineItemData(BaseModel):
+    """
+    One invoice table row, read from the word-box layout of its page.
+
+    Attributes:
+        row_number: Position in the page's table (1-indexed)
+        description: Item text, including wrapped continuation lines
+        quantity / unit_price / amount: Parsed numbers (None if the column is absent)
+        confidence: Extraction confidence score between 0.0 and 1.0
+        coordinates: Bounding box of the row {'x', 'y', 'width', 'height'}
+    """
+    row_number: int = Field(..., ge=1, description="Row number within the page (1-indexed)")
+    description: Optional[str] = Field(None, description="Item description")
+    quantity: Optional[float] = Field(None, description="Quantity")
+    unit_price: Optional[float] = Field(None, description="Price per unit")
+    amount: Optional[float] = Field(None, description="Line amount")
+    confidence: Optional[float] = Field(
+        None, ge=0.0, le=1.0, description="Extraction confidence score"
+    )
+    coordinates: Optional[Dict[str, float]] = Field(
+        None, description="Bounding box of the row: {'x', 'y', 'width', 'height'}"
+    )
+
+    model_config = ConfigDict(from_attributes=True)
+
+
 class PageData(BaseModel):
     """
     Represents a single page in a multi-page document (PDF/TIFF).
     """
     page_number: int = Field(..., ge=1, description="Page number (1-indexed)")
-    image_path: str = Field(..., description="Path to saved page image (for UI preview)")
+    image_path: Optional[str] = Field(
+        None, description="Path to saved page image (for UI preview)"
+    )
     original_text: Optional[str] = Field(
         None, description="Raw OCR text before post-processing"
     )
     processed_text: Optional[str] = Field(
         None, description="Cleaned and corrected text after NLP rules"
     )
+    extraction_method: Optional[ExtractionMethod] = Field(
+        None, description="text_layer (embedded PDF text) or ocr (rendered + Tesseract)"
+    )
     fields: List[FieldData] = Field(
         default_factory=list, description="List of extracted fields on this page"
     )
+    line_items: List[LineItemData] = Field(
+        default_factory=list, description="Invoice table rows on this page"
+    )
 
     model_config = ConfigDict(from_attributes=True)
 
@@ -152,12 +192,111 @@ class BatchResponse(BaseModel):
     model_config = ConfigDict(from_attributes=True)
 
 
+class BatchSummaryResponse(BaseModel):
+    """
+    Lightweight batch row for list endpoints.
+
+    Batch columns plus aggregate counts computed in SQL; no documents,
+    pages or page text are loaded. Use GET /batches/{id} for the full graph.
+    """
+    id: int = Field(..., description="Database primary key")
+    filename: str = Field(..., description="Original filename")
+    original_path: str = Field(..., description="Full path where file was picked up")
+    file_size: Optional[int] = Field(None, description="File size in bytes")
+    status: ProcessingStatus = Field(..., description="Current processing status")
+    created_at: datetime = Field(..., description="When file entered the system")
+    processed_at: Optional[datetime] = Field(None, description="Completion timestamp")
+    processing_time: Optional[float] = Field(None, description="Processing time in seconds")
+    error_message: Optional[str] = Field(None, description="Error details if failed")
+    document_count: int = Field(0, description="Number of documents in the batch")
+    page_count: int = Field(0, description="Number of pages across all documents")
+    field_count: int = Field(0, description="Number of extracted fields")
+    avg_confidence: Optional[float] = Field(
+        None, description="Average page OCR/text confidence (0.0 - 1.0)"
+    )
+
+    model_config = ConfigDict(from_attributes=True)
+
+
 class BatchListResponse(BaseModel):
-    """Wrapper for paginated list responses."""
-    items: List[BatchResponse] = Field(..., description="List of processed files")
-    total: int = Field(..., description="Total count in database")
-    page: int = Field(..., description="Current page (1-indexed)")
+    """
+    Wrapper for cursor-paginated list responses.
+
+    Pass `next_cursor` back as `cursor` to fetch the next page; it is None
+    on the last page.
+    """
+    items: List[BatchSummaryResponse] = Field(..., description="List of processed files")
+    total: Optional[int] = Field(
+        None, description="Total matching batches (only if requested; may be cached briefly)"
+    )
     per_page: int = Field(..., description="Items per page")
+    next_cursor: Optional[str] = Field(None, description="Opaque cursor for the next page")
+
+
+class SearchHit(BaseModel):
+    """One matching page in a full-text search."""
+    batch_id: int
+    filename: str
+    status: ProcessingStatus
+    created_at: datetime
+    document_id: int
+    doc_type: DocumentType
+    page_id: int
+    page_number: int
+    score: float = Field(..., description="Relevance score (higher is better)")
+    snippet: Optional[str] = Field(
+        None, description="Matching excerpt with terms wrapped in <mark>...</mark>"
+    )
+
+    model_config = ConfigDict(from_attributes=True)
+
+
+class SearchResponse(BaseModel):
+    """Ranked, paginated search results."""
+    query: str
+    items: List[SearchHit]
+    limit: int
+    offset: int
+
+
+class PageTimings(BaseModel):
+    """Per-page stage timings (seconds)."""
+    page_number: int
+    extraction_method: Optional[ExtractionMethod] = None
+    timings: Dict[str, float] = Field(default_factory=dict)
+
+    model_config = ConfigDict(from_attributes=True)
+
+
+class BatchTimingsResponse(BaseModel):
+    """Stage breakdown of one batch's processing (see core/timings.py for stage names)."""
+    batch_id: int
+    filename: str
+    processing_time: Optional[float] = Field(None, description="Total processing time in seconds")
+    stage_timings: Dict[str, float] = Field(
+        default_factory=dict, description="Stage -> seconds; page stages are summed over pages"
+    )
+    pages: List[PageTimings] = Field(default_factory=list)
+
+
+class StageTimingStats(BaseModel):
+    """Distribution of one stage's duration across batches (seconds)."""
+    count: int
+    mean: float
+    max: float
+    p50: float
+    p90: float
+    p95: float
+    p99: float
+
+
+class TimingSummaryResponse(BaseModel):
+    """Per-stage percentiles over the batches processed in a time window."""
+    batches: int = Field(..., description="Number of batches aggregated")
+    date_from: Optional[datetime] = None
+    date_to: Optional[datetime] = None
+    filename: Optional[str] = Field(None, description="Filename filter (substring)")
+    stages: Dict[str, StageTimingStats]
 
 
 # =============================================================================
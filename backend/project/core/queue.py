@@ -0,0 +1,450 @@
+"""
+core/queue.py
+
+Durable, database-backed job queue for batch processing.
+
+Replaces the in-process Future tracking of ProcessManager: work survives
+restarts of the watcher/API processes and can be consumed by any number of
+worker threads.
+
+Lifecycle of a job:
+
+    QUEUED --claim--> LEASED --complete--> DONE
+                        |
+                        +--fail / lease expired--> QUEUED (after backoff)
+                        |
+                        +--retries exhausted / permanent error--> DEAD
+
+- Leasing: a claimed job belongs to one worker until `lease_expires_at`.
+- Heartbeats: workers extend the lease of their in-flight jobs.
+- Visibility timeout: if a worker dies, `reap_expired()` returns its jobs
+  to the queue (or to DEAD if they have used up their attempts).
+- Retry with exponential backoff: base * 2^(attempt - 1), capped.
+- Priority: available jobs are claimed lowest `priority` first, then
+  oldest first. `priority_for()` derives it from the file (queue_priority).
+- Admission control: producers call `wait_for_capacity()` before creating
+  work, so at most `queue_max_pending` jobs are queued or leased at once;
+  excess files simply wait in the hot folder.
+- Orphans: PENDING batches without an active job (created with
+  auto_start_processing off, or before the queue existed) are queued by
+  `enqueue_orphans()`, from the workers' maintenance loop when
+  auto_start_processing is on and from POST /processing/start-pending.
+"""
+
+import logging
+import math
+import os
+import socket
+import threading
+import uuid
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Dict, Iterable, Optional, Sequence
+
+from sqlalchemy import and_, exists, func, insert, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from core.config import config
+from core.database import Batch, Job, JobStatus, ProcessingStatus, SessionLocal
+
+logger = logging.getLogger(__name__)
+
+MAX_BACKOFF_SECONDS = 3600
+
+# A PENDING batch younger than this may still be waiting for its producer's enqueue
+ORPHAN_GRACE_SECONDS = 60
+
+
+class PermanentJobError(Exception):
+    """
+    A job failure that retrying cannot fix (missing file, unsupported type,
+    rejected path). Raised only by validation; the job goes straight to DEAD.
+    """
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def priority_for(file_path: str, file_size: int) -> int:
+    """
+    Job priority for a file under the configured policy (lower runs first).
+
+    - fifo: every job 0, claimed in arrival order
+    - small_first: log2 of the size in KB, so a 50 KB invoice is not stuck
+      behind a 50 MB scan, while files of similar size stay in arrival order
+    - subfolder: `queue_subfolder_priorities` looked up by the file's first
+      folder under the hot folder (e.g. {"urgent": -10, "bulk": 10})
+    """
+    policy = config.queue_priority
+    if policy == "small_first":
+        return int(math.log2(max(1, file_size // 1024)))
+    if policy == "subfolder":
+        try:
+            relative = Path(file_path).resolve().relative_to(Path(config.hot_folder).resolve())
+        except ValueError:
+            return 0
+        top = relative.parts[0] if len(relative.parts) > 1 else ""
+        return int(config.queue_subfolder_priorities.get(top, 0))
+    return 0
+
+
+def make_worker_id() -> str:
+    """Unique, human-readable lease owner id: host:pid:random."""
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+
+
+class JobQueue:
+    """
+    Queue operations. Each method uses its own short-lived session and
+    commits immediately, so it is safe to call from any thread.
+    """
+
+    def __init__(self, session_factory=SessionLocal):
+        self.session_factory = session_factory
+
+    # ------------------------------------------------------------------ #
+    # Producer side
+    # ------------------------------------------------------------------ #
+
+    def enqueue(self, batch_id: int, session: Optional[Session] = None, priority: int = 0) -> int:
+        """
+        Queue a batch for processing and return the job id.
+
+        If the batch already has an active (queued or leased) job, that job
+        is returned instead of creating a duplicate. Pass `session` to enqueue
+        inside the caller's transaction (the caller commits).
+        """
+        own_session = session is None
+        session = session or self.session_factory()
+        try:
+            existing = session.scalar(
+                select(Job.id).where(
+                    Job.batch_id == batch_id,
+                    Job.status.in_([JobStatus.QUEUED, JobStatus.LEASED]),
+                )
+            )
+            if existing is not None:
+                return existing
+
+            job = Job(
+                batch_id=batch_id,
+                status=JobStatus.QUEUED,
+                attempts=0,
+                max_attempts=config.queue_max_attempts,
+                priority=priority,
+                available_at=_now(),
+            )
+            session.add(job)
+            session.flush()
+            if own_session:
+                session.commit()
+            return job.id
+        except Exception:
+            if own_session:
+                session.rollback()
+            raise
+        finally:
+            if own_session:
+                session.close()
+
+    def enqueue_many(
+        self,
+        batch_ids: Sequence[int],
+        session: Session,
+        priorities: Optional[Sequence[int]] = None,
+    ) -> None:
+        """
+        Bulk-queue freshly created batches inside the caller's transaction.
+
+        No active-job check: callers only pass batches they just inserted.
+        """
+        now = _now()
+        priorities = priorities or [0] * len(batch_ids)
+        rows = [
+            {
+                "batch_id": batch_id,
+                "status": JobStatus.QUEUED,
+                "attempts": 0,
+                "max_attempts": config.queue_max_attempts,
+                "priority": priority,
+                "available_at": now,
+            }
+            for batch_id, priority in zip(batch_ids, priorities)
+        ]
+        if rows:
+            session.execute(insert(Job), rows)
+
+    def enqueue_orphans(
+        self, limit: Optional[int] = None, min_age_seconds: float = ORPHAN_GRACE_SECONDS
+    ) -> int:
+        """
+        Queue PENDING batches older than `min_age_seconds` that have no
+        active job, oldest first, at most `limit` of them. Returns how many
+        were queued. Safe to run from several workers at once: the unique
+        active-job index rejects a concurrent duplicate (nothing is queued
+        by the losing call; the next call picks up what is left).
+        """
+        active_job = exists().where(
+            Job.batch_id == Batch.id, Job.status.in_([JobStatus.QUEUED, JobStatus.LEASED])
+        )
+        stmt = (
+            select(Batch.id, Batch.original_path, Batch.file_size)
+            .where(
+                Batch.status == ProcessingStatus.PENDING,
+                Batch.created_at <= _now() - timedelta(seconds=min_age_seconds),
+                ~active_job,
+            )
+            .order_by(Batch.created_at, Batch.id)
+        )
+        if limit is not None:
+            stmt = stmt.limit(limit)
+
+        session = self.session_factory()
+        try:
+            orphans = session.execute(stmt).all()
+            if not orphans:
+                return 0
+            self.enqueue_many(
+                [batch_id for batch_id, _, _ in orphans],
+                session,
+                [priority_for(path, size or 0) for _, path, size in orphans],
+            )
+            session.commit()
+            logger.info(f"Queued {len(orphans)} pending batch(es) that had no job")
+            return len(orphans)
+        except IntegrityError:
+            session.rollback()
+            logger.debug("Pending batches were queued concurrently by another worker")
+            return 0
+        finally:
+            session.close()
+
+    # ------------------------------------------------------------------ #
+    # Consumer side
+    # ------------------------------------------------------------------ #
+
+    def claim(self, owner: str, lease_seconds: Optional[int] = None) -> Optional[Job]:
+        """
+        Atomically lease the next available job, or return None if the queue
+        is empty. Safe with any number of worker processes on any number of
+        machines sharing the database.
+
+        A single UPDATE ... WHERE id = (SELECT ... LIMIT 1) RETURNING statement:
+        - SQLite takes the database write lock for the whole statement, so
+          the select and the update cannot interleave with another writer
+        - PostgreSQL uses SELECT ... FOR UPDATE SKIP LOCKED in the subquery,
+          so concurrent workers skip rows being claimed instead of blocking
+        """
+        lease_seconds = lease_seconds or config.queue_lease_seconds
+        session = self.session_factory()
+        try:
+            now = _now()
+            candidate = (
+                select(Job.id)
+                .where(Job.status == JobStatus.QUEUED, Job.available_at <= now)
+                .order_by(Job.priority, Job.available_at, Job.id)
+                .limit(1)
+            )
+            if session.get_bind().dialect.name != "sqlite":
+                candidate = candidate.with_for_update(skip_locked=True)
+
+            job = session.scalars(
+                update(Job)
+                .where(Job.id == candidate.scalar_subquery(), Job.status == JobStatus.QUEUED)
+                .values(
+                    status=JobStatus.LEASED,
+                    lease_owner=owner,
+                    lease_expires_at=now + timedelta(seconds=lease_seconds),
+                    heartbeat_at=now,
+                    attempts=Job.attempts + 1,
+                )
+                .returning(Job)
+            ).first()
+            session.commit()
+            return job
+        finally:
+            session.close()
+
+    def heartbeat(self, job_ids: Iterable[int], owner: str, lease_seconds: Optional[int] = None) -> int:
+        """Extend the leases this worker holds. Returns how many were renewed."""
+        job_ids = list(job_ids)
+        if not job_ids:
+            return 0
+        lease_seconds = lease_seconds or config.queue_lease_seconds
+        now = _now()
+        session = self.session_factory()
+        try:
+            renewed = session.execute(
+                update(Job)
+                .where(
+                    Job.id.in_(job_ids),
+                    Job.status == JobStatus.LEASED,
+                    Job.lease_owner == owner,
+                )
+                .values(heartbeat_at=now, lease_expires_at=now + timedelta(seconds=lease_seconds))
+            ).rowcount
+            session.commit()
+            return renewed
+        finally:
+            session.close()
+
+    def complete(self, job_id: int, owner: str) -> None:
+        """Mark a leased job as done."""
+        self._finish(job_id, owner, status=JobStatus.DONE, last_error=None)
+
+    def fail(self, job_id: int, owner: str, error: str, permanent: bool = False) -> bool:
+        """
+        Record a failed attempt.
+
+        Returns True if the job will be attempted again (re-queued, or its
+        lease was already taken over by another worker), False if it went to
+        the dead-letter state (retries exhausted or `permanent`).
+        """
+        session = self.session_factory()
+        try:
+            job = session.get(Job, job_id)
+            if job is None:
+                return False
+            if job.lease_owner != owner:
+                logger.warning(f"Job {job_id} lease was lost to {job.lease_owner}; not recording failure")
+                return True
+
+            if permanent or job.attempts >= job.max_attempts:
+                job.status = JobStatus.DEAD
+                job.finished_at = _now()
+                retry = False
+            else:
+                job.status = JobStatus.QUEUED
+                job.available_at = _now() + timedelta(seconds=self.backoff(job.attempts))
+                retry = True
+            job.last_error = error[:2000]
+            job.lease_owner = None
+            job.lease_expires_at = None
+            session.commit()
+            return retry
+        finally:
+            session.close()
+
+    def _finish(self, job_id: int, owner: str, status: JobStatus, last_error: Optional[str]) -> None:
+        session = self.session_factory()
+        try:
+            session.execute(
+                update(Job)
+                .where(Job.id == job_id, Job.lease_owner == owner)
+                .values(
+                    status=status,
+                    last_error=last_error,
+                    finished_at=_now(),
+                    lease_owner=None,
+                    lease_expires_at=None,
+                )
+            )
+            session.commit()
+        finally:
+            session.close()
+
+    # ------------------------------------------------------------------ #
+    # Maintenance
+    # ------------------------------------------------------------------ #
+
+    @staticmethod
+    def backoff(attempts: int) -> float:
+        """Delay before the next attempt after `attempts` failures."""
+        base = config.queue_retry_backoff_seconds
+        return min(MAX_BACKOFF_SECONDS, base * 2 ** max(0, attempts - 1))
+
+    def reap_expired(self) -> int:
+        """
+        Return jobs whose lease expired (dead worker) to the queue, or to
+        DEAD if they have no attempts left. Returns the number of jobs reaped.
+        """
+        now = _now()
+        expired = and_(Job.status == JobStatus.LEASED, Job.lease_expires_at < now)
+        session = self.session_factory()
+        try:
+            dead = session.execute(
+                update(Job)
+                .where(expired, Job.attempts >= Job.max_attempts)
+                .values(
+                    status=JobStatus.DEAD,
+                    last_error="Lease expired: worker stopped responding",
+                    finished_at=now,
+                    lease_owner=None,
+                    lease_expires_at=None,
+                )
+            ).rowcount
+            requeued = session.execute(
+                update(Job)
+                .where(expired)
+                .values(
+                    status=JobStatus.QUEUED,
+                    available_at=now,
+                    lease_owner=None,
+                    lease_expires_at=None,
+                )
+            ).rowcount
+            session.commit()
+            if dead or requeued:
+                logger.warning(f"Reaped expired leases: {requeued} re-queued, {dead} dead-lettered")
+            return dead + requeued
+        finally:
+            session.close()
+
+    def pending(self) -> int:
+        """Jobs admitted but not finished (queued or leased)."""
+        session = self.session_factory()
+        try:
+            return session.scalar(
+                select(func.count(Job.id)).where(Job.status.in_([JobStatus.QUEUED, JobStatus.LEASED]))
+            )
+        finally:
+            session.close()
+
+    def has_capacity(self, needed: int = 1) -> bool:
+        """Whether `needed` more jobs fit under queue_max_pending (0 = unbounded)."""
+        limit = config.queue_max_pending
+        return limit <= 0 or self.pending() + needed <= limit
+
+    def wait_for_capacity(self, needed: int = 1, stop: Optional[threading.Event] = None) -> bool:
+        """
+        Block until `needed` more jobs fit (producer backpressure).
+
+        Returns False if `stop` was set while waiting.
+        """
+        if self.has_capacity(needed):
+            return True
+        logger.info(f"Queue full ({config.queue_max_pending} pending), pausing admission")
+        stop = stop or threading.Event()
+        while not stop.wait(config.queue_poll_interval):
+            if self.has_capacity(needed):
+                logger.info("Queue has capacity again, resuming admission")
+                return True
+        return False
+
+    def admission(self) -> Dict[str, int]:
+        """Admission state for monitoring: limit, pending and free slots."""
+        limit = config.queue_max_pending
+        pending = self.pending()
+        return {
+            "max_pending": limit,
+            "pending": pending,
+            "free": max(0, limit - pending) if limit > 0 else -1,
+        }
+
+    def depth(self) -> Dict[str, int]:
+        """Number of jobs per status."""
+        session = self.session_factory()
+        try:
+            rows = session.execute(
+                select(Job.status, func.count(Job.id)).group_by(Job.status)
+            ).all()
+            counts = {status.value: 0 for status in JobStatus}
+            counts.update({str(status): count for status, count in rows})
+            return counts
+        finally:
+            session.close()
+
+
+job_queue = JobQueue()
@@ -0,0 +1,300 @@
+"""
+core/search.py
+
+Full-text search over page text and extracted field values.
+
+Backends:
+- SQLite: an FTS5 virtual table `search_index` (rowid = page id), ranked
+  with bm25() and highlighted with snippet()
+- PostgreSQL: a `search_index` table with a stored, weighted tsvector
+  column and a GIN index, ranked with ts_rank() and highlighted with
+  ts_headline()
+
+The index is maintained incrementally: `index_pages()` is called by the
+processor in the same transaction that writes the pages,
+`remove_batch()` when a batch is deleted and `update_fields()` after
+re-extraction (watcher/reextract.py). `rebuild()` repopulates it from
+existing data (run `python -m core.search --rebuild` once after upgrading).
+"""
+
+import logging
+import re
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional
+
+from sqlalchemy import (
+    Column,
+    Integer,
+    MetaData,
+    Table,
+    Text,
+    and_,
+    bindparam,
+    delete,
+    func,
+    insert,
+    literal_column,
+    select,
+    text,
+    update,
+)
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+from core.database import Batch, Document, DocumentType, Field, Page, ProcessingStatus
+
+logger = logging.getLogger(__name__)
+
+HIGHLIGHT_START = "<mark>"
+HIGHLIGHT_END = "</mark>"
+
+# Kept out of Base.metadata: the table is backend specific and created by init_search_index()
+_search_metadata = MetaData()
+search_index = Table(
+    "search_index",
+    _search_metadata,
+    Column("rowid", Integer, key="page_id", primary_key=True),
+    Column("batch_id", Integer),
+    Column("content", Text),
+    Column("fields", Text),
+)
+
+_SQLITE_DDL = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS search_index USING fts5(
+        content, fields, batch_id UNINDEXED,
+        tokenize = 'unicode61 remove_diacritics 2',
+        prefix = '2 3'
+    )
+    """,
+]
+
+_POSTGRES_DDL = [
+    """
+    CREATE TABLE IF NOT EXISTS search_index (
+        rowid INTEGER PRIMARY KEY REFERENCES pages(id) ON DELETE CASCADE,
+        batch_id INTEGER NOT NULL,
+        content TEXT,
+        fields TEXT,
+        tsv TSVECTOR GENERATED ALWAYS AS (
+            setweight(to_tsvector('simple', coalesce(fields, '')), 'A') ||
+            setweight(to_tsvector('simple', coalesce(content, '')), 'B')
+        ) STORED
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS ix_search_index_tsv ON search_index USING GIN (tsv)",
+    "CREATE INDEX IF NOT EXISTS ix_search_index_batch ON search_index (batch_id)",
+]
+
+
+@dataclass
+class SearchFilters:
+    """Optional filters applied on top of the text match."""
+    doc_type: Optional[DocumentType] = None
+    status: Optional[ProcessingStatus] = None
+    date_from: Optional[datetime] = None
+    date_to: Optional[datetime] = None
+
+
+def _is_sqlite(bind) -> bool:
+    return bind.dialect.name == "sqlite"
+
+
+# =============================================================================
+# Schema & maintenance
+# =============================================================================
+
+
+def init_search_index(engine: Engine) -> None:
+    """Create the search index for the engine's backend (idempotent)."""
+    statements = _SQLITE_DDL if _is_sqlite(engine) else _POSTGRES_DDL
+    with engine.begin() as conn:
+        for statement in statements:
+            conn.execute(text(statement))
+
+
+def format_fields(fields: Iterable[tuple]) -> str:
+    """Flatten (name, value, ...) tuples into the indexed `fields` column."""
+    return "\n".join(f"{f[0]}: {f[1]}" for f in fields if f[1])
+
+
+def index_pages(session: Session, rows: List[Dict[str, Any]]) -> None:
+    """
+    Add pages to the index inside the caller's transaction.
+
+    Each row: {"page_id", "batch_id", "content", "fields"}.
+    """
+    if rows:
+        session.execute(insert(search_index), rows)
+
+
+def update_fields(session: Session, rows: List[Dict[str, Any]]) -> None:
+    """
+    Replace the indexed `fields` text of existing pages (after re-extraction),
+    inside the caller's transaction. Each row: {"page_id", "fields"}.
+    """
+    if rows:
+        session.execute(
+            update(search_index)
+            .where(search_index.c.page_id == bindparam("b_page_id"))
+            .values(fields=bindparam("b_fields")),
+            [{"b_page_id": r["page_id"], "b_fields": r["fields"]} for r in rows],
+        )
+
+
+def remove_batch(session: Session, batch_id: int) -> None:
+    """Remove all pages of a batch from the index (call before deleting it)."""
+    page_ids = (
+        select(Page.id)
+        .join(Document, Page.document_id == Document.id)
+        .where(Document.batch_id == batch_id)
+    )
+    session.execute(delete(search_index).where(search_index.c.page_id.in_(page_ids)))
+
+
+def _fields_for_pages(session: Session, page_ids: List[int]) -> Dict[int, List[tuple]]:
+    rows = session.execute(
+        select(Field.page_id, Field.name, Field.value).where(Field.page_id.in_(page_ids))
+    )
+    fields_by_page: Dict[int, List[tuple]] = {}
+    for page_id, name, value in rows:
+        fields_by_page.setdefault(page_id, []).append((name, value))
+    return fields_by_page
+
+
+def rebuild(session: Session, chunk_size: int = 1000) -> int:
+    """Drop and repopulate the index from all stored pages. Returns pages indexed."""
+    session.execute(delete(search_index))
+
+    pages = (
+        select(Page.id, Document.batch_id, Page.processed_text)
+        .join(Document, Page.document_id == Document.id)
+        .execution_options(yield_per=chunk_size)
+    )
+    count = 0
+    for chunk in session.execute(pages).partitions():
+        fields_by_page = _fields_for_pages(session, [row.id for row in chunk])
+        index_pages(session, [
+            {
+                "page_id": page_id,
+                "batch_id": batch_id,
+                "content": content or "",
+                "fields": format_fields(fields_by_page.get(page_id, [])),
+            }
+            for page_id, batch_id, content in chunk
+        ])
+        count += len(chunk)
+    session.commit()
+    return count
+
+
+# =============================================================================
+# Querying
+# =============================================================================
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def to_fts5_query(query: str) -> str:
+    """
+    Turn free text into a safe FTS5 expression.
+
+    Every whitespace-separated term becomes a quoted phrase of its word
+    tokens (so "INV-2025-001" matches the adjacent tokens inv 2025 001), terms
+    are ANDed, and the last term is a prefix match for search-as-you-type.
+    """
+    phrases = []
+    for term in query.split():
+        tokens = _TOKEN_RE.findall(term)
+        if tokens:
+            phrases.append('"' + " ".join(tokens) + '"')
+    if not phrases:
+        return ""
+    phrases[-1] += "*"
+    return " ".join(phrases)
+
+
+def search(
+    session: Session,
+    query: str,
+    filters: SearchFilters,
+    limit: int = 20,
+    offset: int = 0,
+) -> List[Dict[str, Any]]:
+    """
+    Ranked full-text search. Returns one dict per matching page with
+    batch/document context, a relevance `score` (higher is better) and a
+    highlighted `snippet`.
+    """
+    if _is_sqlite(session.get_bind()):
+        match_query = to_fts5_query(query)
+        if not match_query:
+            return []
+        table = literal_column("search_index")
+        score = -func.bm25(table, 1.0, 2.0)  # bm25 is lower-is-better; fields weigh double
+        snippet = func.snippet(table, -1, HIGHLIGHT_START, HIGHLIGHT_END, "…", 16)
+        match = table.op("MATCH")(match_query)
+    else:
+        ts_query = func.websearch_to_tsquery("simple", bindparam("q", query))
+        tsv = literal_column("search_index.tsv")
+        score = func.ts_rank(tsv, ts_query)
+        snippet = func.ts_headline(
+            "simple",
+            func.concat_ws("\n", search_index.c.fields, search_index.c.content),
+            ts_query,
+            f"StartSel={HIGHLIGHT_START}, StopSel={HIGHLIGHT_END}, MaxFragments=2",
+        )
+        match = tsv.op("@@")(ts_query)
+
+    conditions = [match]
+    if filters.doc_type:
+        conditions.append(Document.doc_type == filters.doc_type)
+    if filters.status:
+        conditions.append(Batch.status == filters.status)
+    if filters.date_from:
+        conditions.append(Batch.created_at >= filters.date_from)
+    if filters.date_to:
+        conditions.append(Batch.created_at <= filters.date_to)
+
+    stmt = (
+        select(
+            Batch.id.label("batch_id"),
+            Batch.filename,
+            Batch.status,
+            Batch.created_at,
+            Document.id.label("document_id"),
+            Document.doc_type,
+            Page.id.label("page_id"),
+            Page.page_number,
+            score.label("score"),
+            snippet.label("snippet"),
+        )
+        .select_from(search_index)
+        .join(Page, Page.id == search_index.c.page_id)
+        .join(Document, Document.id == Page.document_id)
+        .join(Batch, Batch.id == Document.batch_id)
+        .where(and_(*conditions))
+        .order_by(score.desc())
+        .limit(limit)
+        .offset(offset)
+    )
+    return [dict(row) for row in session.execute(stmt).mappings()]
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from core.database import SessionLocal, engine
+
+    parser = argparse.ArgumentParser(description="Maintain the full-text search index")
+    parser.add_argument("--rebuild", action="store_true", help="Repopulate from stored pages")
+    args = parser.parse_args()
+
+    init_search_index(engine)
+    if args.rebuild:
+        db = SessionLocal()
+        try:
+            logger.info(f"Indexed {rebuild(db)} pages")
+        finally:
+            db.close()
@@ -0,0 +1,73 @@
+# core/test_dedupe.py
+"""Bloom-filter duplicate index: filters, database confirmation, persistence, legacy hashes."""
+
+import hashlib
+
+from sqlalchemy import text
+
+from core.database import Batch, engine, migrate_schema
+from core.dedupe import BloomFilter, DuplicateIndex
+from watcher.hashing import hash_file_all, quick_signature
+
+
+def test_bloom_filter_has_no_false_negatives():
+    bloom = BloomFilter.for_capacity(10_000, 0.01)
+    keys = [f"blake2b:{i:064x}" for i in range(10_000)]
+    for key in keys:
+        bloom.add(key)
+    assert all(key in bloom for key in keys)
+    false_positives = sum(f"sha256:{i:064x}" in bloom for i in range(10_000))
+    assert false_positives < 300  # ~1% expected
+
+
+def _batch(db, name, file_hash, quick_hash=None):
+    db.add(Batch(filename=name, original_path=f"/hot/{name}", file_hash=file_hash, quick_hash=quick_hash))
+    db.commit()
+
+
+def test_duplicates_confirmed_against_database(db, tmp_path):
+    _batch(db, "a.pdf", "blake2b:aa", "10:q1")
+    index = DuplicateIndex(path=str(tmp_path / "dedupe.idx"))
+    assert index.is_duplicate("blake2b:aa", "10:q1")
+    assert not index.is_duplicate("blake2b:bb", "10:q1")
+    assert not index.is_duplicate("blake2b:aa", "10:other")  # Quick signature rules it out
+
+    _batch(db, "b.pdf", "blake2b:bb", "20:q2")
+    index.add("blake2b:bb", "20:q2")
+    assert index.is_duplicate("blake2b:bb", "20:q2")
+
+
+def test_persisted_index_syncs_rows_added_since(db, tmp_path):
+    path = str(tmp_path / "dedupe.idx")
+    _batch(db, "a.pdf", "blake2b:aa", "10:q1")
+    DuplicateIndex(path=path).save()
+
+    _batch(db, "b.pdf", "blake2b:bb", "20:q2")  # Written by another process after the save
+    reloaded = DuplicateIndex(path=path)
+    assert reloaded.is_duplicate("blake2b:aa", "10:q1")
+    assert reloaded.is_duplicate("blake2b:bb", "20:q2")
+    assert reloaded._watermark == 2
+
+
+def test_legacy_md5_rows_still_match(db, tmp_path):
+    upload = tmp_path / "invoice.pdf"
+    upload.write_bytes(b"%PDF-1.4 the same invoice, uploaded before and after the upgrade")
+    legacy = hashlib.md5(upload.read_bytes()).hexdigest()
+    with engine.begin() as conn:  # As stored before "<algorithm>:<hex>"
+        conn.execute(text(
+            "INSERT INTO batches (filename, original_path, file_hash, status, created_at) "
+            f"VALUES ('invoice.pdf', '/hot/invoice.pdf', '{legacy}', 'COMPLETED', CURRENT_TIMESTAMP)"
+        ))
+        conn.execute(text("DELETE FROM schema_migrations"))  # Not yet upgraded
+    migrate_schema(engine)
+
+    index = DuplicateIndex(path=str(tmp_path / "dedupe.idx"))
+    assert index.algorithms() == ("blake2b", "md5")
+    file_hash, *aliases = hash_file_all(str(upload), index.algorithms())
+    assert aliases == [f"md5:{legacy}"]
+    assert index.is_duplicate(file_hash, quick_signature(str(upload)), aliases)
+
+    other = tmp_path / "other.pdf"
+    other.write_bytes(b"%PDF-1.4 a different invoice")
+    file_hash, *aliases = hash_file_all(str(other), index.algorithms())
+    assert not index.is_duplicate(file_hash, quick_signature(str(other)), aliases)
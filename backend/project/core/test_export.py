@@ -0,0 +1,117 @@
+# core/test_export.py
+"""Streaming export: document, page, field and line-item records, EXPORTING status."""
+
+import csv
+import io
+import json
+
+import pytest
+
+from core import export
+from core.database import Batch, Document, Field, LineItem, Page, ProcessingStatus, SessionLocal
+
+
+def _seed(db):
+    batch = Batch(filename="a.pdf", original_path="/hot/a.pdf", file_hash="blake2b:a",
+                  status=ProcessingStatus.COMPLETED)
+    empty = Batch(filename="b.pdf", original_path="/hot/b.pdf", file_hash="blake2b:b",
+                  status=ProcessingStatus.COMPLETED)
+    db.add_all([batch, empty])
+    db.flush()
+    document = Document(batch_id=batch.id, confidence=0.9, extra_metadata={"pages": 2})
+    db.add_all([document, Document(batch_id=empty.id)])  # A document without pages or fields
+    db.flush()
+    first = Page(document_id=document.id, page_number=1, ocr_confidence=0.95)
+    second = Page(document_id=document.id, page_number=2, ocr_confidence=0.8)  # No fields
+    db.add_all([first, second])
+    db.flush()
+    db.add_all([
+        Field(page_id=first.id, name="total_amount", value="$10.00", confidence=0.9,
+              coordinates={"x": 1.0, "y": 2.0, "width": 3.0, "height": 4.0}),
+        LineItem(page_id=first.id, row_number=1, description="Widget", quantity=2,
+                 unit_price=5.0, amount=10.0, confidence=0.9),
+    ])
+    db.commit()
+    return batch.id, empty.id
+
+
+def _records(db, **kwargs):
+    chunks = export.iter_chunks(db, export.ExportFilters(), **kwargs)
+    return [row for chunk in chunks for row in chunk]
+
+
+def test_every_record_type_in_order(db):
+    batch_id, empty_id = _seed(db)
+    records = _records(db)
+    assert [(r["batch_id"], r["record_type"], r["page_number"]) for r in records] == [
+        (batch_id, "document", None),
+        (batch_id, "page", 1),
+        (batch_id, "field", 1),
+        (batch_id, "line_item", 1),
+        (batch_id, "page", 2),
+        (empty_id, "document", None),
+    ]
+    document, page, fld, item = records[:4]
+    assert document["metadata"] == {"pages": 2} and document["confidence"] == 0.9
+    assert page["confidence"] == 0.95 and page["field_id"] is None
+    assert fld["field_name"] == "total_amount" and fld["value"] == "$10.00"
+    assert item["amount"] == 10.0 and item["description"] == "Widget"
+    assert document["batch_status"] == "completed" and document["doc_type"] == "unknown"
+
+
+def _status(batch_id):
+    check = SessionLocal()
+    try:
+        return check.get(Batch, batch_id).status
+    finally:
+        check.close()
+
+
+def test_batches_are_exporting_while_streamed(db):
+    batch_id, empty_id = _seed(db)
+    chunks = export.iter_chunks(db, export.ExportFilters(), chunk_size=2, mark_exporting=True)
+
+    next(chunks)
+    assert _status(batch_id) == ProcessingStatus.EXPORTING
+    for _ in chunks:
+        pass
+    assert _status(batch_id) == _status(empty_id) == ProcessingStatus.COMPLETED
+
+
+def test_stream_leaves_status_alone_by_default(db):
+    batch_id, _ = _seed(db)
+    stream = export.stream_export(db, export.ExportFilters(), "ndjson", chunk_size=2)
+    next(stream)  # A client that disconnects here
+    stream.close()
+    assert _status(batch_id) == ProcessingStatus.COMPLETED
+
+
+def test_csv_and_ndjson(db):
+    _seed(db)
+    rows = list(csv.DictReader(io.StringIO(b"".join(
+        export.stream_export(db, export.ExportFilters(), "csv")
+    ).decode())))
+    assert len(rows) == 6 and list(rows[0]) == export.COLUMNS
+    assert json.loads(rows[2]["coordinates"])["width"] == 3.0
+
+    lines = b"".join(export.stream_export(db, export.ExportFilters(), "ndjson")).splitlines()
+    assert [json.loads(line)["record_type"] for line in lines].count("page") == 2
+
+
+def test_parquet(db):
+    pq = pytest.importorskip("pyarrow.parquet")
+    _seed(db)
+    data = b"".join(export.stream_export(db, export.ExportFilters(), "parquet"))
+    table = pq.read_table(io.BytesIO(data))
+    assert table.num_rows == 6 and table.column_names == export.COLUMNS
+
+
+def test_missing_pyarrow_rejected_before_streaming(monkeypatch):
+    from fastapi import HTTPException
+
+    from api.endpoints.export import export_fields
+
+    monkeypatch.setattr(export, "parquet_available", lambda: False)
+    with pytest.raises(HTTPException) as excinfo:
+        export_fields(format="parquet", batch_id=[], status=None, doc_type=None, date_from=None, date_to=None)
+    assert excinfo.value.status_code == 501
@@ -0,0 +1,72 @@
+# core/test_metrics.py
+"""Pipeline metrics: stage timings, scrape-time queue depth, multiprocess aggregation."""
+
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+from core import metrics
+from core.queue import job_queue
+from core.database import Batch
+
+PROJECT_DIR = Path(__file__).resolve().parent.parent
+
+
+def _sample(name, **labels):
+    return metrics.registry.get_sample_value(name, labels) or 0.0
+
+
+def test_timed_observes_stage_and_fills_timings():
+    before = _sample("invoice_stage_seconds_count", stage="test_stage")
+    timings = {}
+    with metrics.timed("test_stage", timings):
+        pass
+    with metrics.timed("test_stage", timings):
+        pass
+    assert _sample("invoice_stage_seconds_count", stage="test_stage") == before + 2
+    assert set(timings) == {"test_stage"} and timings["test_stage"] >= 0
+
+
+def test_queue_depth_read_at_scrape_time(db):
+    batch = Batch(filename="a.pdf", original_path="/hot/a.pdf", file_hash="blake2b:a")
+    db.add(batch)
+    db.commit()
+    job_queue.enqueue(batch.id)
+
+    assert _sample("invoice_queue_jobs", status="queued") == 1
+    assert b'invoice_queue_jobs{status="queued"} 1.0' in metrics.render()
+
+
+_CHILD = """
+from core import metrics
+metrics.pages_total.labels(method="ocr").inc(3)
+metrics.record_error("hash", OSError())
+"""
+
+# The queue depth collector reads a database: keep the scrape off config.json's
+_SCRAPE = """
+import os
+from core.config import config
+config.override({"database_url": os.environ["TEST_DATABASE_URL"]})
+from core import metrics
+print(metrics.render().decode())
+"""
+
+
+def test_multiprocess_mode_sums_processes(tmp_path):
+    multiproc_dir = tmp_path / "metrics"
+    multiproc_dir.mkdir()
+    env = {
+        **os.environ,
+        "PROMETHEUS_MULTIPROC_DIR": str(multiproc_dir),
+        "PYTHONPATH": str(PROJECT_DIR),
+        "TEST_DATABASE_URL": f"sqlite:///{tmp_path / 'queue.db'}",
+    }
+    for _ in range(2):
+        subprocess.run([sys.executable, "-c", _CHILD], env=env, cwd=PROJECT_DIR, check=True)
+    output = subprocess.run(
+        [sys.executable, "-c", _SCRAPE], env=env, cwd=PROJECT_DIR, check=True, capture_output=True, text=True
+    ).stdout
+    assert 'invoice_pages_total{method="ocr"} 6.0' in output
+    assert 'invoice_errors_total{stage="hash",type="OSError"} 2.0' in output
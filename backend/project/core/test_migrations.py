@@ -0,0 +1,67 @@
+# core/test_migrations.py
+"""init_db() on a database created by an older version (storage/database.db as first shipped)."""
+
+from sqlalchemy import create_engine, inspect, select, text
+
+from core.database import DATA_MIGRATIONS, Base, Batch, SchemaMigration, SessionLocal, migrate_schema
+
+_LEGACY_SCHEMA = [
+    """CREATE TABLE batches (
+        id INTEGER NOT NULL, filename VARCHAR NOT NULL, original_path VARCHAR NOT NULL,
+        file_hash VARCHAR(64) NOT NULL, file_size INTEGER, status VARCHAR(10) NOT NULL,
+        created_at DATETIME DEFAULT CURRENT_TIMESTAMP NOT NULL, processed_at DATETIME,
+        processing_time FLOAT, error_message TEXT, PRIMARY KEY (id))""",
+    "CREATE UNIQUE INDEX ix_batches_file_hash ON batches (file_hash)",
+    """CREATE TABLE pages (
+        id INTEGER NOT NULL, document_id INTEGER NOT NULL, page_number INTEGER NOT NULL,
+        image_path VARCHAR, original_text TEXT, processed_text TEXT, ocr_confidence FLOAT,
+        PRIMARY KEY (id))""",
+    """INSERT INTO batches (filename, original_path, file_hash, file_size, status)
+       VALUES ('old.pdf', '/hot/old.pdf', '0123456789abcdef0123456789abcdef', 10, 'COMPLETED')""",
+]
+
+
+def _legacy_engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'legacy.db'}")
+    with engine.begin() as conn:
+        for statement in _LEGACY_SCHEMA:
+            conn.execute(text(statement))
+    return engine
+
+
+def test_adds_missing_columns_and_indexes(tmp_path):
+    engine = _legacy_engine(tmp_path)
+    for _ in range(2):  # As init_db() does on every start; the second run is a no-op
+        Base.metadata.create_all(bind=engine)
+        migrate_schema(engine)
+
+    inspector = inspect(engine)
+    assert {"quick_hash", "stage_timings"} <= {c["name"] for c in inspector.get_columns("batches")}
+    assert {"extraction_method", "timings"} <= {c["name"] for c in inspector.get_columns("pages")}
+    assert "ix_batches_created_id" in {ix["name"] for ix in inspector.get_indexes("batches")}
+    assert {"jobs", "line_items"} <= set(inspector.get_table_names())
+
+    session = SessionLocal(bind=engine)
+    try:
+        batch = session.scalars(select(Batch)).one()
+        assert batch.filename == "old.pdf" and batch.quick_hash is None
+        assert batch.file_hash == "md5:0123456789abcdef0123456789abcdef"
+    finally:
+        session.close()
+
+
+def test_data_migrations_run_once(tmp_path):
+    engine = _legacy_engine(tmp_path)
+    Base.metadata.create_all(bind=engine)
+    migrate_schema(engine)
+    with engine.begin() as conn:  # Would be rewritten if the table were scanned again
+        conn.execute(text(
+            "INSERT INTO batches (filename, original_path, file_hash, status, created_at) "
+            "VALUES ('new.pdf', '/hot/new.pdf', 'fedcba9876543210fedcba9876543210', 'QUEUED', '2026-03-01 12:00:00')"
+        ))
+    migrate_schema(engine)
+
+    with engine.connect() as conn:
+        assert set(conn.scalars(select(SchemaMigration.name))) == {name for name, _ in DATA_MIGRATIONS}
+        row = conn.execute(text("SELECT file_hash, created_at FROM batches WHERE filename = 'new.pdf'")).one()
+    assert tuple(row) == ("fedcba9876543210fedcba9876543210", "2026-03-01 12:00:00")
@@ -0,0 +1,142 @@
+# core/test_queue.py
+"""Durable job queue: claim order, leases, heartbeats, reaping, retry backoff, dead-letter."""
+
+from datetime import timedelta
+
+import pytest
+from sqlalchemy import update
+
+from core.database import Batch, Job, JobStatus
+from core.queue import MAX_BACKOFF_SECONDS, JobQueue, _now
+
+
+@pytest.fixture
+def queue(db):
+    return JobQueue()
+
+
+def _batches(db, n):
+    batches = [
+        Batch(filename=f"{i}.pdf", original_path=f"/hot/{i}.pdf", file_hash=f"blake2b:{i}")
+        for i in range(n)
+    ]
+    db.add_all(batches)
+    db.commit()
+    return [b.id for b in batches]
+
+
+def _job(db, job_id) -> Job:
+    db.expire_all()
+    return db.get(Job, job_id)
+
+
+def test_enqueue_is_idempotent_while_active(db, queue):
+    (batch_id,) = _batches(db, 1)
+    job_id = queue.enqueue(batch_id)
+    assert queue.enqueue(batch_id) == job_id
+    assert queue.pending() == 1
+
+
+def test_claim_order_and_exclusive_lease(db, queue):
+    low, high, normal = _batches(db, 3)
+    queue.enqueue(low, priority=5)
+    queue.enqueue(high, priority=-5)
+    queue.enqueue(normal)
+
+    claimed = [queue.claim(f"worker-{i}") for i in range(4)]
+    assert [job.batch_id for job in claimed[:3]] == [high, normal, low]
+    assert claimed[3] is None  # Each job is leased once
+
+    job = _job(db, claimed[0].id)
+    assert job.status == JobStatus.LEASED and job.lease_owner == "worker-0" and job.attempts == 1
+
+
+def test_heartbeat_renews_only_own_leases(db, queue):
+    (batch_id,) = _batches(db, 1)
+    queue.enqueue(batch_id)
+    job = queue.claim("a", lease_seconds=10)
+    assert queue.heartbeat([job.id], "b") == 0
+    assert queue.heartbeat([job.id], "a", lease_seconds=600) == 1
+    remaining = _job(db, job.id).lease_expires_at.replace(tzinfo=None) - _now().replace(tzinfo=None)
+    assert remaining > timedelta(seconds=500)
+
+
+def test_failure_retries_after_backoff_then_dead_letters(db, queue, override_config):
+    override_config({"queue_max_attempts": 2})
+    (batch_id,) = _batches(db, 1)
+    job_id = queue.enqueue(batch_id)
+
+    job = queue.claim("a")
+    assert queue.fail(job.id, "a", "boom") is True
+    assert _job(db, job_id).status == JobStatus.QUEUED
+    assert queue.claim("a") is None  # Backing off
+
+    db.execute(update(Job).where(Job.id == job_id).values(available_at=_now() - timedelta(seconds=1)))
+    db.commit()
+    job = queue.claim("a")
+    assert job.attempts == 2
+    assert queue.fail(job.id, "a", "boom again") is False
+    job = _job(db, job_id)
+    assert job.status == JobStatus.DEAD and job.last_error == "boom again"
+
+
+def test_permanent_failure_skips_retries(db, queue):
+    (batch_id,) = _batches(db, 1)
+    job_id = queue.enqueue(batch_id)
+    job = queue.claim("a")
+    assert queue.fail(job.id, "a", "unsupported", permanent=True) is False
+    assert _job(db, job_id).status == JobStatus.DEAD
+
+
+def test_failure_from_lost_lease_is_ignored(db, queue):
+    (batch_id,) = _batches(db, 1)
+    queue.enqueue(batch_id)
+    job = queue.claim("a")
+    assert queue.fail(job.id, "b", "not mine") is True
+    assert _job(db, job.id).status == JobStatus.LEASED
+
+
+def test_reap_expired_requeues_or_dead_letters(db, queue, override_config):
+    override_config({"queue_max_attempts": 1})
+    retry, exhausted = _batches(db, 2)
+    retry_id = queue.enqueue(retry)
+    queue.claim("dead-worker", lease_seconds=-1)  # Lease already expired
+    db.execute(update(Job).where(Job.id == retry_id).values(max_attempts=3))
+    db.commit()
+    exhausted_id = queue.enqueue(exhausted)
+    queue.claim("dead-worker", lease_seconds=-1)
+
+    assert queue.reap_expired() == 2
+    assert _job(db, retry_id).status == JobStatus.QUEUED
+    assert _job(db, exhausted_id).status == JobStatus.DEAD
+    assert queue.claim("b").id == retry_id
+
+
+def test_backoff_doubles_and_is_capped(override_config):
+    override_config({"queue_retry_backoff_seconds": 30})
+    assert [JobQueue.backoff(n) for n in (1, 2, 3)] == [30, 60, 120]
+    assert JobQueue.backoff(50) == MAX_BACKOFF_SECONDS
+
+
+def test_pending_batches_without_a_job_are_queued(db, queue):
+    deferred, legacy, queued, failed = _batches(db, 4)
+    queue.enqueue(queued)
+    db.execute(update(Batch).where(Batch.id == failed).values(status="ERROR"))
+    db.commit()
+
+    assert queue.enqueue_orphans() == 0  # Younger than the grace period
+    assert queue.enqueue_orphans(limit=1, min_age_seconds=0) == 1
+    assert queue.enqueue_orphans(min_age_seconds=0) == 1
+    assert queue.enqueue_orphans(min_age_seconds=0) == 0
+    assert sorted(job.batch_id for job in [queue.claim("a") for _ in range(3)]) == [deferred, legacy, queued]
+
+
+def test_one_active_job_per_batch(db, queue):
+    from sqlalchemy.exc import IntegrityError
+
+    (batch_id,) = _batches(db, 1)
+    queue.enqueue(batch_id)
+    with pytest.raises(IntegrityError):
+        queue.enqueue_many([batch_id], db)
+        db.flush()
+    db.rollback()
@@ -0,0 +1,87 @@
+"""
+core/timings.py
+
+Per-stage timing breakdowns persisted with each batch.
+
+The processor stores `Batch.stage_timings` (whole-batch stages plus the
+per-page stages summed over pages) and `Page.timings`, all in seconds:
+
+    detect       file type sniffing (extension / libmagic)
+    classify     document type inference from the first pages' text
+    pages        wall time of the page fan-out to the OCR pool
+    text_layer   embedded text extraction   (per page, summed)
+    render       rasterization + preview    (per page, summed)
+    preprocess   OCR input normalization    (per page, summed; watcher/preprocess.py)
+    ocr          Tesseract                  (per page, summed)
+    extraction   field extraction
+    tables       line-item extraction and reconciliation
+    db_write     document/page/field inserts and commit
+    archive      move to the processed folder
+    total        wall time of the whole batch
+
+`summarize()` aggregates them into percentiles for
+GET /api/v1/processing/timings.
+"""
+
+import math
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from core.database import Batch
+
+PERCENTILES = (50, 90, 95, 99)
+
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    """Linear-interpolated percentile (0-100) of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = (len(sorted_values) - 1) * q / 100
+    low, high = math.floor(rank), math.ceil(rank)
+    return sorted_values[low] + (sorted_values[high] - sorted_values[low]) * (rank - low)
+
+
+def summarize(timings: Iterable[Dict[str, float]]) -> Dict[str, Dict[str, float]]:
+    """Per stage: count, mean, max and PERCENTILES over a set of timing dicts."""
+    by_stage: Dict[str, List[float]] = {}
+    for entry in timings:
+        for stage, seconds in (entry or {}).items():
+            by_stage.setdefault(stage, []).append(float(seconds))
+
+    summary = {}
+    for stage, values in by_stage.items():
+        values.sort()
+        stats = {
+            "count": len(values),
+            "mean": sum(values) / len(values),
+            "max": values[-1],
+        }
+        stats.update({f"p{q}": percentile(values, q) for q in PERCENTILES})
+        summary[stage] = stats
+    return summary
+
+
+def batch_timings(
+    session: Session,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    filename: Optional[str] = None,
+    limit: int = 10_000,
+) -> List[Dict[str, Any]]:
+    """Stage timings of the most recently processed batches in a window."""
+    stmt = (
+        select(Batch.stage_timings)
+        .where(Batch.stage_timings.is_not(None))
+        .order_by(Batch.processed_at.desc())
+        .limit(limit)
+    )
+    if date_from:
+        stmt = stmt.where(Batch.processed_at >= date_from)
+    if date_to:
+        stmt = stmt.where(Batch.processed_at <= date_to)
+    if filename:
+        stmt = stmt.where(Batch.filename.ilike(f"%{filename}%"))
+    return list(session.scalars(stmt))
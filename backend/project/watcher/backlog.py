@@ -0,0 +1,248 @@
+# watcher/backlog.py
+"""
+Bulk ingest of files already waiting in the hot folder.
+
+Used on watcher startup (`initial_scan`) and as a standalone mode after an
+outage:
+
+    python -m watcher.backlog                  # ingest the configured hot folder
+    python -m watcher.backlog --chunk-size 1000
+
+Pipeline:
+- one `os.scandir` walk over the hot folder, yielding matching files lazily
+- files are hashed on a thread pool (hashlib releases the GIL), in chunks
+- each chunk's new files are inserted as Batch rows with one bulk INSERT,
+  and their jobs queued in the same transaction, so workers start on the
+  first chunk while the rest is still being hashed
+- progress is logged after every chunk
+- admission control: each chunk is capped to the queue's free slots, and
+  the walk pauses while the queue is full (queue_max_pending)
+
+Files modified too recently to be complete are handed to the live
+watcher's stability tracker instead.
+"""
+
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime
+from itertools import islice
+from pathlib import Path
+from typing import TYPE_CHECKING, Iterator, List, Optional, Sequence, Tuple
+
+from sqlalchemy import insert
+from sqlalchemy.exc import IntegrityError
+
+from core import metrics
+from core.config import config
+from core.database import Batch, ProcessingStatus, SessionLocal
+from core.queue import job_queue, priority_for
+from watcher.hashing import hash_file_all, quick_signature
+
+if TYPE_CHECKING:
+    from watcher.main import HotFolderHandler
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHUNK_SIZE = 500
+
+
+@dataclass
+class BacklogStats:
+    """Running totals of a backlog ingest."""
+    scanned: int = 0
+    created: int = 0
+    duplicates: int = 0
+    skipped: int = 0      # too large, unreadable, or still being written
+    started: float = 0.0
+
+    @property
+    def rate(self) -> float:
+        elapsed = time.monotonic() - self.started
+        return self.scanned / elapsed if elapsed > 0 else 0.0
+
+    def __str__(self) -> str:
+        return (
+            f"scanned {self.scanned}, created {self.created}, duplicates {self.duplicates}, "
+            f"skipped {self.skipped} ({self.rate:.1f} files/s)"
+        )
+
+
+def iter_files(root: str, recursive: bool, handler: "HotFolderHandler") -> Iterator[os.DirEntry]:
+    """Single scandir walk over `root`, yielding files that match the configured patterns."""
+    stack = [root]
+    while stack:
+        directory = stack.pop()
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        if recursive:
+                            stack.append(entry.path)
+                    elif entry.is_file() and handler.matches_patterns(entry.path):
+                        yield entry
+        except OSError as e:
+            logger.error(f"Cannot scan {directory}: {e}")
+
+
+def _fingerprint(path: str, algorithms: Sequence[str]) -> Optional[Tuple[str, str, List[str]]]:
+    """
+    (file_hash, quick_hash, aliases), or None if the file can't be read.
+    `aliases` are the digests under algorithms[1:]. Runs on the pool.
+    """
+    try:
+        with metrics.stage_seconds.labels(stage="hash").time():
+            file_hash, *aliases = hash_file_all(path, algorithms)
+            return file_hash, quick_signature(path), aliases
+    except OSError as e:
+        logger.error(f"Failed to hash file {path}: {e}")
+        metrics.record_error("hash", e)
+        return None
+
+
+def ingest_backlog(
+    handler: "HotFolderHandler",
+    root: Optional[str] = None,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    threads: Optional[int] = None,
+) -> BacklogStats:
+    """
+    Ingest every file waiting in `root` (default: the hot folder).
+
+    `handler` supplies the pattern filter (`matches_patterns`), the
+    duplicate index, the stability tracker for files still being written
+    and the `stopping` event that interrupts the ingest.
+    """
+    root = str(Path(root or config.hot_folder).resolve())
+    stats = BacklogStats(started=time.monotonic())
+    max_size = config.max_file_size_mb * 1024 * 1024
+    # Anything modified within this window may still be growing
+    settle_seconds = config.stability_check_interval * config.stability_checks
+    queue_jobs = config.auto_start_processing
+
+    files = iter_files(root, config.watch_subfolders, handler)
+    with ThreadPoolExecutor(max_workers=threads or os.cpu_count(), thread_name_prefix="backlog") as pool:
+        while True:
+            limit = chunk_size
+            if queue_jobs:
+                if not job_queue.wait_for_capacity(stop=handler.stopping):
+                    logger.info(f"Backlog ingest interrupted: {stats}")
+                    break
+                free = job_queue.admission()["free"]
+                limit = chunk_size if free < 0 else max(1, min(chunk_size, free))
+
+            chunk = list(islice(files, limit))
+            if not chunk:
+                break
+            stats.scanned += len(chunk)
+
+            now = time.time()
+            ready: List[Tuple[str, int]] = []
+            for entry in chunk:
+                st = entry.stat()
+                if st.st_size > max_size:
+                    logger.warning(f"File exceeds max size ({config.max_file_size_mb}MB): {entry.path}")
+                    stats.skipped += 1
+                elif now - st.st_mtime < settle_seconds or st.st_size == 0:
+                    handler.tracker.track(entry.path)
+                    stats.skipped += 1
+                else:
+                    ready.append((entry.path, st.st_size))
+
+            rows = []
+            seen_in_chunk = set()
+            algorithms = handler.duplicates.algorithms()
+            fingerprints = pool.map(lambda p: _fingerprint(p, algorithms), [p for p, _ in ready])
+            for (path, size), fingerprint in zip(ready, fingerprints):
+                if fingerprint is None:
+                    stats.skipped += 1
+                    continue
+                file_hash, quick_hash, aliases = fingerprint
+                if file_hash in seen_in_chunk or handler.duplicates.is_duplicate(file_hash, quick_hash, aliases):
+                    stats.duplicates += 1
+                    metrics.ingested_files_total.labels(result="duplicate").inc()
+                    continue
+                seen_in_chunk.add(file_hash)
+                rows.append({
+                    "filename": os.path.basename(path),
+                    "original_path": path,
+                    "file_hash": file_hash,
+                    "quick_hash": quick_hash,
+                    "file_size": size,
+                    "status": ProcessingStatus.PENDING,
+                    "created_at": datetime.utcnow(),
+                    "priority": priority_for(path, size),
+                })
+
+            created = _insert_batches(rows, queue_jobs)
+            metrics.ingested_files_total.labels(result="created").inc(created)
+            for row in rows:
+                handler.duplicates.add(row["file_hash"], row["quick_hash"])
+            stats.created += created
+            stats.duplicates += len(rows) - created  # Lost a race with the live watcher
+            logger.info(f"Backlog: {stats}")
+
+    logger.info(f"Backlog ingest finished in {time.monotonic() - stats.started:.1f}s: {stats}")
+    return stats
+
+
+def _insert_batches(rows: List[dict], queue_jobs: bool) -> int:
+    """
+    Bulk-insert Batch rows and queue their jobs in one transaction.
+
+    If the bulk insert hits the unique file_hash constraint (a file
+    ingested concurrently by the live watcher), falls back to one row at a
+    time and skips the duplicates. Returns the number of batches created.
+    """
+    if not rows:
+        return 0
+
+    priorities = [row.pop("priority") for row in rows]
+    session = SessionLocal()
+    try:
+        try:
+            batch_ids = list(session.scalars(insert(Batch).returning(Batch.id), rows))
+            if queue_jobs:
+                job_queue.enqueue_many(batch_ids, session, priorities)
+            session.commit()
+            return len(batch_ids)
+        except IntegrityError:
+            session.rollback()
+
+        created = 0
+        for row, priority in zip(rows, priorities):
+            try:
+                batch_id = session.scalar(insert(Batch).values(**row).returning(Batch.id))
+                if queue_jobs:
+                    job_queue.enqueue_many([batch_id], session, [priority])
+                session.commit()
+                created += 1
+            except IntegrityError:
+                session.rollback()
+                logger.info(f"Duplicate file detected (hash match): {row['original_path']}")
+        return created
+    finally:
+        session.close()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from core.database import init_db
+    from watcher.main import HotFolderHandler
+
+    parser = argparse.ArgumentParser(description="Ingest files waiting in the hot folder")
+    parser.add_argument("--root", help="Folder to ingest (default: hot_folder)")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument("--threads", type=int, default=None, help="Hashing threads (default: CPU count)")
+    args = parser.parse_args()
+
+    init_db()
+    backlog_handler = HotFolderHandler()
+    try:
+        ingest_backlog(backlog_handler, args.root, args.chunk_size, args.threads)
+    finally:
+        # Files handed to the stability tracker are ingested before exiting
+        backlog_handler.shutdown()
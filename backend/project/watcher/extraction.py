@@ -0,0 +1,64 @@
+# watcher/extraction.py
+"""
+Field extraction from page text.
+
+Pure functions of the text, with no database, file or OCR access. The
+processor calls them for freshly read pages and watcher/reextract.py reruns
+them over stored `Page.processed_text` (in a process pool, so they must stay
+top-level and picklable).
+
+`extract_document` runs the template rule engine (watcher/rules.py).
+`extract_basic_fields` is the original three-regex extractor, kept as the
+baseline for benchmarks/extraction.py.
+"""
+
+import re
+from itertools import groupby
+from typing import List, Sequence, Tuple
+
+from watcher.page_text import PageText
+from watcher.rules import ExtractedField, get_engine
+
+_INVOICE_NUMBER_RE = re.compile(r"(?:invoice|inv[. ]?#?)[:\s]*([A-Z0-9-]{5,})", re.I)
+_DATE_RE = re.compile(r"(?:date|issued)[:\s]*(\d{1,2}[\/\-\.]\d{1,2}[\/\-\.]\d{2,4})", re.I)
+_TOTAL_RE = re.compile(r"total[:\s]*\$?([\d,]+\.?\d*)", re.I)
+
+
+def extract_document(pages: Sequence[PageText]) -> List[List[ExtractedField]]:
+    """Fields of each page of one document (vendor template chosen from the first page)."""
+    return get_engine().extract_document(pages)
+
+
+def extract_basic_fields(text: str) -> List[ExtractedField]:
+    """Very basic field extraction using regex - replace with proper NLP/ML."""
+    fields = []
+
+    # Invoice Number
+    m = _INVOICE_NUMBER_RE.search(text)
+    if m:
+        fields.append(("invoice_number", m.group(1).strip(), 0.92))
+
+    # Date
+    m = _DATE_RE.search(text)
+    if m:
+        fields.append(("date", m.group(1), 0.88))
+
+    # Total
+    m = _TOTAL_RE.search(text)
+    if m:
+        fields.append(("total_amount", f"${m.group(1)}", 0.95))
+
+    return fields
+
+
+def extract_chunk(pages: Sequence[Tuple[int, int, str]]) -> List[Tuple[int, List[ExtractedField]]]:
+    """
+    Process pool entry point for re-extraction:
+    (page_id, document_id, text) of whole documents in page order -> (page_id, fields).
+    """
+    results = []
+    for _, document_pages in groupby(pages, key=lambda p: p[1]):
+        document_pages = list(document_pages)
+        extracted = extract_document([PageText(text=text or "") for _, _, text in document_pages])
+        results.extend((page_id, fields) for (page_id, _, _), fields in zip(document_pages, extracted))
+    return results
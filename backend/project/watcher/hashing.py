@@ -0,0 +1,88 @@
+# watcher/hashing.py
+"""
+File fingerprints for duplicate detection.
+
+- `hash_file()`: full-content digest in a single pass with large reads,
+  returned as "<algorithm>:<hex>" (the format stored in Batch.file_hash),
+  so the algorithm can change without old and new digests being confused;
+  `hash_file_all()` computes several digests in the same pass, so a file
+  can also be checked against rows hashed with an older algorithm
+- `quick_signature()`: size + digest of the first and last block. Two
+  files with different signatures cannot be identical, so a new file whose
+  signature is unknown skips the duplicate lookup altogether
+
+Algorithms: blake2b (default, fastest in the standard library on 64-bit
+CPUs), sha256, md5, and xxh3_128 when the optional `xxhash` package is
+installed.
+"""
+
+import hashlib
+import logging
+import os
+from typing import Callable, Dict, List, Sequence
+
+logger = logging.getLogger(__name__)
+
+# 1 MiB reads: few syscalls, still cache friendly
+HASH_BUFFER_SIZE = 1024 * 1024
+
+# Bytes read from each end of the file for the quick signature
+QUICK_BLOCK_SIZE = 64 * 1024
+
+_ALGORITHMS: Dict[str, Callable] = {
+    "blake2b": lambda: hashlib.blake2b(digest_size=32),
+    "sha256": hashlib.sha256,
+    "md5": hashlib.md5,
+}
+
+try:
+    import xxhash
+
+    _ALGORITHMS["xxh3_128"] = xxhash.xxh3_128
+except ImportError:
+    pass
+
+
+def _new_hasher(algorithm: str):
+    try:
+        return _ALGORITHMS[algorithm]()
+    except KeyError:
+        raise ValueError(
+            f"Unsupported hash algorithm '{algorithm}' (available: {', '.join(_ALGORITHMS)})"
+        ) from None
+
+
+def hash_file(path: str, algorithm: str = "blake2b") -> str:
+    """Digest the whole file in one pass. Returns "<algorithm>:<hex>"."""
+    return hash_file_all(path, [algorithm])[0]
+
+
+def hash_file_all(path: str, algorithms: Sequence[str]) -> List[str]:
+    """
+    Digest the whole file with several algorithms in the same single pass
+    (the configured one, plus those of older rows still in the database).
+    Returns "<algorithm>:<hex>" for each, in order.
+    """
+    hashers = [_new_hasher(algorithm) for algorithm in algorithms]
+    buffer = bytearray(HASH_BUFFER_SIZE)
+    view = memoryview(buffer)
+    with open(path, "rb", buffering=0) as f:
+        while True:
+            n = f.readinto(buffer)
+            if not n:
+                break
+            for hasher in hashers:
+                hasher.update(view[:n])
+    return [f"{algorithm}:{hasher.hexdigest()}" for algorithm, hasher in zip(algorithms, hashers)]
+
+
+def quick_signature(path: str) -> str:
+    """Size plus a digest of the first and last QUICK_BLOCK_SIZE bytes: "<size>:<hex>"."""
+    hasher = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        hasher.update(f.read(QUICK_BLOCK_SIZE))
+        if size > QUICK_BLOCK_SIZE:
+            f.seek(max(QUICK_BLOCK_SIZE, size - QUICK_BLOCK_SIZE))
+            hasher.update(f.read(QUICK_BLOCK_SIZE))
+    return f"{size}:{hasher.hexdigest()}"
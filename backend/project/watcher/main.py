@@ -4,10 +4,14 @@ watcher/main.py
 Main file system watcher for the invoice automation system.
 Uses watchdog to monitor the hot folder for new files (PDFs, images, etc.).
 Features:
-- Initial scan for existing files on startup
-- Duplicate prevention via file hash (MD5) and database check
+- Initial scan for existing files on startup (bulk, parallel: watcher/backlog.py)
+- Write-completion detection (watcher/stability.py): files are ingested
+  once closed, renamed into place, or unchanged across checks
+- Duplicate prevention via file hash (BLAKE2 by default, one pass), checked
+  against persisted Bloom filters and the unique index on batches.file_hash
 - Configurable polling, file patterns, and subfolder watching
-- Background processing via ProcessManager (from processor.py)
+- Batches queued in the durable job queue (core/queue.py); processed by
+  embedded ProcessManager workers and/or standalone `watcher.worker` processes
 - Logging to file and console
 - Graceful shutdown on Ctrl+C
 
@@ -18,17 +22,33 @@ Dependencies:
 """
 
 import time
-import hashlib
 import logging
+import threading
+from datetime import datetime
 from pathlib import Path
-from typing import Set
+from typing import Optional, Tuple
 
 from watchdog.observers import Observer
-from watchdog.events import FileSystemEventHandler, FileCreatedEvent
+from watchdog.events import (
+    FileSystemEventHandler,
+    FileCreatedEvent,
+    FileModifiedEvent,
+    FileClosedEvent,
+    FileMovedEvent,
+    FileDeletedEvent,
+)
+
+from sqlalchemy.exc import IntegrityError
 
+from core import metrics
 from core.config import config
 from core.database import SessionLocal, Batch, ProcessingStatus
+from core.dedupe import duplicate_index
+from core.queue import job_queue, priority_for
 from watcher.processor import ProcessManager  # Handles actual processing
+from watcher.backlog import ingest_backlog
+from watcher.hashing import hash_file_all, quick_signature
+from watcher.stability import StabilityTracker
 
 # Setup logging early
 logging.basicConfig(
@@ -46,49 +66,32 @@ class HotFolderHandler(FileSystemEventHandler):
     """
     Custom watchdog handler for hot folder events.
     
-    - Loads processed hashes from DB on init
-    - Computes MD5 hash for duplicate check
+    - Event callbacks only feed the stability tracker (never block the observer)
+    - Duplicate check via the shared, persisted duplicate index (core/dedupe.py)
+    - Hashes each file once; quick signature prefilter for duplicate check
     - Validates file type, size, and uniqueness
     - Creates Batch record in DB
-    - Triggers processing if auto_start_processing is True
+    - Queues processing if auto_start_processing is True
     """
     
     def __init__(self):
-        self.process_manager = ProcessManager()
-        self.processed_files: Set[str] = set()
-        self._load_processed_files()
+        # With embedded_workers off, OCR runs only in `python -m watcher.worker` processes
+        self.process_manager = ProcessManager() if config.embedded_workers else None
+        # Shared, persisted Bloom filters; the DB unique index has the final say
+        self.duplicates = duplicate_index
+        self.stopping = threading.Event()  # Set by shutdown(); waits on the queue give up
+        self.tracker = StabilityTracker(on_ready=self.ingest)
 
-    def _load_processed_files(self) -> None:
-        """Load hashes of already processed files from database."""
-        session = SessionLocal()
-        try:
-            batches = session.query(Batch.file_hash).all()
-            self.processed_files = {hash_[0] for hash_ in batches}
-            logger.info(f"Loaded {len(self.processed_files)} processed files from DB")
-        except Exception as e:
-            logger.error(f"Failed to load processed files: {e}")
-        finally:
-            session.close()
-
-    def _get_file_hash(self, filepath: str) -> str:
-        """Compute MD5 hash of file contents (chunked for large files)."""
-        hasher = hashlib.md5()
-        try:
-            with open(filepath, 'rb') as f:
-                for chunk in iter(lambda: f.read(4096), b""):
-                    hasher.update(chunk)
-            return hasher.hexdigest()
-        except Exception as e:
-            logger.error(f"Failed to hash file {filepath}: {e}")
-            raise
+    def matches_patterns(self, filepath: str) -> bool:
+        """Cheap name-only check against file patterns (e.g., *.pdf, *.jpg)."""
+        path = Path(filepath)
+        return any(path.match(pattern) for pattern in config.file_patterns)
 
     def _is_valid_file(self, filepath: str) -> bool:
-        """Validate file: pattern match, size limit, not duplicate."""
+        """Validate a complete file: pattern match and size limit."""
         path = Path(filepath)
         
-        # Check against file patterns (e.g., *.pdf, *.jpg)
-        patterns = config.file_patterns
-        if not any(path.match(pattern) for pattern in patterns):
+        if not self.matches_patterns(filepath):
             logger.debug(f"File does not match patterns: {filepath}")
             return False
         
@@ -103,28 +106,42 @@ class HotFolderHandler(FileSystemEventHandler):
             logger.error(f"Failed to stat file {filepath}: {e}")
             return False
         
-        # Check duplicate via hash
-        try:
-            file_hash = self._get_file_hash(filepath)
-            if file_hash in self.processed_files:
-                logger.info(f"Duplicate file detected (hash match): {filepath}")
-                return False
-        except Exception:
-            return False  # Skip if hash fails
-        
         return True
 
-    def _create_batch_record(self, filepath: str) -> Batch:
-        """Create a new Batch entry in DB for the file."""
+    def _fingerprint(self, filepath: str) -> Optional[Tuple[str, str]]:
+        """
+        Return (file_hash, quick_hash), or None if the file is a duplicate.
+
+        The file is read for the full digest exactly once (also computing
+        the digests of older rows' algorithms, if any). The duplicate index
+        only touches the database when its filters report a possible match.
+        """
+        try:
+            with metrics.stage_seconds.labels(stage="hash").time():
+                quick = quick_signature(filepath)
+                file_hash, *aliases = hash_file_all(filepath, self.duplicates.algorithms())
+        except Exception as e:
+            logger.error(f"Failed to hash file {filepath}: {e}")
+            metrics.record_error("hash", e)
+            return None  # Skip if hash fails
+
+        if self.duplicates.is_duplicate(file_hash, quick, aliases):
+            logger.info(f"Duplicate file detected (hash match): {filepath}")
+            metrics.ingested_files_total.labels(result="duplicate").inc()
+            return None
+        return file_hash, quick
+
+    def _create_batch_record(self, filepath: str, file_hash: str, quick_hash: str) -> Optional[Batch]:
+        """Create a new Batch entry in DB for the file (None if another watcher got there first)."""
         session = SessionLocal()
         try:
             path = Path(filepath)
-            file_hash = self._get_file_hash(filepath)
             
             batch = Batch(
                 filename=path.name,
                 original_path=str(path.absolute()),  # Absolute path for reliability
                 file_hash=file_hash,
+                quick_hash=quick_hash,
                 file_size=path.stat().st_size,
                 status=ProcessingStatus.PENDING,
                 created_at=datetime.utcnow()  # Explicit for consistency
@@ -134,44 +151,102 @@ class HotFolderHandler(FileSystemEventHandler):
             session.commit()
             session.refresh(batch)
             
-            self.processed_files.add(file_hash)
-            logger.info(f"Created batch #{batch.id} for {path.name} (hash: {file_hash[:8]}...)")
+            self.duplicates.add(file_hash, quick_hash)
+            metrics.ingested_files_total.labels(result="created").inc()
+            logger.info(f"Created batch #{batch.id} for {path.name} (hash: {file_hash[:16]}...)")
             
             return batch
+        except IntegrityError:
+            # Unique file_hash: a concurrent watcher ingested the same content
+            session.rollback()
+            logger.info(f"Duplicate file detected (hash match): {filepath}")
+            metrics.ingested_files_total.labels(result="duplicate").inc()
+            return None
         except Exception as e:
             session.rollback()
             logger.error(f"Failed to create batch for {filepath}: {e}")
+            metrics.record_error("ingest", e)
             raise
         finally:
             session.close()
 
+    # ------------------------------------------------------------------ #
+    # Watchdog events (observer thread)
+    # ------------------------------------------------------------------ #
+
     def on_created(self, event: FileCreatedEvent) -> None:
-        """Event handler for new file creation."""
+        """New file: start waiting for it to be completely written."""
+        if event.is_directory or not self.matches_patterns(event.src_path):
+            return
+        logger.debug(f"File created event: {event.src_path}")
+        self.tracker.track(event.src_path)
+
+    def on_modified(self, event: FileModifiedEvent) -> None:
+        """Still being written: restart the stability count."""
+        if event.is_directory or not self.matches_patterns(event.src_path):
+            return
+        self.tracker.track(event.src_path)
+
+    def on_closed(self, event: FileClosedEvent) -> None:
+        """Writer closed the file (inotify IN_CLOSE_WRITE): it is complete."""
+        if event.is_directory or not self.matches_patterns(event.src_path):
+            return
+        self.tracker.mark_complete(event.src_path)
+
+    def on_moved(self, event: FileMovedEvent) -> None:
+        """Renamed into place (e.g. upload.tmp -> invoice.pdf): the target is complete."""
         if event.is_directory:
-            return  # Ignore directories
-        
-        filepath = event.src_path
-        logger.debug(f"File created event: {filepath}")
-        
-        if self._is_valid_file(filepath):
-            try:
-                # Brief wait for file write to complete (adjust if needed)
-                time.sleep(0.5)
-                
-                # Create DB record
-                batch = self._create_batch_record(filepath)
-                
-                # Auto-process if enabled
-                if config.auto_start_processing:
-                    logger.info(f"Auto-processing batch #{batch.id}")
-                    self.process_manager.process_file(batch)
-                else:
-                    logger.info(f"Batch #{batch.id} created - processing deferred")
-                    
-            except Exception as e:
-                logger.error(f"Error processing {filepath}: {e}")
-        else:
+            return
+        self.tracker.discard(event.src_path)
+        if self.matches_patterns(event.dest_path):
+            self.tracker.mark_complete(event.dest_path)
+
+    def on_deleted(self, event: FileDeletedEvent) -> None:
+        if not event.is_directory:
+            self.tracker.discard(event.src_path)
+
+    # ------------------------------------------------------------------ #
+    # Ingestion (ingest thread pool, once the file is complete)
+    # ------------------------------------------------------------------ #
+
+    def ingest(self, filepath: str) -> None:
+        """Validate a complete file, record its batch and queue it for processing."""
+        if not self._is_valid_file(filepath):
             logger.debug(f"Skipping invalid file: {filepath}")
+            return
+
+        # Backpressure: while the queue is full the file just waits in the hot folder
+        if config.auto_start_processing and not job_queue.wait_for_capacity(stop=self.stopping):
+            logger.info(f"Shutting down, leaving {filepath} for the next start")
+            return
+
+        fingerprint = self._fingerprint(filepath)
+        if fingerprint is None:
+            return
+
+        try:
+            # Create DB record
+            batch = self._create_batch_record(filepath, *fingerprint)
+            if batch is None:
+                return
+
+            # Auto-process if enabled: queue it for any worker to claim
+            if config.auto_start_processing:
+                job_id = job_queue.enqueue(batch.id, priority=priority_for(filepath, batch.file_size))
+                logger.info(f"Queued batch #{batch.id} as job #{job_id}")
+            else:
+                logger.info(f"Batch #{batch.id} created - processing deferred")
+
+        except Exception as e:
+            logger.error(f"Error processing {filepath}: {e}")
+
+    def shutdown(self) -> None:
+        """Stop the tracker (finishing in-progress ingests), then the embedded workers."""
+        self.stopping.set()
+        self.tracker.shutdown(wait=True)
+        self.duplicates.save()
+        if self.process_manager:
+            self.process_manager.shutdown(wait=True)
 
 
 class HotFolderWatcher:
@@ -226,11 +301,12 @@ class HotFolderWatcher:
             self.is_running = False
             self.observer.stop()
             self.observer.join()
+            self.handler.shutdown()
             logger.info("Watcher stopped successfully")
 
 
-def initial_scan() -> None:
-    """Scan and process existing files in hot folder on startup."""
+def initial_scan(handler: HotFolderHandler) -> None:
+    """Ingest files already waiting in the hot folder (see watcher/backlog.py)."""
     logger.info("Performing initial scan of hot folder...")
     
     hot_folder = Path(config.hot_folder).resolve()
@@ -238,16 +314,7 @@ def initial_scan() -> None:
         logger.warning(f"Hot folder does not exist: {hot_folder}")
         return
     
-    handler = HotFolderHandler()
-    
-    # Glob for patterns (recursive if enabled)
-    glob_method = hot_folder.rglob if config.watch_subfolders else hot_folder.glob
-    for pattern in config.file_patterns:
-        for filepath in glob_method(pattern):
-            if filepath.is_file():
-                logger.info(f"Found existing file: {filepath}")
-                # Simulate creation event
-                handler.on_created(FileCreatedEvent(str(filepath)))
+    ingest_backlog(handler, str(hot_folder))
 
 
 if __name__ == "__main__":
@@ -256,10 +323,15 @@ if __name__ == "__main__":
     init_db()
     logger.info("Database initialized")
     
-    # Initial scan if auto-processing enabled
+    metrics.start_http_server(config.metrics_port)
+    watcher = HotFolderWatcher()
+    
+    # Initial scan if auto-processing enabled; runs alongside the live
+    # watcher so new files aren't held up behind a large backlog
     if config.auto_start_processing:
-        initial_scan()
+        threading.Thread(
+            target=initial_scan, args=(watcher.handler,), name="initial-scan", daemon=True
+        ).start()
     
     # Start the watcher
-    watcher = HotFolderWatcher()
     watcher.start()
\ No newline at end of file
@@ -0,0 +1,87 @@
+# watcher/ocr.py
+"""
+Single-pass Tesseract OCR.
+
+Runs `pytesseract.image_to_data` once per page and derives everything the
+pipeline needs from that one result: the page text (rebuilt in reading
+order from block/paragraph/line numbers), per-word confidences and word
+bounding boxes. Previously each page was OCR'd twice (`image_to_string`
+for the text and `image_to_data` only for the confidence average).
+"""
+
+import logging
+from typing import Dict, List, Tuple
+
+import pytesseract
+from PIL import Image
+
+from core.database import ExtractionMethod
+from watcher.page_text import PageText, Word
+
+logger = logging.getLogger(__name__)
+
+
+def run_ocr(image: Image.Image, scale: float = 1.0, lang: str = "eng") -> PageText:
+    """
+    OCR an image with a single Tesseract invocation.
+
+    Args:
+        image: Page image
+        scale: Pixels per output unit. Pass the render zoom for rasterized
+               PDF pages so word boxes come back in PDF points; leave at 1.0
+               for plain images (boxes in pixels).
+        lang: Tesseract language(s)
+
+    Returns:
+        PageText with text, words (confidence 0.0 - 1.0) and the mean word
+        confidence as page confidence.
+    """
+    data = pytesseract.image_to_data(image, lang=lang, output_type=pytesseract.Output.DICT)
+    return page_text_from_data(data, scale)
+
+
+def page_text_from_data(data: Dict[str, List], scale: float = 1.0) -> PageText:
+    """Build a PageText from a `pytesseract.image_to_data` DICT result."""
+    words: List[Word] = []
+    lines: Dict[Tuple[int, int, int], List[str]] = {}
+    paragraph_of_line: Dict[Tuple[int, int, int], Tuple[int, int]] = {}
+
+    for i, raw in enumerate(data["text"]):
+        text = (raw or "").strip()
+        conf = float(data["conf"][i])
+        # Rows with conf -1 are page/block/paragraph/line containers, not words
+        if not text or conf < 0:
+            continue
+
+        left, top = data["left"][i] / scale, data["top"][i] / scale
+        width, height = data["width"][i] / scale, data["height"][i] / scale
+        words.append(Word(
+            text=text,
+            x0=left,
+            y0=top,
+            x1=left + width,
+            y1=top + height,
+            confidence=conf / 100.0,
+        ))
+
+        key = (data["block_num"][i], data["par_num"][i], data["line_num"][i])
+        lines.setdefault(key, []).append(text)
+        paragraph_of_line[key] = key[:2]
+
+    # Rebuild text: words joined by spaces, lines by newlines, paragraphs by blank lines
+    chunks: List[str] = []
+    previous_paragraph = None
+    for key, line_words in lines.items():
+        paragraph = paragraph_of_line[key]
+        if previous_paragraph is not None and paragraph != previous_paragraph:
+            chunks.append("")
+        chunks.append(" ".join(line_words))
+        previous_paragraph = paragraph
+
+    confidence = sum(w.confidence for w in words) / len(words) if words else 0.0
+    return PageText(
+        text="\n".join(chunks).strip(),
+        words=words,
+        confidence=confidence,
+        extraction_method=ExtractionMethod.OCR,
+    )
@@ -0,0 +1,251 @@
+# watcher/ocr_cache.py
+"""
+Content-addressed, on-disk cache of OCR results.
+
+Entries are keyed by a BLAKE2b digest of the rendered or loaded raster
+(pixel bytes, size and mode) together with the engine, language, render DPI
+and preprocessing settings (watcher/preprocess.py), so:
+
+- reprocessing a batch (e.g. after an extraction-rule change) only renders
+  its pages again; Tesseract is skipped
+- pages vendors send over and over (cover sheets, terms and conditions)
+  are OCR'd once
+
+Layout: `<ocr_cache_dir>/<2 hex>/<digest>.json.z` holding the zlib-compressed
+PageText. Writes are atomic (temp file + rename), so all OCR pool processes
+and hosts sharing the folder can use it at once. A hit refreshes the entry's
+mtime; when the folder grows past `ocr_cache_max_mb`, the least recently used
+entries are deleted.
+
+Hit/miss counts are reported per page on `PageResult.ocr_cache` and exported
+as `invoice_ocr_cache_total{result}` (core/metrics.py).
+
+    python -m watcher.ocr_cache            # size and entry count
+    python -m watcher.ocr_cache --clear
+"""
+
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import zlib
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from core.config import config
+from core.database import ExtractionMethod
+from watcher.page_text import PageText, Word
+
+logger = logging.getLogger(__name__)
+
+# Bump when the OCR output format changes (e.g. page_text_from_data), so
+# stale results are never served
+CACHE_VERSION = 1
+
+_SUFFIX = ".json.z"
+_EVICT_TARGET = 0.9  # evict down to this fraction of the size limit
+
+
+class OcrCache:
+    """Size-bounded LRU cache of PageText results in a shared directory."""
+
+    def __init__(self, directory: Optional[str] = None, max_bytes: Optional[int] = None):
+        self._directory = directory
+        self._max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._written_since_check = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def directory(self) -> Path:
+        return Path(self._directory or config.ocr_cache_dir)
+
+    @property
+    def max_bytes(self) -> int:
+        return self._max_bytes if self._max_bytes is not None else config.ocr_cache_max_mb * 1024 * 1024
+
+    @property
+    def enabled(self) -> bool:
+        return config.ocr_cache_enabled and self.max_bytes > 0
+
+    # ------------------------------------------------------------------ #
+    # Keys
+    # ------------------------------------------------------------------ #
+
+    @staticmethod
+    def key(
+        raster, width: int, height: int, mode: str, dpi: float,
+        lang: Optional[str] = None, variant: str = "",
+    ) -> str:
+        """
+        Digest of a raster (bytes-like pixel data, e.g. `pix.samples_mv`)
+        plus everything else that changes the OCR output; `variant` names the
+        preprocessing applied before OCR.
+        """
+        digest = hashlib.blake2b(digest_size=20)
+        header = (
+            f"v{CACHE_VERSION}|{config.ocr_engine}|{lang or config.ocr_language}|{round(dpi)}|"
+            f"{variant}|{mode}|{width}x{height}|"
+        )
+        digest.update(header.encode())
+        digest.update(raster)
+        return digest.hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self.directory / key[:2] / f"{key}{_SUFFIX}"
+
+    # ------------------------------------------------------------------ #
+    # Lookup / store
+    # ------------------------------------------------------------------ #
+
+    def get(self, key: str) -> Optional[PageText]:
+        """Cached result for `key`, or None (miss, disabled, or unreadable entry)."""
+        if not self.enabled:
+            return None
+        path = self._path(key)
+        try:
+            payload = json.loads(zlib.decompress(path.read_bytes()))
+            os.utime(path)  # LRU: mark as recently used
+        except FileNotFoundError:
+            self._count(hit=False)
+            return None
+        except (OSError, ValueError, zlib.error) as e:
+            logger.warning(f"Discarding unreadable OCR cache entry {path.name}: {e}")
+            path.unlink(missing_ok=True)
+            self._count(hit=False)
+            return None
+
+        self._count(hit=True)
+        return PageText(
+            text=payload["text"],
+            words=[Word(*w) for w in payload["words"]],
+            confidence=payload["confidence"],
+            extraction_method=ExtractionMethod(payload["method"]),
+        )
+
+    def put(self, key: str, page_text: PageText) -> None:
+        """Store a result. Failures are logged, never raised: the cache is best effort."""
+        if not self.enabled:
+            return
+        payload = {
+            "text": page_text.text,
+            "words": [[w.text, w.x0, w.y0, w.x1, w.y1, w.confidence] for w in page_text.words],
+            "confidence": page_text.confidence,
+            "method": str(page_text.extraction_method),
+        }
+        data = zlib.compress(json.dumps(payload, separators=(",", ":")).encode(), 6)
+        path = self._path(key)
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    f.write(data)
+                os.replace(tmp, path)
+            except BaseException:
+                Path(tmp).unlink(missing_ok=True)
+                raise
+        except OSError as e:
+            logger.warning(f"Failed to write OCR cache entry: {e}")
+            return
+
+        with self._lock:
+            self._written_since_check += len(data)
+            check = self._written_since_check > self.max_bytes * (1 - _EVICT_TARGET) / 2
+            if check:
+                self._written_since_check = 0
+        if check:
+            self.evict()
+
+    def _count(self, hit: bool) -> None:
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    # ------------------------------------------------------------------ #
+    # Maintenance
+    # ------------------------------------------------------------------ #
+
+    def _entries(self) -> List[Tuple[float, int, Path]]:
+        """(mtime, size, path) of every entry."""
+        entries = []
+        if not self.directory.exists():
+            return entries
+        for shard in os.scandir(self.directory):
+            if not shard.is_dir():
+                continue
+            for entry in os.scandir(shard.path):
+                if entry.name.endswith(_SUFFIX):
+                    try:
+                        st = entry.stat()
+                    except FileNotFoundError:  # evicted by another process
+                        continue
+                    entries.append((st.st_mtime, st.st_size, Path(entry.path)))
+        return entries
+
+    def evict(self) -> int:
+        """Delete least recently used entries until under the size limit. Returns entries removed."""
+        entries = self._entries()
+        total = sum(size for _, size, _ in entries)
+        if total <= self.max_bytes:
+            return 0
+
+        target = self.max_bytes * _EVICT_TARGET
+        removed = 0
+        for _, size, path in sorted(entries, key=lambda e: e[0]):
+            if total <= target:
+                break
+            path.unlink(missing_ok=True)
+            total -= size
+            removed += 1
+        with self._lock:
+            self.evictions += removed
+        logger.info(f"OCR cache: evicted {removed} least recently used entries")
+        return removed
+
+    def clear(self) -> int:
+        """Delete every entry. Returns entries removed."""
+        entries = self._entries()
+        for _, _, path in entries:
+            path.unlink(missing_ok=True)
+        return len(entries)
+
+    def stats(self) -> Dict[str, object]:
+        """Disk usage plus this process's hit/miss counters."""
+        entries = self._entries()
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "directory": str(self.directory),
+            "entries": len(entries),
+            "bytes": sum(size for _, size, _ in entries),
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+        }
+
+
+ocr_cache = OcrCache()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Inspect or clear the OCR result cache")
+    parser.add_argument("--clear", action="store_true", help="Delete all cached results")
+    args = parser.parse_args()
+
+    if args.clear:
+        print(f"Removed {ocr_cache.clear()} entries from {ocr_cache.directory}")
+    else:
+        stats = ocr_cache.stats()
+        print(f"{stats['directory']}: {stats['entries']} entries, "
+              f"{stats['bytes'] / 1e6:.1f} / {stats['max_bytes'] / 1e6:.0f} MB")
@@ -0,0 +1,115 @@
+# watcher/page_text.py
+"""
+Engine-independent representation of the text found on a single page.
+
+Both extraction paths (embedded PDF text layer and OCR) produce a
+`PageText`, so downstream code (field extraction, persistence) never needs
+to know where the words came from.
+
+Coordinates are relative to the top-left corner of the page. For PDF pages
+they are always PDF points (1/72 inch), regardless of the render zoom used
+for OCR; for plain image files they are pixels.
+"""
+
+import re
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+from core.database import ExtractionMethod
+
+
+@dataclass
+class Word:
+    """A single word and its bounding box on the page."""
+    text: str
+    x0: float
+    y0: float
+    x1: float
+    y1: float
+    confidence: float = 1.0  # 0.0 - 1.0; text-layer words are exact
+
+    @property
+    def bbox(self) -> Dict[str, float]:
+        """Bounding box in the {x, y, width, height} shape stored on Field.coordinates."""
+        return {
+            "x": round(self.x0, 2),
+            "y": round(self.y0, 2),
+            "width": round(self.x1 - self.x0, 2),
+            "height": round(self.y1 - self.y0, 2),
+        }
+
+
+@dataclass
+class PageText:
+    """
+    Text, words and confidence of one page.
+
+    Attributes:
+        text: Full page text in reading order
+        words: Words with bounding boxes (may be empty if the engine has none)
+        confidence: Page-level confidence between 0.0 and 1.0
+        extraction_method: Which path produced the text
+    """
+    text: str
+    words: List[Word] = field(default_factory=list)
+    confidence: float = 0.0
+    extraction_method: ExtractionMethod = ExtractionMethod.OCR
+
+    def locate(self, value: str) -> Optional[Dict[str, float]]:
+        """
+        Find the bounding box of `value` on the page.
+
+        The value is tokenized the same way as the words, and the first run
+        of consecutive words matching those tokens is returned as a single
+        union box. Returns None if the value cannot be found.
+        """
+        tokens = _tokenize(value)
+        if not tokens or not self.words:
+            return None
+
+        normalized = [_normalize(w.text) for w in self.words]
+        n = len(tokens)
+        for i in range(len(normalized) - n + 1):
+            if all(tokens[j] in normalized[i + j] for j in range(n)):
+                run = self.words[i:i + n]
+                box = Word(
+                    text=value,
+                    x0=min(w.x0 for w in run),
+                    y0=min(w.y0 for w in run),
+                    x1=max(w.x1 for w in run),
+                    y1=max(w.y1 for w in run),
+                )
+                return box.bbox
+        return None
+
+
+def words_from_text(text: str) -> List[Word]:
+    """
+    Approximate word boxes from a layout-preserving text (column -> x,
+    line -> y), for pages stored without their words.
+    """
+    words = []
+    for row, line in enumerate(text.splitlines()):
+        for m in _WORD_RE.finditer(line):
+            y0 = row * _LINE_HEIGHT
+            words.append(Word(
+                text=m.group(), x0=m.start() * _CHAR_WIDTH, y0=y0,
+                x1=m.end() * _CHAR_WIDTH, y1=y0 + _LINE_HEIGHT * 0.8,
+            ))
+    return words
+
+
+# Approximate glyph box for text without word boxes (10pt monospace layout)
+_CHAR_WIDTH = 6.0
+_LINE_HEIGHT = 12.0
+
+_WORD_RE = re.compile(r"\S+")
+_PUNCT_RE = re.compile(r"[^\w.,/\-]+")
+
+
+def _normalize(text: str) -> str:
+    return _PUNCT_RE.sub("", text).lower()
+
+
+def _tokenize(value: str) -> List[str]:
+    return [t for t in (_normalize(part) for part in value.split()) if t]
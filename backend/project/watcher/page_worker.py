@@ -0,0 +1,229 @@
+# watcher/page_worker.py
+"""
+Page-level work executed inside the OCR process pool.
+
+Every function here is a top-level, picklable entry point that receives
+plain arguments (paths, indexes) and returns a picklable `PageResult`, so
+it can run in a separate process without touching the database.
+"""
+
+import functools
+import logging
+import os
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Dict, Optional, Tuple
+
+import fitz  # PyMuPDF
+from PIL import Image
+
+from core.config import config
+from watcher.ocr import run_ocr
+from watcher.ocr_cache import ocr_cache
+from watcher.page_text import PageText
+from watcher.preprocess import image_dpi, prepare, profile, render_dpi, signature
+from watcher.preview import write_preview_async
+from watcher.text_layer import extract_text_layer
+
+logger = logging.getLogger(__name__)
+
+# Open PDFs kept per worker process, so consecutive pages of the same file
+# don't re-parse it. Keyed by batch and file identity (path, size, mtime): a
+# new upload reusing an archived file's name is a different document. Read
+# into memory, so no OS handle keeps the file from being archived (Windows)
+_MAX_OPEN_DOCUMENTS = 4
+_DocumentKey = Tuple[int, str, int, int]
+_open_documents: "OrderedDict[_DocumentKey, fitz.Document]" = OrderedDict()
+
+
+class PageTaskError(RuntimeError):
+    """
+    A page task failed. Raised in place of the original exception, whose
+    type and message it carries as text: some (pytesseract's) cannot be
+    unpickled in the parent, which breaks the whole pool.
+    """
+
+
+def _portable_errors(fn):
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        try:
+            return fn(*args, **kwargs)
+        except Exception as e:
+            raise PageTaskError(f"{type(e).__name__}: {e}") from e
+    return wrapper
+
+
+@dataclass
+class PageResult:
+    """Outcome of processing one page, returned from the worker process."""
+    page_number: int  # 1-indexed
+    page_text: PageText
+    image_path: Optional[str] = None
+    timings: Dict[str, float] = field(default_factory=dict)  # stage -> seconds (see core/metrics.py)
+    ocr_cache: Optional[str] = None  # "hit" / "miss" for OCR'd pages (see watcher/ocr_cache.py)
+
+
+def init_worker(threads_per_process: int, config_overrides: Optional[Dict] = None) -> None:
+    """
+    Process pool initializer.
+
+    Limits the OpenMP threads of each Tesseract invocation so that
+    N worker processes x M threads doesn't oversubscribe the CPU, and
+    re-applies the parent's runtime config overrides (spawned processes
+    load config.json afresh).
+    """
+    os.environ["OMP_THREAD_LIMIT"] = str(threads_per_process)
+    if config_overrides:
+        config.override(config_overrides)
+
+
+def _open_pdf(batch_id: int, pdf_path: str) -> fitz.Document:
+    stat = os.stat(pdf_path)
+    key = (batch_id, pdf_path, stat.st_size, stat.st_mtime_ns)
+    doc = _open_documents.get(key)
+    if doc is not None:
+        _open_documents.move_to_end(key)
+        return doc
+
+    with open(pdf_path, "rb") as f:
+        doc = fitz.open(stream=f.read(), filetype="pdf")
+    _open_documents[key] = doc
+    while len(_open_documents) > _MAX_OPEN_DOCUMENTS:
+        _, oldest = _open_documents.popitem(last=False)
+        oldest.close()
+    return doc
+
+
+def release_documents(batch_id: int) -> None:
+    """
+    Close this process's copy of a batch's PDF. Copies in other pool
+    processes hold no file handle and age out of their LRU.
+    """
+    for key in [key for key in _open_documents if key[0] == batch_id]:
+        _open_documents.pop(key).close()
+
+
+@_portable_errors
+def process_pdf_page(batch_id: int, pdf_path: str, page_index: int, last: bool = False) -> PageResult:
+    """
+    Extract one PDF page: text layer if usable, otherwise render + OCR.
+    `last` marks the batch's final page task, after which the document is closed.
+    """
+    try:
+        return _process_pdf_page(batch_id, _open_pdf(batch_id, pdf_path)[page_index], page_index)
+    finally:
+        if last:
+            release_documents(batch_id)
+
+
+def _process_pdf_page(batch_id: int, page: fitz.Page, page_index: int) -> PageResult:
+    timings: Dict[str, float] = {}
+
+    if config.text_layer_first:
+        start = time.perf_counter()
+        page_text = extract_text_layer(page)
+        timings["text_layer"] = time.perf_counter() - start
+        if page_text is not None:
+            return PageResult(page_number=page_index + 1, page_text=page_text, timings=timings)
+
+    # Render page at the engine's target DPI (watcher/preprocess.py), straight
+    # to grayscale if the engine gets gray input anyway, and hand the pixmap
+    # to OCR in memory (no PNG round trip)
+    start = time.perf_counter()
+    settings = profile()
+    dpi = render_dpi(page, settings)
+    zoom = dpi / 72
+    gray = bool(settings and (settings.get("grayscale") or settings.get("binarize")))
+    pix = page.get_pixmap(
+        matrix=fitz.Matrix(zoom, zoom), colorspace=fitz.csGRAY if gray else fitz.csRGB, alpha=False
+    )
+    pil_img = pixmap_to_image(pix)
+    img_path = write_preview_async(pil_img, f"{batch_id}_page_{page_index + 1}", keepalive=pix)
+    timings["render"] = time.perf_counter() - start
+
+    # Preprocess and OCR (single pass: text, confidences and word boxes),
+    # unless this exact raster was OCR'd before
+    page_text, cache_result = _cached_ocr(pil_img, pix.samples_mv, zoom, dpi, settings, timings)
+    return PageResult(
+        page_number=page_index + 1, page_text=page_text, image_path=img_path,
+        timings=timings, ocr_cache=cache_result,
+    )
+
+
+@_portable_errors
+def process_image_page(batch_id: int, image_path: str) -> PageResult:
+    """OCR a single image file."""
+    start = time.perf_counter()
+    with Image.open(image_path) as source:
+        dpi = image_dpi(source)
+        pil_img = source.convert("RGB")
+    preview_path = write_preview_async(pil_img, f"{batch_id}_page_1")
+    timings = {"render": time.perf_counter() - start}
+
+    page_text, cache_result = _cached_ocr(pil_img, None, 1.0, dpi, profile(), timings)
+    return PageResult(
+        page_number=1, page_text=page_text, image_path=preview_path,
+        timings=timings, ocr_cache=cache_result,
+    )
+
+
+def _cached_ocr(
+    pil_img: Image.Image,
+    raster,
+    scale: float,
+    dpi: float,
+    settings: Optional[Dict],
+    timings: Dict[str, float],
+) -> Tuple[PageText, Optional[str]]:
+    """
+    Preprocess and OCR through the result cache (watcher/ocr_cache.py).
+
+    The cache is keyed on the unprocessed image plus the preprocessing
+    settings, so a hit skips both steps. `raster` is the image's pixel
+    buffer when one is at hand (pixmap samples), else it is read from the
+    image. `scale` is pixels per page unit. Adds the "preprocess" and "ocr"
+    stage timings; returns the page text and "hit"/"miss" (None if the
+    cache is disabled).
+    """
+    start = time.perf_counter()
+    cache_key = None
+    if ocr_cache.enabled:
+        raster = raster if raster is not None else pil_img.tobytes()
+        cache_key = ocr_cache.key(
+            raster, pil_img.width, pil_img.height, pil_img.mode, dpi, variant=signature(settings)
+        )
+        page_text = ocr_cache.get(cache_key)
+        if page_text is not None:
+            timings["ocr"] = time.perf_counter() - start
+            return page_text, "hit"
+    lookup = time.perf_counter() - start
+
+    start = time.perf_counter()
+    prepared = prepare(pil_img, scale, dpi, settings)
+    timings["preprocess"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    page_text = prepared.to_page(run_ocr(prepared.image, lang=config.ocr_language))
+    timings["ocr"] = lookup + time.perf_counter() - start
+
+    if cache_key is None:
+        return page_text, None
+    ocr_cache.put(cache_key, page_text)
+    return page_text, "miss"
+
+
+def pixmap_to_image(pix: fitz.Pixmap) -> Image.Image:
+    """
+    Build a PIL image from a pixmap's samples (no PNG round trip).
+
+    RGB samples are unpacked into PIL's own storage. PIL would share the
+    buffer of a grayscale pixmap instead, and PyMuPDF cannot release a
+    memoryview that is still exported, so gray samples are copied.
+    """
+    if pix.n == 1:
+        return Image.frombytes("L", (pix.width, pix.height), pix.samples, "raw", "L", pix.stride, 1)
+    return Image.frombuffer(
+        "RGB", (pix.width, pix.height), pix.samples_mv, "raw", "RGB", pix.stride, 1
+    )
@@ -0,0 +1,252 @@
+# watcher/preprocess.py
+"""
+OCR input preprocessing.
+
+Normalizes what the OCR engine sees, following the `ocr_preprocessing`
+profile of the configured ocr_engine (core/config.py):
+
+- resolution: PDF pages are rendered at the profile's `dpi` and image files
+  are resampled to it (scanners often deliver 600 DPI), both capped at
+  `max_megapixels` so oversized pages stay bounded
+- grayscale
+- margin crop to the bounding box of the ink, plus a small pad
+- deskew: projection-profile search over +/-5 degrees (coarse, then fine)
+  on a subsample of the ink pixels
+- binarize with a global Otsu threshold
+
+Pixel work is done with NumPy over whole arrays (and PIL for the resample
+and rotation). The engine's word boxes are mapped back through the crop,
+rotation and scale by `Prepared.to_page()`, so coordinates stay in page
+units (PDF points, or pixels of the source image).
+
+With `ocr_preprocessing_enabled` off, PDF pages are rendered at the legacy
+2x zoom and images are OCR'd as they are.
+"""
+
+import math
+from dataclasses import dataclass, replace
+from typing import Any, Dict, Optional, Sequence, Tuple
+
+import fitz  # PyMuPDF
+import numpy as np
+from PIL import Image
+
+from core.config import config
+from watcher.page_text import PageText, Word
+
+# Render zoom for OCR with preprocessing disabled (2x = 144 DPI)
+LEGACY_RENDER_DPI = 144.0
+
+MIN_IMAGE_DPI = 100.0  # Lower embedded DPI values are treated as missing (often a 72 default)
+A4_LONG_SIDE_IN = 11.69  # Page size assumed when an image has no usable DPI
+CROP_PAD_IN = 0.1  # White border kept around the ink
+MAX_SKEW = 5.0  # degrees
+MIN_SKEW = 0.1  # degrees; smaller angles are left alone
+SKEW_SAMPLES = 40_000  # ink pixels used for the angle search
+
+# Lookup table per threshold: gray level -> 0 (ink) / 255 (paper)
+_THRESHOLD_LUTS = [[0] * (t + 1) + [255] * (255 - t) for t in range(256)]
+
+
+@dataclass
+class Prepared:
+    """
+    An image ready for OCR and the transform from page units to its pixels:
+    scale, then crop at `offset`, then rotation by `angle` degrees
+    (counter-clockwise, about `pivot`, the centre of the cropped image, which
+    lands on the centre of the enlarged rotated image).
+    """
+    image: Image.Image
+    scale: float  # Pixels per page unit
+    offset: Tuple[float, float] = (0.0, 0.0)
+    angle: float = 0.0
+    pivot: Tuple[float, float] = (0.0, 0.0)
+
+    def to_page(self, page_text: PageText) -> PageText:
+        """Map word boxes from the engine's pixel coordinates back to page units."""
+        if not page_text.words:
+            return page_text
+        boxes = np.array([(w.x0, w.y0, w.x1, w.y1) for w in page_text.words], dtype=float)
+        cx, cy = (boxes[:, 0] + boxes[:, 2]) / 2, (boxes[:, 1] + boxes[:, 3]) / 2
+        half_w, half_h = (boxes[:, 2] - boxes[:, 0]) / 2, (boxes[:, 3] - boxes[:, 1]) / 2
+
+        if self.angle:
+            # Undo the counter-clockwise rotation (y points down)
+            theta = math.radians(self.angle)
+            dx, dy = cx - self.image.width / 2, cy - self.image.height / 2
+            cx = self.pivot[0] + dx * math.cos(theta) - dy * math.sin(theta)
+            cy = self.pivot[1] + dx * math.sin(theta) + dy * math.cos(theta)
+
+        cx, cy = (cx + self.offset[0]) / self.scale, (cy + self.offset[1]) / self.scale
+        half_w, half_h = half_w / self.scale, half_h / self.scale
+        mapped = np.column_stack((cx - half_w, cy - half_h, cx + half_w, cy + half_h)).tolist()
+        words = [
+            Word(text=w.text, x0=x0, y0=y0, x1=x1, y1=y1, confidence=w.confidence)
+            for w, (x0, y0, x1, y1) in zip(page_text.words, mapped)
+        ]
+        return replace(page_text, words=words)
+
+
+def profile() -> Optional[Dict[str, Any]]:
+    """Preprocessing profile of the configured engine, or None if disabled."""
+    return config.ocr_preprocessing if config.ocr_preprocessing_enabled else None
+
+
+def signature(settings: Optional[Dict[str, Any]]) -> str:
+    """Stable description of a profile, for the OCR cache key."""
+    if settings is None:
+        return "raw"
+    return ",".join(f"{k}={settings[k]}" for k in sorted(settings))
+
+
+def render_dpi(page: fitz.Page, settings: Optional[Dict[str, Any]]) -> float:
+    """Resolution to rasterize a PDF page at: the target, capped by max_megapixels."""
+    if settings is None:
+        return LEGACY_RENDER_DPI
+    area_sq_in = (page.rect.width / 72) * (page.rect.height / 72)
+    return min(float(settings["dpi"]), _megapixel_dpi(area_sq_in, settings))
+
+
+def image_dpi(image: Image.Image) -> float:
+    """Resolution of a scanned image: from its metadata, else assuming an A4 page."""
+    dpi = image.info.get("dpi")
+    if dpi and float(dpi[0]) >= MIN_IMAGE_DPI:
+        return float(dpi[0])
+    return max(image.size) / A4_LONG_SIDE_IN
+
+
+def prepare(
+    image: Image.Image, scale: float, dpi: float, settings: Optional[Dict[str, Any]]
+) -> Prepared:
+    """
+    Preprocess a page image for OCR.
+
+    Args:
+        image: Rendered page or loaded image file
+        scale: Its pixels per page unit (render zoom for PDF pages, 1.0 for images)
+        dpi: Its resolution
+        settings: Profile from `profile()` (None = hand the image over unchanged)
+    """
+    if settings is None:
+        return Prepared(image=image, scale=scale)
+
+    if settings.get("grayscale") or settings.get("binarize"):
+        image = image.convert("L")
+
+    # Resolution: resample to the target (within the pixel budget)
+    area_sq_in = image.width * image.height / (dpi * dpi)
+    factor = min(float(settings["dpi"]), _megapixel_dpi(area_sq_in, settings)) / dpi
+    if abs(factor - 1.0) > 0.02:
+        size = (max(1, round(image.width * factor)), max(1, round(image.height * factor)))
+        image = image.resize(size, Image.Resampling.LANCZOS, reducing_gap=3.0)
+        scale *= factor
+        dpi *= factor
+
+    if not (settings.get("crop_margins") or settings.get("deskew") or settings.get("binarize")):
+        return Prepared(image=image, scale=scale)
+
+    gray = image if image.mode == "L" else image.convert("L")
+    threshold = otsu_threshold(gray.histogram())
+    ink = np.asarray(gray) <= threshold
+    if ink.mean() < 1e-4:  # Blank page: nothing to crop or straighten
+        return Prepared(image=_binarize(image, threshold) if settings.get("binarize") else image, scale=scale)
+
+    offset = (0.0, 0.0)
+    if settings.get("crop_margins"):
+        left, top, right, bottom = _ink_bounds(ink, block=max(4, round(dpi / 20)), pad=round(CROP_PAD_IN * dpi))
+        if (right - left) * (bottom - top) < ink.size:
+            image = image.crop((left, top, right, bottom))
+            ink = ink[top:bottom, left:right]
+            offset = (float(left), float(top))
+
+    if settings.get("binarize"):
+        image = _binarize(image, threshold)
+
+    angle, pivot = 0.0, (0.0, 0.0)
+    if settings.get("deskew"):
+        step = 2 if dpi >= 200 else 1  # Strokes survive halving at high resolution
+        angle = skew_angle(ink[::step, ::step])
+        if abs(angle) >= MIN_SKEW:
+            pivot = (image.width / 2, image.height / 2)
+            white = 255 if image.mode == "L" else (255,) * len(image.getbands())
+            # Binarized pages stay two-level: nearest neighbour is enough, and much faster
+            resample = Image.Resampling.NEAREST if settings.get("binarize") else Image.Resampling.BILINEAR
+            image = image.rotate(angle, resample=resample, expand=True, fillcolor=white)
+        else:
+            angle = 0.0
+    return Prepared(image=image, scale=scale, offset=offset, angle=angle, pivot=pivot)
+
+
+def otsu_threshold(histogram: Sequence[int]) -> int:
+    """
+    Gray level (0-255) maximizing the between-class variance of a 256-bin
+    histogram (`Image.histogram()` of an "L" image); ink is <= threshold.
+    """
+    hist = np.asarray(histogram[:256], dtype=np.float64)
+    levels = np.arange(256, dtype=np.float64)
+    weight_dark = np.cumsum(hist)
+    weight_light = weight_dark[-1] - weight_dark
+    mass = np.cumsum(hist * levels)
+    mean_dark = mass / np.maximum(weight_dark, 1)
+    mean_light = (mass[-1] - mass) / np.maximum(weight_light, 1)
+    return int(np.argmax(weight_dark * weight_light * (mean_dark - mean_light) ** 2))
+
+
+def skew_angle(ink: np.ndarray) -> float:
+    """
+    Angle (degrees, positive = text lines descending to the right) that
+    makes the row projection of the ink sharpest.
+    """
+    ys, xs = np.nonzero(ink)
+    if len(ys) < 100:
+        return 0.0
+    if len(ys) > SKEW_SAMPLES:
+        step = len(ys) // SKEW_SAMPLES
+        ys, xs = ys[::step], xs[::step]
+    ys, xs = ys.astype(np.float64), xs.astype(np.float64)
+    angle = _sharpest(xs, ys, np.arange(-MAX_SKEW, MAX_SKEW + 1e-9, 0.5))
+    return _sharpest(xs, ys, angle + np.arange(-0.5, 0.5 + 1e-9, 0.1))
+
+
+def _sharpest(xs: np.ndarray, ys: np.ndarray, angles: np.ndarray) -> float:
+    """The candidate angle whose row histogram has the largest sum of squares."""
+    theta = np.radians(angles)[:, None]
+    rows = np.rint(ys * np.cos(theta) - xs * np.sin(theta)).astype(np.int64)
+    rows -= rows.min(axis=1, keepdims=True)
+    bins = int(rows.max()) + 1
+    counts = np.bincount(
+        (rows + np.arange(len(angles))[:, None] * bins).ravel(), minlength=len(angles) * bins
+    ).reshape(len(angles), bins)
+    score = (counts.astype(np.float64) ** 2).sum(axis=1)
+    return float(round(angles[int(np.argmax(score))], 2))
+
+
+def _ink_bounds(ink: np.ndarray, block: int, pad: int) -> Tuple[int, int, int, int]:
+    """
+    (left, top, right, bottom) of the ink, padded. Counted in square blocks
+    (about 1/20 inch) that are at least an eighth ink and have a horizontal
+    neighbour that is too (text runs along a line), so scanner speckle
+    doesn't count.
+    """
+    height, width = ink.shape
+    h, w = height // block * block, width // block * block
+    blocks = ink[:h, :w].reshape(h // block, block, w // block, block).sum(axis=(1, 3), dtype=np.int32)
+    solid = blocks >= block * block // 8
+    pairs = solid[:, 1:] & solid[:, :-1]
+    rows, cols = np.flatnonzero(pairs.any(axis=1)), np.flatnonzero(pairs.any(axis=0))
+    if not len(rows) or not len(cols):
+        return 0, 0, width, height
+    return (
+        max(0, int(cols[0]) * block - pad), max(0, int(rows[0]) * block - pad),
+        min(width, (int(cols[-1]) + 2) * block + pad), min(height, (int(rows[-1]) + 1) * block + pad),
+    )
+
+
+def _binarize(image: Image.Image, threshold: int) -> Image.Image:
+    gray = image if image.mode == "L" else image.convert("L")
+    return gray.point(_THRESHOLD_LUTS[threshold])
+
+
+def _megapixel_dpi(area_sq_in: float, settings: Dict[str, Any]) -> float:
+    max_pixels = float(settings.get("max_megapixels") or 0) * 1e6
+    return math.sqrt(max_pixels / area_sq_in) if max_pixels and area_sq_in > 0 else math.inf
@@ -0,0 +1,76 @@
+# watcher/preview.py
+"""
+Asynchronous page preview writer.
+
+Page images for the UI are written by a small background thread pool so
+the encode + (NFS) disk write is off the OCR critical path. Previews are
+optionally downscaled and saved as JPEG/WebP, which is much smaller and
+faster to encode than a full-resolution PNG.
+
+The preview path is computed up front and returned immediately, so it can
+be stored on the Page row while the file is still being written.
+"""
+
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Optional
+
+from PIL import Image
+
+from core.config import config
+
+logger = logging.getLogger(__name__)
+
+_FORMATS = {
+    "jpeg": ("JPEG", ".jpg"),
+    "webp": ("WEBP", ".webp"),
+    "png": ("PNG", ".png"),
+}
+
+# One writer per process; previews are I/O bound, two threads keep up easily
+_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="preview")
+
+
+def _save(image: Image.Image, path: Path, fmt: str, keepalive: Any) -> None:
+    """
+    Downscale and save a preview (runs in the writer thread).
+
+    `keepalive` is unused; being an argument of the queued call keeps the
+    buffer owner alive until the write has finished.
+    """
+    try:
+        max_width = config.preview_max_width
+        if max_width and image.width > max_width:
+            height = max(1, round(image.height * max_width / image.width))
+            image = image.resize((max_width, height), Image.Resampling.BILINEAR)
+
+        options = {} if fmt == "PNG" else {"quality": config.preview_quality}
+        image.save(path, fmt, **options)
+    except Exception as e:
+        logger.error(f"Failed to write preview {path}: {e}")
+
+
+def write_preview_async(
+    image: Image.Image, name: str, keepalive: Any = None
+) -> Optional[str]:
+    """
+    Schedule writing a preview of `image` to the temp folder.
+
+    Args:
+        image: Page image (may be a zero-copy view over a pixmap buffer)
+        name: File name without extension, e.g. "12_page_3"
+        keepalive: Object owning the image buffer (e.g. the fitz.Pixmap);
+                   held until the write completes
+
+    Returns:
+        Path the preview will be written to, or None if previews are disabled.
+    """
+    fmt_key = config.preview_format
+    if fmt_key not in _FORMATS:
+        return None
+
+    fmt, suffix = _FORMATS[fmt_key]
+    path = Path(config.temp_folder) / f"{name}{suffix}"
+    _executor.submit(_save, image, path, fmt, keepalive)
+    return str(path)
@@ -9,6 +9,7 @@ Moves files to processed/error folders accordingly.
 
 import logging
 import shutil
+import threading
 import time
 from datetime import datetime, timezone
 from pathlib import Path
@@ -16,13 +17,19 @@ from typing import List, Tuple, Dict, Any
 import mimetypes
 
 import fitz  # PyMuPDF
-import pytesseract
-from PIL import Image
 import magic  # python-magic
+from sqlalchemy import insert, select
 
-from concurrent.futures import ThreadPoolExecutor
+from core import metrics, search
 from core.config import config
-from core.database import SessionLocal, Batch, Document, Page, Field, ProcessingStatus, DocumentType
+from core.database import (
+    SessionLocal, Batch, Document, Page, Field, LineItem, Job, ProcessingStatus, DocumentType, ExtractionMethod
+)
+from core.queue import JobQueue, PermanentJobError, job_queue, make_worker_id
+from watcher.extraction import extract_document
+from watcher.page_worker import PageResult
+from watcher.scheduler import PageScheduler
+from watcher.tables import ExtractedLineItem, extract_line_items, reconcile
 
 logger = logging.getLogger(__name__)
 
@@ -52,36 +59,143 @@ def sanitize_filename(filename: str) -> str:
 class ProcessManager:
     """
     Thread-safe manager for processing document batches concurrently.
+
+    Batches are queued in the durable job queue (core/queue.py) and consumed
+    by `parallel_workers` worker threads that lease jobs, renew their leases
+    with heartbeats and report success/failure (retry with backoff, then
+    dead-letter). Work queued or in flight survives process restarts.
+
+    The CPU-heavy page work (text extraction, rasterization, OCR) is fanned
+    out per page to a shared `PageScheduler` process pool.
     """
 
-    def __init__(self, max_workers: int = None):
+    def __init__(self, max_workers: int = None, queue: JobQueue = None):
         self.max_workers = max_workers or config.parallel_workers
-        self.executor = ThreadPoolExecutor(max_workers=self.max_workers)
-        self.active_tasks: Dict[int, Any, Any] = {}
+        self.queue = queue or job_queue
+        self.worker_id = make_worker_id()
+        self.page_scheduler = PageScheduler()
+
+        # job_id -> batch_id of jobs currently leased by this process
+        self.active_tasks: Dict[int, int] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
 
         # Ensure required directories exist
         for folder in [config.processed_folder, config.error_folder, config.temp_folder]:
             Path(folder).mkdir(parents=True, exist_ok=True)
 
+        self._threads = [
+            threading.Thread(target=self._worker_loop, name=f"batch-worker-{i}", daemon=True)
+            for i in range(self.max_workers)
+        ]
+        self._threads.append(
+            threading.Thread(target=self._heartbeat_loop, name="queue-heartbeat", daemon=True)
+        )
+        for thread in self._threads:
+            thread.start()
+        logger.info(f"ProcessManager {self.worker_id} started with {self.max_workers} workers")
+
     def process_file(self, batch: Batch) -> None:
-        """Submit a batch for processing task."""
-        future = self.executor.submit(self._process_file_task, batch.id)
-        self.active_tasks[batch.id] = future
-        future.add_done_callback(lambda f: self._cleanup_task(batch.id, f))
-
-    def _cleanup_task(self, batch_id: int, future) -> None:
-        """Remove task from tracking and log exceptions."""
-        self.active_tasks.pop(batch_id, None)
+        """Queue a batch for processing."""
+        job_id = self.queue.enqueue(batch.id)
+        logger.info(f"Queued batch #{batch.id} as job #{job_id}")
+
+    # ------------------------------------------------------------------ #
+    # Queue consumption
+    # ------------------------------------------------------------------ #
+
+    def _worker_loop(self) -> None:
+        """Lease jobs and process them until shutdown."""
+        while not self._stop.is_set():
+            try:
+                job = self.queue.claim(self.worker_id)
+            except Exception as e:
+                logger.error(f"Failed to claim job: {e}", exc_info=True)
+                job = None
+
+            if job is None:
+                self._stop.wait(config.queue_poll_interval)
+                continue
+
+            with self._lock:
+                self.active_tasks[job.id] = job.batch_id
+            try:
+                with metrics.active_jobs.track_inprogress():
+                    self._run_job(job)
+            finally:
+                with self._lock:
+                    self.active_tasks.pop(job.id, None)
+
+    def _run_job(self, job: Job) -> None:
+        """Process one leased job and report the outcome to the queue."""
         try:
-            future.result()
+            self._process_file_task(job.batch_id)
         except Exception as e:
-            logger.error(f"Background task failed for batch {batch_id}: {e}", exc_info=True)
+            permanent = isinstance(e, PermanentJobError)
+            retry = self.queue.fail(job.id, self.worker_id, str(e), permanent=permanent)
+            metrics.record_error("batch", e)
+            metrics.batches_total.labels(outcome="retry" if retry else "dead").inc()
+            self._record_failure(job, e, retry)
+        else:
+            self.queue.complete(job.id, self.worker_id)
+            metrics.batches_total.labels(outcome="completed").inc()
+
+    def _heartbeat_loop(self) -> None:
+        """
+        Renew leases of in-flight jobs, reap leases of dead workers and, with
+        auto_start_processing on, queue PENDING batches that have no job.
+        """
+        interval = max(1.0, config.queue_lease_seconds / 3)
+        while not self._stop.wait(interval):
+            try:
+                with self._lock:
+                    job_ids = list(self.active_tasks)
+                self.queue.heartbeat(job_ids, self.worker_id)
+                self.queue.reap_expired()
+                if config.auto_start_processing:
+                    free = self.queue.admission()["free"]
+                    if free:
+                        self.queue.enqueue_orphans(limit=free if free > 0 else None)
+            except Exception as e:
+                logger.error(f"Queue heartbeat failed: {e}", exc_info=True)
+
+    def _record_failure(self, job: Job, error: Exception, retry: bool) -> None:
+        """Reflect a failed attempt on the batch: back to PENDING, or ERROR if dead-lettered."""
+        session = SessionLocal()
+        try:
+            batch = session.get(Batch, job.batch_id)
+            if not batch:
+                return
+            batch.error_message = str(error)[:500]  # Truncate long errors
+            if retry:
+                batch.status = ProcessingStatus.PENDING
+                logger.warning(
+                    f"Batch {batch.id} attempt {job.attempts}/{job.max_attempts} failed; will retry"
+                )
+            else:
+                batch.status = ProcessingStatus.ERROR
+                batch.processed_at = datetime.now(timezone.utc)
+                logger.error(f"Batch {batch.id} moved to dead-letter after {job.attempts} attempt(s)")
+            session.commit()
+            if not retry:
+                self._move_to_error_folder(batch)
+        finally:
+            session.close()
+
+    # ------------------------------------------------------------------ #
+    # Processing
+    # ------------------------------------------------------------------ #
 
     def _process_file_task(self, batch_id: int) -> None:
-        """Main processing logic for a single batch."""
+        """
+        Main processing logic for a single batch.
+
+        Raises on failure; the caller retries unless it is a PermanentJobError
+        (validation failures), which goes straight to dead-letter.
+        """
         session = SessionLocal()
-        batch = None
         start_time = time.time()
+        timings: Dict[str, float] = {}  # Persisted as Batch.stage_timings (core/timings.py)
 
         try:
             batch = session.query(Batch).filter(Batch.id == batch_id).first()
@@ -90,9 +204,9 @@ class ProcessManager:
                 return
 
             # Security: prevent path traversal
-            safe_path = Path(config.upload_folder) / sanitize_filename(batch.filename)
-            if not str(safe_path.resolve()).startswith(str(Path(config.upload_folder).resolve())):
-                raise ValueError("Invalid file path - path traversal attempt detected")
+            safe_path = Path(config.hot_folder) / sanitize_filename(batch.filename)
+            if not str(safe_path.resolve()).startswith(str(Path(config.hot_folder).resolve())):
+                raise PermanentJobError("Invalid file path - path traversal attempt detected")
 
             batch.status = ProcessingStatus.PROCESSING
             batch.started_at = datetime.now(timezone.utc)
@@ -102,123 +216,226 @@ class ProcessManager:
             file_path = Path(batch.original_path)
 
             if not file_path.exists():
-                raise FileNotFoundError(f"File not found: {file_path}")
+                raise PermanentJobError(f"File not found: {file_path}")
 
             # Route to correct processor
-            if is_pdf_file(file_path):
-                self._process_pdf(session, batch, file_path)
-            elif is_image_file(file_path):
-                self._process_image(session, batch, file_path)
+            with metrics.timed("detect", timings):
+                file_kind = "pdf" if is_pdf_file(file_path) else "image" if is_image_file(file_path) else None
+            if file_kind == "pdf":
+                document, results = self._process_pdf(batch, file_path, timings)
+            elif file_kind == "image":
+                document, results = self._process_image(batch, file_path, timings)
             else:
-                raise ValueError(f"Unsupported file type: {file_path}")
+                raise PermanentJobError(f"Unsupported file type: {file_path}")
+            self._observe_pages(results, timings)
+
+            with metrics.timed("extraction", timings):
+                extracted = extract_document([r.page_text for r in results])
+            with metrics.timed("tables", timings):
+                line_items = [extract_line_items(r.page_text) for r in results]
+                reconciliation = reconcile(
+                    [item for page in line_items for item in page],
+                    [field for page in extracted for field in page],
+                )
+            self._record_reconciliation(batch, document, reconciliation)
 
-            # Success
-            batch.status = ProcessingStatus.COMPLETED
-            batch.processed_at = datetime.now(timezone.utc)
-            batch.processing_time = time.time() - start_time
-            session.commit()
+            # Success: document, pages, fields and final status in one transaction
+            with metrics.timed("db_write", timings):
+                self._persist_document(session, document, results, extracted, line_items)
+                batch.status = ProcessingStatus.COMPLETED
+                batch.processed_at = datetime.now(timezone.utc)
+                batch.processing_time = time.time() - start_time
+                batch.error_message = None
+                session.commit()
+            metrics.stage_seconds.labels(stage="total").observe(batch.processing_time)
 
             logger.info(f"Successfully processed {batch.filename} in {batch.processing_time:.2f}s")
-            self._archive_file(batch)
+            with metrics.timed("archive", timings):
+                self._archive_file(batch)
+            timings["total"] = time.time() - start_time
+            batch.stage_timings = {stage: round(seconds, 6) for stage, seconds in timings.items()}
+            session.commit()  # Persist the archived path and the timing breakdown
 
         except Exception as e:
             logger.error(f"Failed to process batch {batch_id}: {e}", exc_info=True)
-            if batch:
-                batch.status = ProcessingStatus.ERROR
-                batch.error_message = str(e)[:500]  # Truncate long errors
-                batch.processed_at = datetime.now(timezone.utc)
-                session.commit()
-                self._move_to_error_folder(batch)
+            session.rollback()
+            raise
         finally:
             session.close()
 
-    def _process_pdf(self, session, batch: Batch, pdf_path: Path) -> None:
-        """Extract text and images from PDF pages using PyMuPDF + Tesseract OCR."""
-        doc = fitz.open(pdf_path)
-        total_pages = len(doc)
+    def _process_pdf(
+        self, batch: Batch, pdf_path: Path, timings: Dict[str, float]
+    ) -> Tuple[Document, List[PageResult]]:
+        """
+        Extract text from PDF pages.
+
+        Pages are fanned out to the OCR process pool and reassembled in page
+        order. Pages with a usable embedded text layer are read directly with
+        PyMuPDF; only scanned pages are rendered and sent to Tesseract OCR.
+        """
+        with metrics.timed("classify", timings):
+            doc = fitz.open(pdf_path)
+            total_pages = len(doc)
+            doc_type = self._infer_document_type_from_content(doc)  # Smart inference
+            doc.close()
+
+        with metrics.timed("pages", timings):
+            futures = self.page_scheduler.map_pdf_pages(batch.id, str(pdf_path), total_pages)
+            try:
+                results = [future.result() for future in futures]
+            except Exception:
+                for future in futures:
+                    future.cancel()
+                raise
+
+        text_layer_pages = sum(
+            1 for r in results if r.page_text.extraction_method == ExtractionMethod.TEXT_LAYER
+        )
+        cached_pages = sum(1 for r in results if r.ocr_cache == "hit")
+        logger.info(
+            f"Batch {batch.id}: {text_layer_pages}/{total_pages} pages read from text layer, "
+            f"{total_pages - text_layer_pages} OCR'd ({cached_pages} from OCR cache)"
+        )
 
         document = Document(
             batch_id=batch.id,
-            doc_type=self._infer_document_type_from_content(doc),  # Smart inference
+            doc_type=doc_type,
             confidence=0.0,  # Will be updated later if needed
-            metadata={"pages": total_pages, "source": "pdf", "title": pdf_path.name}
+            extra_metadata={"pages": total_pages, "source": "pdf", "title": pdf_path.name}
         )
-        session.add(document)
-        session.commit()
-
-        for page_num in range(total_pages):
-            page = doc[page_num]
-
-            # Render page to image
-            zoom = 2.0  # 2x resolution for better OCR
-            mat = fitz.Matrix(zoom, zoom)
-            pix = page.get_pixmap(matrix=mat, alpha=False)
-            img_path = Path(config.temp_folder) / f"{batch.id}_page_{page_num + 1}.png"
-            pix.save(img_path)
-
-            # Perform OCR
-            pil_img = Image.open(img_path)
-            text = pytesseract.image_to_string(pil_img, lang='eng')
-            confidence = pytesseract.image_to_data(pil_img, output_type=pytesseract.Output.DICT)
-            avg_conf = sum(map(int, confidence["conf"])) / max(1, len(confidence["conf"]))
-
-            # Save page
-            page_record = Page(
-                document_id=document.id,
-                page_number=page_num + 1,
-                image_path=str(img_path),
-                original_text=text.strip(),
-                processed_text=text.strip(),  # Add NLP cleaning later
-                ocr_confidence=avg_conf / 100.0
-            )
-            session.add(page_record)
-            session.flush()
+        return document, results
 
-            # Extract common fields (very basic heuristic - replace with ML model later)
-            fields = self._extract_basic_fields(text)
-            for name, value, conf in fields:
-                field = Field(
-                    page_id=page_record.id,
-                    name=name,
-                    value=value,
-                    confidence=conf,
-                    coordinates={"x": 0, "y": 0, "width": 0, "height": 0}  # TODO: Use image_to_data for real bbox
-                )
-                session.add(field)
-
-        session.commit()
-        doc.close()
-
-    def _process_image(self, session, batch: Batch, image_path: Path) -> None:
+    def _process_image(
+        self, batch: Batch, image_path: Path, timings: Dict[str, float]
+    ) -> Tuple[Document, List[PageResult]]:
         """Process single image using OCR."""
-        pil_img = Image.open(image_path).convert("RGB")
-        text = pytesseract.image_to_string(pil_img, lang='eng')
+        with metrics.timed("pages", timings):
+            result = self.page_scheduler.submit_image(batch.id, str(image_path)).result()
 
         document = Document(
             batch_id=batch.id,
             doc_type=DocumentType.UNKNOWN,
             confidence=0.0,
-            metadata={"pages": 1, "source": "image"}
-        )
-        session.add(document)
-        session.commit()
-
-        page = Page(
-            document_id=document.id,
-            page_number=1,
-            image_path=str(image_path),  # Keep original or copy to temp?
-            original_text=text.strip(),
-            processed_text=text.strip(),
-            ocr_confidence=0.85  # Approximate
+            extra_metadata={"pages": 1, "source": "image"}
         )
-        session.add(page)
-        session.flush()
+        return document, [result]
+
+    @staticmethod
+    def _observe_pages(results: List[PageResult], timings: Dict[str, float]) -> None:
+        """
+        Report per-page stage timings (measured in the pool) and confidences,
+        and add the page stages, summed over pages, to the batch timings.
+        """
+        for result in results:
+            for stage, seconds in result.timings.items():
+                metrics.stage_seconds.labels(stage=stage).observe(seconds)
+                timings[stage] = timings.get(stage, 0.0) + seconds
+            metrics.pages_total.labels(method=str(result.page_text.extraction_method)).inc()
+            metrics.ocr_confidence.observe(result.page_text.confidence)
+            if result.ocr_cache:
+                metrics.ocr_cache_total.labels(result=result.ocr_cache).inc()
+
+    @staticmethod
+    def _record_reconciliation(batch: Batch, document: Document, reconciliation: Dict[str, Any]) -> None:
+        """
+        Keep the line-item reconciliation on the document and report it.
+        Only invoices are expected to add up (statements list running balances).
+        """
+        document.extra_metadata = {**(document.extra_metadata or {}), "line_items": reconciliation}
+        metrics.line_item_reconciliation_total.labels(status=reconciliation["status"]).inc()
+        if reconciliation["status"] == "mismatch" and document.doc_type == DocumentType.INVOICE:
+            logger.warning(
+                f"Batch {batch.id}: line items sum to {reconciliation['sum']:.2f}, "
+                f"document says {reconciliation['expected']:.2f}"
+            )
 
-        fields = self._extract_basic_fields(text)
-        for name, value, conf in fields:
-            session.add(Field(page_id=page.id, name=name, value=value, confidence=conf))
+    def _persist_document(
+        self,
+        session,
+        document: Document,
+        results: List[PageResult],
+        extracted: List[List[Tuple[str, str, float]]],
+        line_items: List[List[ExtractedLineItem]],
+    ) -> None:
+        """
+        Write a document with all its pages, fields and line items using bulk inserts.
+
+        One INSERT ... RETURNING for all pages (ids come back in page order)
+        and one executemany INSERT each for the fields, the line items and
+        the search index entries. The caller commits, so the whole document
+        lands in a single transaction.
+
+        A reprocessed batch replaces what the previous run stored: its
+        documents (pages, fields and line items cascade) and search entries
+        are deleted in the same transaction.
+        """
+        search.remove_batch(session, document.batch_id)
+        for previous in session.scalars(select(Document).where(Document.batch_id == document.batch_id)):
+            session.delete(previous)
 
-        session.commit()
+        session.add(document)
+        session.flush()
+        if not results:
+            return
+
+        page_ids = session.scalars(
+            insert(Page).returning(Page.id, sort_by_parameter_order=True),
+            [
+                {
+                    "document_id": document.id,
+                    "page_number": result.page_number,
+                    "image_path": result.image_path,
+                    "original_text": result.page_text.text,
+                    "processed_text": result.page_text.text,  # Add NLP cleaning later
+                    "ocr_confidence": result.page_text.confidence,
+                    "extraction_method": result.page_text.extraction_method,
+                    "timings": {stage: round(sec, 6) for stage, sec in result.timings.items()},
+                }
+                for result in results
+            ],
+        ).all()
+
+        # Fields from the template rule engine (watcher/rules.py)
+        field_rows = []
+        search_rows = []
+        for page_id, result, fields in zip(page_ids, results, extracted):
+            page_text = result.page_text
+            for name, value, conf in fields:
+                field_rows.append({
+                    "page_id": page_id,
+                    "name": name,
+                    "value": value,
+                    "confidence": conf,
+                    "coordinates": page_text.locate(value),
+                })
+            search_rows.append({
+                "page_id": page_id,
+                "batch_id": document.batch_id,
+                "content": page_text.text,
+                "fields": search.format_fields(fields),
+            })
+
+        if field_rows:
+            session.execute(insert(Field), field_rows)
+
+        # Line items from the word-box geometry (watcher/tables.py)
+        item_rows = [
+            {
+                "page_id": page_id,
+                "row_number": item.row_number,
+                "description": item.description,
+                "quantity": item.quantity,
+                "unit_price": item.unit_price,
+                "amount": item.amount,
+                "confidence": item.confidence,
+                "coordinates": item.coordinates,
+            }
+            for page_id, items in zip(page_ids, line_items)
+            for item in items
+        ]
+        if item_rows:
+            session.execute(insert(LineItem), item_rows)
+        search.index_pages(session, search_rows)
 
     def _infer_document_type_from_content(self, doc) -> DocumentType:
         """Very basic heuristic - improve with ML classifier later."""
@@ -236,29 +453,6 @@ class ProcessManager:
             return DocumentType.PACKING_SLIP
         return DocumentType.UNKNOWN
 
-    def _extract_basic_fields(self, text: str) -> List[Tuple[str, str, float]]:
-        """Very basic field extraction using regex - replace with proper NLP/ML."""
-        import re
-
-        fields = []
-
-        # Invoice Number
-        m = re.search(r"(?:invoice|inv[. ]?#?)[:\s]*([A-Z0-9-]{5,})", text, re.I)
-        if m:
-            fields.append(("invoice_number", m.group(1).strip(), 0.92))
-
-        # Date
-        m = re.search(r"(?:date|issued)[:\s]*(\d{1,2}[\/\-\.]\d{1,2}[\/\-\.]\d{2,4})", text, re.I)
-        if m:
-            fields.append(("date", m.group(1), 0.88))
-
-        # Total
-        m = re.search(r"total[:\s]*\$?([\d,]+\.?\d*)", text, re.I)
-        if m:
-            fields.append(("total_amount", f"${m.group(1)}", 0.95))
-
-        return fields
-
     def _archive_file(self, batch: Batch) -> None:
         """Move successfully processed file to archive folder."""
         try:
@@ -290,6 +484,15 @@ class ProcessManager:
             logger.error(f"Failed to move error file {batch.filename}: {e}")
 
     def shutdown(self, wait: bool = True) -> None:
-        """Gracefully shut down the executor."""
+        """
+        Stop taking new jobs and shut down the page pool.
+
+        Jobs still in flight keep their lease until it expires, after which
+        another worker re-runs them.
+        """
         logger.info("Shutting down ProcessManager...")
-        self.executor.shutdown(wait=wait)
\ No newline at end of file
+        self._stop.set()
+        if wait:
+            for thread in self._threads:
+                thread.join()
+        self.page_scheduler.shutdown(wait=wait)
\ No newline at end of file
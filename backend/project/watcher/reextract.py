@@ -0,0 +1,339 @@
+# watcher/reextract.py
+"""
+Re-extraction: rerun the field rules over stored page text.
+
+After a change to the extraction rules (watcher/extraction.py), existing
+batches are brought up to date from `Page.processed_text` alone, without
+the original files (already archived) and without OCR:
+
+    python -m watcher.reextract --dry-run --report diff.json
+    python -m watcher.reextract --from 2025-01-01 --doc-type invoice
+    python -m watcher.reextract --batch 12,13,14
+
+Pipeline:
+- completed batches' pages are read in keyset-paginated chunks of whole
+  documents
+- each chunk's text is run through the rules in a process pool (a few
+  chunks in flight, so reading, extracting and writing overlap)
+- the new fields are diffed against the stored ones, and each chunk is
+  applied with bulk DELETE / INSERT / UPDATE statements in one transaction,
+  together with the search index's field text
+- --dry-run writes nothing and reports the diff
+
+Fields a reviewer has touched (validation_status other than "unverified",
+or a corrected_value) are never replaced. Unchanged fields keep their rows,
+and with them their coordinates. Newly found values get no coordinates,
+because word boxes are not stored.
+"""
+
+import logging
+import multiprocessing
+import time
+from collections import Counter, deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Deque, Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import bindparam, delete, insert, select, update
+from sqlalchemy.orm import Session
+
+from core import search
+from core.config import config
+from core.database import Batch, Document, DocumentType, Field, Page, ProcessingStatus, SessionLocal
+from watcher.extraction import ExtractedField, extract_chunk
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHUNK_SIZE = 500
+MAX_REPORTED_CHANGES = 1000
+
+
+@dataclass
+class ReextractionReport:
+    """Totals of a re-extraction run, plus a sample of the individual changes."""
+    dry_run: bool = False
+    pages: int = 0
+    pages_changed: int = 0
+    fields_unchanged: int = 0
+    fields_added: int = 0
+    fields_removed: int = 0
+    fields_changed: int = 0
+    fields_reviewed_kept: int = 0
+    seconds: float = 0.0
+    by_field: Dict[str, Counter] = field(default_factory=dict)
+    changes: List[Dict[str, Any]] = field(default_factory=list)
+
+    def _record(self, kind: str, batch_id: int, page_id: int, name: str,
+                old: Optional[str], new: Optional[str]) -> None:
+        setattr(self, f"fields_{kind}", getattr(self, f"fields_{kind}") + 1)
+        self.by_field.setdefault(name, Counter())[kind] += 1
+        if len(self.changes) < MAX_REPORTED_CHANGES:
+            self.changes.append(
+                {"batch_id": batch_id, "page_id": page_id, "field": name, "change": kind, "old": old, "new": new}
+            )
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "dry_run": self.dry_run,
+            "pages": self.pages,
+            "pages_changed": self.pages_changed,
+            "fields": {
+                "unchanged": self.fields_unchanged,
+                "added": self.fields_added,
+                "removed": self.fields_removed,
+                "changed": self.fields_changed,
+                "reviewed_kept": self.fields_reviewed_kept,
+            },
+            "by_field": {name: dict(counts) for name, counts in sorted(self.by_field.items())},
+            "seconds": round(self.seconds, 3),
+            "pages_per_sec": round(self.pages / self.seconds, 1) if self.seconds else 0.0,
+            "changes": self.changes,
+            "changes_truncated": (self.fields_added + self.fields_removed + self.fields_changed) > len(self.changes),
+        }
+
+
+# =============================================================================
+# Selection
+# =============================================================================
+
+
+def _page_query(
+    date_from: Optional[datetime],
+    date_to: Optional[datetime],
+    doc_types: Optional[Sequence[DocumentType]],
+    batch_ids: Optional[Sequence[int]],
+):
+    stmt = (
+        select(Page.id, Page.document_id, Document.batch_id, Page.processed_text)
+        .join(Document, Page.document_id == Document.id)
+        .join(Batch, Document.batch_id == Batch.id)
+        .where(Batch.status == ProcessingStatus.COMPLETED)
+    )
+    if date_from:
+        stmt = stmt.where(Batch.processed_at >= date_from)
+    if date_to:
+        stmt = stmt.where(Batch.processed_at <= date_to)
+    if doc_types:
+        stmt = stmt.where(Document.doc_type.in_(doc_types))
+    if batch_ids:
+        stmt = stmt.where(Document.batch_id.in_(batch_ids))
+    return stmt
+
+
+def _iter_chunks(session: Session, stmt, chunk_size: int):
+    """
+    Keyset pagination on (document, page): constant cost per chunk, however deep.
+
+    Chunks hold whole documents, in page order, because the vendor template
+    is detected from a document's first page: a full chunk is extended by
+    the rest of its last document (so it may exceed `chunk_size`).
+    """
+    ordered = stmt.order_by(Page.document_id, Page.page_number, Page.id)
+    last_document = 0
+    while True:
+        rows = session.execute(ordered.where(Page.document_id > last_document).limit(chunk_size)).all()
+        if not rows:
+            return
+        last_document = rows[-1].document_id
+        if len(rows) == chunk_size:
+            rows = [row for row in rows if row.document_id != last_document]
+            rows += session.execute(ordered.where(Page.document_id == last_document)).all()
+        session.rollback()  # Don't hold one read snapshot open for the whole run
+        yield rows
+
+
+# =============================================================================
+# Diff & apply
+# =============================================================================
+
+
+def _is_reviewed(row) -> bool:
+    return row.validation_status != "unverified" or row.corrected_value is not None
+
+
+def _apply_chunk(
+    session: Session,
+    batch_of_page: Dict[int, int],
+    extracted: List[Tuple[int, List[ExtractedField]]],
+    report: ReextractionReport,
+) -> None:
+    """Diff one chunk's new fields against the stored ones and (unless dry run) write the difference."""
+    stored: Dict[int, list] = {}
+    for row in session.execute(
+        select(Field.id, Field.page_id, Field.name, Field.value, Field.confidence,
+               Field.validation_status, Field.corrected_value)
+        .where(Field.page_id.in_(batch_of_page))
+    ):
+        stored.setdefault(row.page_id, []).append(row)
+
+    delete_ids: List[int] = []
+    insert_rows: List[Dict[str, Any]] = []
+    confidence_updates: List[Dict[str, Any]] = []
+    search_rows: List[Dict[str, Any]] = []
+
+    for page_id, new_fields in extracted:
+        batch_id = batch_of_page[page_id]
+        old_rows = stored.get(page_id, [])
+        reviewed = [r for r in old_rows if _is_reviewed(r)]
+        reviewed_names = {r.name for r in reviewed}
+        report.fields_reviewed_kept += len(reviewed)
+
+        # Match unreviewed rows to new fields on (name, value); leftovers are the diff
+        unmatched_old = [r for r in old_rows if not _is_reviewed(r)]
+        added: List[ExtractedField] = []
+        final: List[Tuple[str, str]] = [(r.name, r.value) for r in reviewed]
+        for name, value, confidence in new_fields:
+            if name in reviewed_names:
+                continue  # a reviewer's decision wins
+            match = next((r for r in unmatched_old if r.name == name and r.value == value), None)
+            if match is None:
+                added.append((name, value, confidence))
+            else:
+                unmatched_old.remove(match)
+                report.fields_unchanged += 1
+                if match.confidence != confidence:
+                    confidence_updates.append({"b_id": match.id, "b_confidence": confidence})
+            final.append((name, value))
+
+        if not added and not unmatched_old:
+            continue
+
+        report.pages_changed += 1
+        removed_by_name = {r.name: r for r in unmatched_old}
+        for name, value, confidence in added:
+            old = removed_by_name.pop(name, None)
+            if old is not None:
+                report._record("changed", batch_id, page_id, name, old.value, value)
+            else:
+                report._record("added", batch_id, page_id, name, None, value)
+            insert_rows.append({"page_id": page_id, "name": name, "value": value, "confidence": confidence})
+        for old in removed_by_name.values():
+            report._record("removed", batch_id, page_id, old.name, old.value, None)
+        # Every unmatched old row goes (including duplicates of a name)
+        delete_ids.extend(r.id for r in unmatched_old)
+        search_rows.append({"page_id": page_id, "fields": search.format_fields(final)})
+
+    if report.dry_run:
+        return
+
+    if delete_ids:
+        session.execute(delete(Field).where(Field.id.in_(delete_ids)))
+    if insert_rows:
+        session.execute(insert(Field), insert_rows)
+    if confidence_updates:
+        # Core table: an ORM update() with a parameter list is a bulk UPDATE by primary key
+        fields = Field.__table__
+        session.execute(
+            update(fields).where(fields.c.id == bindparam("b_id")).values(confidence=bindparam("b_confidence")),
+            confidence_updates,
+        )
+    search.update_fields(session, search_rows)
+    session.commit()
+
+
+# =============================================================================
+# Driver
+# =============================================================================
+
+
+def reextract(
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    doc_types: Optional[Sequence[DocumentType]] = None,
+    batch_ids: Optional[Sequence[int]] = None,
+    dry_run: bool = False,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    processes: Optional[int] = None,
+) -> ReextractionReport:
+    """
+    Recompute the fields of completed batches from their stored page text.
+
+    `processes` defaults to `ocr_processes` (one per CPU); 1 runs the rules
+    in this process.
+    """
+    report = ReextractionReport(dry_run=dry_run)
+    processes = processes or config.ocr_processes
+    stmt = _page_query(date_from, date_to, doc_types, batch_ids)
+    start = time.monotonic()
+
+    pool = None
+    if processes > 1:
+        pool = ProcessPoolExecutor(max_workers=processes, mp_context=multiprocessing.get_context("spawn"))
+    in_flight: Deque[Tuple[Dict[int, int], Future]] = deque()
+
+    read_session = SessionLocal()
+    write_session = SessionLocal()
+
+    def _drain(limit: int) -> None:
+        while len(in_flight) > limit:
+            batch_of_page, future = in_flight.popleft()
+            _apply_chunk(write_session, batch_of_page, future.result(), report)
+            report.pages += len(batch_of_page)
+            rate = report.pages / (time.monotonic() - start)
+            logger.info(
+                f"Re-extraction: {report.pages} pages, {report.pages_changed} changed ({rate:.0f} pages/s)"
+            )
+
+    try:
+        for rows in _iter_chunks(read_session, stmt, chunk_size):
+            batch_of_page = {row.id: row.batch_id for row in rows}
+            texts = [(row.id, row.document_id, row.processed_text) for row in rows]
+            if pool is None:
+                future: Future = Future()
+                future.set_result(extract_chunk(texts))
+            else:
+                future = pool.submit(extract_chunk, texts)
+            in_flight.append((batch_of_page, future))
+            _drain(processes * 2)
+        _drain(0)
+    except Exception:
+        write_session.rollback()
+        raise
+    finally:
+        read_session.close()
+        write_session.close()
+        if pool is not None:
+            pool.shutdown(wait=True, cancel_futures=True)
+
+    report.seconds = time.monotonic() - start
+    logger.info(
+        f"Re-extraction {'dry run ' if dry_run else ''}done: {report.pages} pages, "
+        f"{report.pages_changed} changed (+{report.fields_added} -{report.fields_removed} "
+        f"~{report.fields_changed}) in {report.seconds:.1f}s"
+    )
+    return report
+
+
+if __name__ == "__main__":
+    import argparse
+    import json
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+    parser = argparse.ArgumentParser(description="Rerun field extraction over stored page text")
+    parser.add_argument("--from", dest="date_from", type=datetime.fromisoformat, help="Processed on/after (ISO date)")
+    parser.add_argument("--to", dest="date_to", type=datetime.fromisoformat, help="Processed on/before (ISO date)")
+    parser.add_argument("--doc-type", dest="doc_types", type=DocumentType, action="append",
+                        help=f"Repeatable; one of: {', '.join(t.value for t in DocumentType)}")
+    parser.add_argument("--batch", dest="batch_ids", type=lambda s: [int(i) for i in s.split(",")],
+                        help="Comma-separated batch ids")
+    parser.add_argument("--dry-run", action="store_true", help="Report the diff without writing")
+    parser.add_argument("--report", help="Write the JSON report (totals and changes) to this file")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument("--processes", type=int, default=None, help="Worker processes (default: ocr_processes)")
+    args = parser.parse_args()
+
+    result = reextract(
+        date_from=args.date_from,
+        date_to=args.date_to,
+        doc_types=args.doc_types,
+        batch_ids=args.batch_ids,
+        dry_run=args.dry_run,
+        chunk_size=args.chunk_size,
+        processes=args.processes,
+    ).as_dict()
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+    print(json.dumps({k: v for k, v in result.items() if k != "changes"}, indent=2))
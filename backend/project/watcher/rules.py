@@ -0,0 +1,450 @@
+# watcher/rules.py
+"""
+Template-driven rule engine for field extraction (extraction_engine = "rule_based").
+
+Templates are JSON files in `extraction_templates_dir` (built-in set:
+watcher/templates/), loaded and compiled once per process. Fields are
+extracted in the watcher / worker process itself, so edited templates take
+effect when it is restarted; `python -m watcher.reextract` loads them afresh
+on every run (then applies them to stored batches):
+
+    {
+      "name": "acme_solutions",
+      "extends": "default",                 # fall back to these rules for missing fields
+      "vendor": {"keywords": ["Acme Solutions", "DE312457890"], "min_hits": 1},
+      "fields": [
+        {"name": "invoice_number", "type": "anchor", "anchor": ["Invoice No"],
+         "region": "right", "max_dx": 200, "value": "[A-Z]{2,4}-[\\d-]{4,}"},
+        {"name": "date", "type": "regex", "pattern": "Date:\\s*(\\d{2}\\.\\d{2}\\.\\d{4})"}
+      ],
+      "tables": [
+        {"name": "line_items", "start": "^Description\\b", "end": "^(Sub)?total\\b",
+         "row": "^(?P<description>.+?)\\s+(?P<amount>[\\d.,]+\\d)\\b"}
+      ]
+    }
+
+Rule types:
+- regex:  `pattern` searched in the page text; `group` (default 1, or 0 if
+          the pattern has no groups) is the value
+- anchor: one of the `anchor` phrases is located in the page's word boxes,
+          then `value` is searched in the words of a region relative to it:
+          "right" (same line, up to max_dx), "below" (following lines, up to
+          max_dy) or "right_or_below" (default)
+- tables: lines between `start` and `end` matching `row` become fields
+          named "<table>[<n>].<column>" (one per named group)
+
+Optional per rule: `confidence` (default 0.9), `format` (e.g. "{0} EUR"),
+`currency` (amounts: the value is written "<symbol><amount>", the given
+symbol when the text has none, as the original extractor wrote "$108.00"),
+`flags` ("i" by default). For each field the first rule that finds a value
+wins; a vendor template's own rules come before the ones it extends.
+
+Vendor detection runs every template's keywords as one compiled alternation
+over the first page. Each page is indexed once (lines, and a token -> word
+positions map), so anchors are dictionary lookups, not text scans. Pages
+without word boxes (e.g. stored text during re-extraction) get approximate
+boxes from the text's line and column layout.
+"""
+
+import json
+import logging
+import re
+import threading
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional, Pattern, Sequence, Tuple
+
+from core.config import config
+from watcher.page_text import PageText, Word, words_from_text
+
+logger = logging.getLogger(__name__)
+
+ExtractedField = Tuple[str, str, float]  # (name, value, confidence)
+
+BUILTIN_TEMPLATES_DIR = Path(__file__).parent / "templates"
+DEFAULT_TEMPLATE = "default"
+
+REGIONS = ("right", "below", "right_or_below")
+
+_TOKEN_STRIP_RE = re.compile(r"^[^\w$€£]+|[^\w]+$")
+_CURRENCY_RE = re.compile(r"^([$€£]?)\s*(.*)$", re.S)
+
+
+class TemplateError(ValueError):
+    """A template file is malformed."""
+
+
+def _token(text: str) -> str:
+    """Normalized word for anchor matching: lowercase, surrounding punctuation removed."""
+    return _TOKEN_STRIP_RE.sub("", text).lower()
+
+
+def _flags(spec: str) -> int:
+    flags = 0
+    for ch in spec:
+        flags |= {"i": re.I, "m": re.M, "s": re.S}[ch]
+    return flags
+
+
+# =============================================================================
+# Compiled templates
+# =============================================================================
+
+
+@dataclass
+class FieldRule:
+    name: str
+    kind: str                                   # regex | anchor
+    confidence: float = 0.9
+    format: str = "{0}"
+    currency: Optional[str] = None              # default symbol of amount values
+    pattern: Optional[Pattern] = None           # regex
+    group: int = 1
+    anchors: List[Tuple[str, ...]] = field(default_factory=list)  # anchor: token tuples
+    region: str = "right_or_below"
+    max_dx: float = 250.0
+    max_dy: float = 40.0
+    value: Optional[Pattern] = None             # anchor: value pattern
+
+    def emit(self, value: str) -> ExtractedField:
+        value = value.strip()
+        if self.currency is not None:
+            symbol, amount = _CURRENCY_RE.match(value).groups()
+            value = f"{symbol or self.currency}{amount}"
+        return self.name, self.format.format(value), self.confidence
+
+
+@dataclass
+class TableRule:
+    name: str
+    start: Pattern
+    end: Pattern
+    row: Pattern
+    confidence: float = 0.8
+
+
+@dataclass
+class Template:
+    name: str
+    extends: Optional[str] = None
+    keywords: List[str] = field(default_factory=list)
+    min_hits: int = 1
+    fields: List[FieldRule] = field(default_factory=list)
+    tables: List[TableRule] = field(default_factory=list)
+
+
+def _compile_field(spec: dict, template: str) -> FieldRule:
+    try:
+        name, kind = spec["name"], spec.get("type", "regex")
+        flags = _flags(spec.get("flags", "i"))
+        rule = FieldRule(
+            name=name,
+            kind=kind,
+            confidence=float(spec.get("confidence", 0.9)),
+            format=spec.get("format", "{0}"),
+            currency=spec.get("currency"),
+        )
+        if kind == "regex":
+            rule.pattern = re.compile(spec["pattern"], flags)
+            rule.group = int(spec.get("group", 1 if rule.pattern.groups else 0))
+        elif kind == "anchor":
+            anchors = spec["anchor"]
+            anchors = [anchors] if isinstance(anchors, str) else anchors
+            rule.anchors = [tuple(t for t in (_token(w) for w in a.split()) if t) for a in anchors]
+            rule.region = spec.get("region", "right_or_below")
+            if rule.region not in REGIONS:
+                raise TemplateError(f"region must be one of {REGIONS}")
+            rule.max_dx = float(spec.get("max_dx", rule.max_dx))
+            rule.max_dy = float(spec.get("max_dy", rule.max_dy))
+            rule.value = re.compile(spec.get("value", r"\S+"), flags)
+            rule.group = int(spec.get("group", 1 if rule.value.groups else 0))
+        else:
+            raise TemplateError(f"unknown rule type {kind!r}")
+        return rule
+    except (KeyError, re.error, TypeError, ValueError) as e:
+        raise TemplateError(f"Template {template}: invalid rule {spec.get('name', spec)}: {e}") from e
+
+
+def compile_template(spec: dict) -> Template:
+    """Validate and compile one template definition."""
+    name = spec.get("name")
+    if not name:
+        raise TemplateError("Template without a name")
+    vendor = spec.get("vendor") or {}
+    template = Template(
+        name=name,
+        extends=spec.get("extends", None if name == DEFAULT_TEMPLATE else DEFAULT_TEMPLATE),
+        keywords=list(vendor.get("keywords", [])),
+        min_hits=int(vendor.get("min_hits", 1)),
+        fields=[_compile_field(rule, name) for rule in spec.get("fields", [])],
+    )
+    for table in spec.get("tables", []):
+        try:
+            flags = _flags(table.get("flags", "i"))
+            template.tables.append(TableRule(
+                name=table["name"],
+                start=re.compile(table["start"], flags),
+                end=re.compile(table["end"], flags),
+                row=re.compile(table["row"], flags),
+                confidence=float(table.get("confidence", 0.8)),
+            ))
+        except (KeyError, re.error, TypeError, ValueError) as e:
+            raise TemplateError(f"Template {name}: invalid table {table.get('name', table)}: {e}") from e
+    return template
+
+
+# =============================================================================
+# Page index
+# =============================================================================
+
+
+class _IndexedPage:
+    """Words in reading order, grouped into lines, with a token -> positions map."""
+
+    def __init__(self, page: PageText):
+        words = page.words or words_from_text(page.text)
+        self.lines: List[List[Word]] = _group_lines(words)
+        self.words: List[Word] = [w for line in self.lines for w in line]
+        self.line_of: List[int] = [i for i, line in enumerate(self.lines) for _ in line]
+        self.line_text: List[str] = [" ".join(w.text for w in line) for line in self.lines]
+        self.text = page.text
+        self.tokens: List[str] = [_token(w.text) for w in self.words]
+        self.positions: Dict[str, List[int]] = {}
+        for i, token in enumerate(self.tokens):
+            self.positions.setdefault(token, []).append(i)
+
+    def find(self, anchor: Tuple[str, ...]) -> List[Tuple[int, int]]:
+        """(first, last) word index of each occurrence of an anchor phrase on one line."""
+        hits = []
+        n = len(anchor)
+        for i in self.positions.get(anchor[0], ()):
+            end = i + n - 1
+            if end < len(self.words) and self.line_of[end] == self.line_of[i] and all(
+                self.tokens[i + j] == anchor[j] for j in range(1, n)
+            ):
+                hits.append((i, end))
+        return hits
+
+
+def _group_lines(words: Sequence[Word]) -> List[List[Word]]:
+    """Cluster words into lines by vertical centre, each line sorted left to right."""
+    lines: List[List[Word]] = []
+    centre = None
+    for word in sorted(words, key=lambda w: ((w.y0 + w.y1) / 2, w.x0)):
+        mid = (word.y0 + word.y1) / 2
+        height = max(word.y1 - word.y0, 1.0)
+        if lines and abs(mid - centre) <= height / 2:
+            lines[-1].append(word)
+        else:
+            lines.append([word])
+            centre = mid
+    for line in lines:
+        line.sort(key=lambda w: w.x0)
+    return lines
+
+
+# =============================================================================
+# Engine
+# =============================================================================
+
+
+class RuleEngine:
+    """Compiled template set: vendor detection plus field and table rules."""
+
+    def __init__(self, templates: Sequence[Template]):
+        self.templates: Dict[str, Template] = {t.name: t for t in templates}
+        if DEFAULT_TEMPLATE not in self.templates:
+            self.templates[DEFAULT_TEMPLATE] = Template(name=DEFAULT_TEMPLATE)
+
+        # Resolved rule lists: own rules first, then those of the extended templates
+        self._fields: Dict[str, List[FieldRule]] = {}
+        self._tables: Dict[str, List[TableRule]] = {}
+        for name in self.templates:
+            chain = self._chain(name)
+            self._fields[name] = [rule for t in chain for rule in t.fields]
+            tables: Dict[str, TableRule] = {}
+            for t in chain:
+                for table in t.tables:
+                    tables.setdefault(table.name, table)  # own table overrides an inherited one
+            self._tables[name] = list(tables.values())
+
+        # One alternation over all vendor keywords; group name -> template
+        alternatives = []
+        self._keyword_owner: Dict[str, str] = {}
+        for t_index, template in enumerate(self.templates.values()):
+            for k_index, keyword in enumerate(template.keywords):
+                group = f"t{t_index}_{k_index}"
+                self._keyword_owner[group] = template.name
+                alternatives.append(f"(?P<{group}>{re.escape(keyword)})")
+        self._vendor_re = re.compile("|".join(alternatives), re.I) if alternatives else None
+
+    def _chain(self, name: str) -> List[Template]:
+        chain, seen = [], set()
+        while name and name not in seen:
+            template = self.templates.get(name)
+            if template is None:
+                raise TemplateError(f"Template {chain[-1].name} extends unknown template {name}")
+            chain.append(template)
+            seen.add(name)
+            name = template.extends
+        return chain
+
+    @classmethod
+    def from_directory(cls, directory: Path) -> "RuleEngine":
+        templates = []
+        for path in sorted(Path(directory).glob("*.json")):
+            try:
+                spec = json.loads(path.read_text(encoding="utf-8"))
+            except (OSError, json.JSONDecodeError) as e:
+                raise TemplateError(f"Cannot read template {path}: {e}") from e
+            templates.append(compile_template(spec))
+        logger.info(f"Loaded {len(templates)} extraction templates from {directory}")
+        return cls(templates)
+
+    # ------------------------------------------------------------------ #
+
+    def detect_vendor(self, text: str) -> str:
+        """Template whose vendor keywords occur most in `text` (distinct keywords), else "default"."""
+        if self._vendor_re is None or not text:
+            return DEFAULT_TEMPLATE
+        hits: Dict[str, set] = {}
+        for m in self._vendor_re.finditer(text):
+            hits.setdefault(self._keyword_owner[m.lastgroup], set()).add(m.lastgroup)
+        best, best_hits = DEFAULT_TEMPLATE, 0
+        for name, groups in hits.items():
+            if len(groups) >= self.templates[name].min_hits and len(groups) > best_hits:
+                best, best_hits = name, len(groups)
+        return best
+
+    def extract(self, page: PageText, template: str = DEFAULT_TEMPLATE) -> List[ExtractedField]:
+        """Fields of one page with a template's rules."""
+        indexed = _IndexedPage(page)
+        results: List[ExtractedField] = []
+        found = set()
+        for rule in self._fields.get(template, self._fields[DEFAULT_TEMPLATE]):
+            if rule.name in found:
+                continue
+            value = _apply_regex(rule, indexed) if rule.kind == "regex" else _apply_anchor(rule, indexed)
+            if value:
+                results.append(rule.emit(value))
+                found.add(rule.name)
+        for table in self._tables.get(template, ()):
+            results.extend(_apply_table(table, indexed))
+        return results
+
+    def extract_document(self, pages: Sequence[PageText]) -> List[List[ExtractedField]]:
+        """Fields of every page; the vendor template is detected once, from the first page."""
+        if not pages:
+            return []
+        template = self.detect_vendor(pages[0].text)
+        return [self.extract(page, template) for page in pages]
+
+
+def _apply_regex(rule: FieldRule, page: _IndexedPage) -> Optional[str]:
+    m = rule.pattern.search(page.text)
+    return m.group(rule.group) if m else None
+
+
+def _apply_anchor(rule: FieldRule, page: _IndexedPage) -> Optional[str]:
+    for anchor in rule.anchors:
+        for first, last in page.find(anchor):
+            a0, a1 = page.words[first], page.words[last]
+            box = (a0.x0, min(a0.y0, a1.y0), a1.x1, max(a0.y1, a1.y1))
+            if rule.region in ("right", "right_or_below"):
+                value = _match_words(rule, _right_of(page, last, box, rule))
+                if value:
+                    return value
+            if rule.region in ("below", "right_or_below"):
+                for line in _below(page, box, rule):
+                    value = _match_words(rule, line)
+                    if value:
+                        return value
+    return None
+
+
+def _right_of(page: _IndexedPage, last: int, box, rule: FieldRule) -> List[Word]:
+    """Words after the anchor on its line, within max_dx of its right edge."""
+    right = box[2]
+    return [w for w in page.lines[page.line_of[last]] if right - 1 <= w.x0 <= right + rule.max_dx]
+
+
+def _below(page: _IndexedPage, box, rule: FieldRule) -> List[List[Word]]:
+    """
+    Candidates on each following line within max_dy: the phrases (runs of
+    words without a column gap) overlapping the anchor's span, most overlap
+    first, then any phrase starting in the anchor's column (up to max_dx).
+    """
+    left, right, bottom = box[0], box[2], box[3]
+    candidates = []
+    for line in page.lines:
+        top = min(w.y0 for w in line)
+        if top < bottom - 1:
+            continue
+        if top > bottom + rule.max_dy:
+            break
+        phrases = _phrases(line)
+        overlapping = sorted(
+            (p for p in phrases if min(p[-1].x1, right) - max(p[0].x0, left) > 0),
+            key=lambda p: min(p[-1].x1, right) - max(p[0].x0, left),
+            reverse=True,
+        )
+        candidates.extend(overlapping)
+        candidates.extend(
+            p for p in phrases if p not in overlapping and left - 10 <= p[0].x0 <= left + rule.max_dx
+        )
+    return candidates
+
+
+def _phrases(line: List[Word]) -> List[List[Word]]:
+    """Split a line at gaps wider than the text height (column breaks)."""
+    phrases = [[line[0]]]
+    for previous, word in zip(line, line[1:]):
+        if word.x0 - previous.x1 > max(previous.y1 - previous.y0, 1.0):
+            phrases.append([word])
+        else:
+            phrases[-1].append(word)
+    return phrases
+
+
+def _match_words(rule: FieldRule, words: List[Word]) -> Optional[str]:
+    if not words:
+        return None
+    m = rule.value.search(" ".join(w.text for w in words))
+    return m.group(rule.group) if m else None
+
+
+def _apply_table(table: TableRule, page: _IndexedPage) -> List[ExtractedField]:
+    fields: List[ExtractedField] = []
+    inside, row_number = False, 0
+    for line in page.line_text:
+        if not inside:
+            inside = bool(table.start.search(line))
+            continue
+        if table.end.search(line):
+            break
+        m = table.row.search(line)
+        if not m:
+            continue
+        row_number += 1
+        for column, value in m.groupdict().items():
+            if value:
+                fields.append((f"{table.name}[{row_number}].{column}", value.strip(), table.confidence))
+    return fields
+
+
+# =============================================================================
+# Process-wide engine
+# =============================================================================
+
+_engine: Optional[RuleEngine] = None
+_engine_lock = threading.Lock()
+
+
+def get_engine() -> RuleEngine:
+    """The compiled templates of `extraction_templates_dir`, loaded on first use."""
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                _engine = RuleEngine.from_directory(Path(config.extraction_templates_dir))
+    return _engine
@@ -0,0 +1,188 @@
+# watcher/scheduler.py
+"""
+Page-level scheduler backed by a process pool.
+
+Batches are split into page tasks which run in a `ProcessPoolExecutor`
+sized to the CPU count (Tesseract is CPU bound and the GIL would serialize
+any Python-side work in threads).
+
+Fairness: tasks are queued per batch and dispatched round-robin, one page
+per batch in turn, with at most one task in flight per pool process. A
+1-page invoice arriving behind a 40-page statement therefore waits for at
+most one "round" instead of for the whole statement.
+
+Recovery: if a pool process dies (a Tesseract/MuPDF crash, an OOM kill) the
+executor is broken for good. Its in-flight tasks fail with
+`BrokenProcessPool` (so only their batches fail and retry), and a new pool
+with the same initializer takes over for everything dispatched afterwards.
+"""
+
+import logging
+import multiprocessing
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import CancelledError, Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Deque, List, Tuple
+
+from core.config import config
+from watcher.page_worker import init_worker, process_image_page, process_pdf_page
+
+logger = logging.getLogger(__name__)
+
+_Task = Tuple[Future, Callable[..., Any], tuple]
+
+
+class PageScheduler:
+    """
+    Fair, round-robin dispatcher of page tasks onto a process pool.
+    """
+
+    def __init__(self, processes: int = None, threads_per_process: int = None):
+        self.processes = processes or config.ocr_processes
+        self.threads_per_process = threads_per_process or config.ocr_threads_per_process
+
+        self._pool_lock = threading.Lock()
+        self.pool = self._new_pool()
+
+        self._queues: "OrderedDict[int, Deque[_Task]]" = OrderedDict()
+        self._cond = threading.Condition()
+        self._inflight = 0
+        self._shutdown = False
+
+        self._dispatcher = threading.Thread(
+            target=self._dispatch_loop, name="page-scheduler", daemon=True
+        )
+        self._dispatcher.start()
+        logger.info(
+            f"PageScheduler started: {self.processes} processes, "
+            f"OMP_THREAD_LIMIT={self.threads_per_process}"
+        )
+
+    def _new_pool(self) -> ProcessPoolExecutor:
+        return ProcessPoolExecutor(
+            max_workers=self.processes,
+            mp_context=multiprocessing.get_context("spawn"),  # safe with threads in the parent
+            initializer=init_worker,
+            initargs=(self.threads_per_process, config.overrides),
+        )
+
+    def _replace_pool(self, broken: ProcessPoolExecutor) -> ProcessPoolExecutor:
+        """
+        Start a new pool in place of a broken one (once, however many tasks
+        report it). The broken executor has already failed its in-flight
+        tasks and terminated its processes.
+        """
+        with self._pool_lock:
+            if self.pool is broken and not self._shutdown:
+                logger.error("Page pool broken (a worker process died); starting a new one")
+                self.pool = self._new_pool()
+            return self.pool
+
+    # ------------------------------------------------------------------ #
+    # Submission
+    # ------------------------------------------------------------------ #
+
+    def submit(self, batch_id: int, fn: Callable[..., Any], *args: Any) -> Future:
+        """Queue a task for `batch_id`; the returned Future resolves with its result."""
+        future: Future = Future()
+        with self._cond:
+            if self._shutdown:
+                raise RuntimeError("PageScheduler is shut down")
+            self._queues.setdefault(batch_id, deque()).append((future, fn, args))
+            self._cond.notify_all()
+        return future
+
+    def map_pdf_pages(self, batch_id: int, pdf_path: str, page_count: int) -> List[Future]:
+        """Fan out every page of a PDF; futures are returned in page order."""
+        return [
+            self.submit(batch_id, process_pdf_page, batch_id, pdf_path, index, index == page_count - 1)
+            for index in range(page_count)
+        ]
+
+    def submit_image(self, batch_id: int, image_path: str) -> Future:
+        """Queue OCR of a single image file."""
+        return self.submit(batch_id, process_image_page, batch_id, image_path)
+
+    @property
+    def queued(self) -> int:
+        """Number of page tasks waiting for a process."""
+        with self._cond:
+            return sum(len(q) for q in self._queues.values())
+
+    # ------------------------------------------------------------------ #
+    # Dispatch
+    # ------------------------------------------------------------------ #
+
+    def _next_task(self) -> _Task:
+        """Pop one task from the batch at the head of the rotation (lock held)."""
+        batch_id, queue = next(iter(self._queues.items()))
+        task = queue.popleft()
+        if queue:
+            self._queues.move_to_end(batch_id)  # Round-robin: go to the back
+        else:
+            del self._queues[batch_id]
+        return task
+
+    def _dispatch_loop(self) -> None:
+        while True:
+            with self._cond:
+                while not self._shutdown and (
+                    not self._queues or self._inflight >= self.processes
+                ):
+                    self._cond.wait()
+                if self._shutdown:
+                    return
+                future, fn, args = self._next_task()
+                self._inflight += 1
+
+            if not future.set_running_or_notify_cancel():
+                self._task_done()
+                continue
+            pool = self.pool
+            try:
+                try:
+                    pool_future = pool.submit(fn, *args)
+                except BrokenProcessPool:
+                    # Broke before this task was sent, so it never ran: use the new pool
+                    pool = self._replace_pool(pool)
+                    pool_future = pool.submit(fn, *args)
+            except Exception as e:
+                future.set_exception(e)
+                self._task_done()
+                continue
+            pool_future.add_done_callback(
+                lambda pf, f=future, p=pool: self._on_complete(pf, f, p)
+            )
+
+    def _on_complete(self, pool_future: Future, future: Future, pool: ProcessPoolExecutor) -> None:
+        self._task_done()
+        if pool_future.cancelled():
+            future.set_exception(CancelledError())
+            return
+        exc = pool_future.exception()
+        if isinstance(exc, BrokenProcessPool):
+            self._replace_pool(pool)
+        if exc is not None:
+            future.set_exception(exc)
+        else:
+            future.set_result(pool_future.result())
+
+    def _task_done(self) -> None:
+        with self._cond:
+            self._inflight -= 1
+            self._cond.notify_all()
+
+    def shutdown(self, wait: bool = True) -> None:
+        """Stop dispatching, cancel queued tasks and shut down the pool."""
+        with self._cond:
+            self._shutdown = True
+            for queue in self._queues.values():
+                for future, _, _ in queue:
+                    future.cancel()
+            self._queues.clear()
+            self._cond.notify_all()
+        with self._pool_lock:
+            pool = self.pool
+        pool.shutdown(wait=wait)
+
@@ -0,0 +1,151 @@
+# watcher/stability.py
+"""
+Write-completion detection for hot-folder files.
+
+Scanners and network copies create a file first and fill it afterwards, so
+a "created" event does not mean the file is ready. `StabilityTracker` keeps
+such files in a pending set and only hands them on once they are complete:
+
+- immediately, when the writer closes the file (inotify IN_CLOSE_WRITE,
+  watchdog `on_closed`) or it is moved/renamed into place (`on_moved`)
+- otherwise, once size and mtime are unchanged for `stability_checks`
+  consecutive checks, `stability_check_interval` seconds apart (polling
+  observers and platforms without close events)
+
+Checks run on the tracker's own thread and ready files are ingested on a
+small thread pool, so the watchdog observer thread never blocks.
+"""
+
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Callable, Dict, Optional, Set
+
+from core.config import config
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class _Pending:
+    size: int = -1
+    mtime_ns: int = -1
+    stable_count: int = 0
+
+
+class StabilityTracker:
+    """Pending set of files still being written; calls `on_ready(path)` once each is complete."""
+
+    def __init__(
+        self,
+        on_ready: Callable[[str], None],
+        check_interval: Optional[float] = None,
+        required_checks: Optional[int] = None,
+        ingest_threads: Optional[int] = None,
+    ):
+        self.on_ready = on_ready
+        self.check_interval = check_interval or config.stability_check_interval
+        self.required_checks = required_checks or config.stability_checks
+        self._pending: Dict[str, _Pending] = {}
+        self._ingesting: Set[str] = set()  # Close event + stability check may both fire
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._executor = ThreadPoolExecutor(
+            max_workers=ingest_threads or config.ingest_threads,
+            thread_name_prefix="ingest",
+        )
+        self._thread = threading.Thread(target=self._run, name="stability-tracker", daemon=True)
+        self._thread.start()
+
+    # ------------------------------------------------------------------ #
+    # Event side (called from the observer thread; must not block)
+    # ------------------------------------------------------------------ #
+
+    def track(self, path: str) -> None:
+        """Add a file to the pending set, or restart its stability count after a write."""
+        with self._lock:
+            entry = self._pending.get(path)
+            if entry is None:
+                self._pending[path] = _Pending()
+            else:
+                entry.stable_count = 0
+
+    def mark_complete(self, path: str) -> None:
+        """The writer is done with the file (closed or renamed into place): ingest it now."""
+        with self._lock:
+            self._pending.pop(path, None)
+        self._dispatch(path)
+
+    def discard(self, path: str) -> None:
+        """Forget a file (deleted or moved away before it was ingested)."""
+        with self._lock:
+            self._pending.pop(path, None)
+
+    @property
+    def pending(self) -> int:
+        with self._lock:
+            return len(self._pending)
+
+    # ------------------------------------------------------------------ #
+    # Checker thread
+    # ------------------------------------------------------------------ #
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.check_interval):
+            for path in self._check():
+                self._dispatch(path)
+
+    def _check(self) -> list:
+        """One round of size/mtime checks. Returns the paths that became ready."""
+        with self._lock:
+            snapshot = list(self._pending.items())
+
+        ready, gone = [], []
+        for path, entry in snapshot:
+            try:
+                st = os.stat(path)
+            except FileNotFoundError:
+                gone.append(path)
+                continue
+
+            # Empty files are not ready: the writer may not have started yet
+            if st.st_size == entry.size and st.st_mtime_ns == entry.mtime_ns and st.st_size > 0:
+                entry.stable_count += 1
+                if entry.stable_count >= self.required_checks:
+                    ready.append(path)
+            else:
+                entry.size, entry.mtime_ns, entry.stable_count = st.st_size, st.st_mtime_ns, 0
+
+        with self._lock:
+            for path in gone:
+                self._pending.pop(path, None)
+            # A concurrent mark_complete() may already have taken the file
+            ready = [path for path in ready if self._pending.pop(path, None) is not None]
+        return ready
+
+    def _dispatch(self, path: str) -> None:
+        if self._stop.is_set():
+            return
+        with self._lock:
+            if path in self._ingesting:
+                return
+            self._ingesting.add(path)
+        logger.debug(f"File ready: {path}")
+        self._executor.submit(self._ingest, path)
+
+    def _ingest(self, path: str) -> None:
+        try:
+            self.on_ready(path)
+        except Exception as e:
+            logger.error(f"Error ingesting {path}: {e}")
+        finally:
+            with self._lock:
+                self._ingesting.discard(path)
+
+    def shutdown(self, wait: bool = True) -> None:
+        """Stop checking; files already handed to the ingest pool finish if `wait`."""
+        self._stop.set()
+        self._thread.join()
+        self._executor.shutdown(wait=wait)
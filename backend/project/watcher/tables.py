@@ -0,0 +1,385 @@
+# watcher/tables.py
+"""
+Layout-aware line-item extraction from word boxes.
+
+Works on the words of one page (text layer or OCR; stored text gets
+approximate boxes from its layout), with all geometry done as NumPy array
+operations over the whole page:
+
+1. rows:    words sorted by vertical centre; a new row starts wherever the
+            gap to the previous centre exceeds half the typical word height
+2. header:  the first row without numbers naming at least two column kinds
+            ("Description", "Qty", "Unit Price", "Amount", ...). Without
+            one, the longest run of rows ending in a money amount is used
+3. body:    rows after the header up to a Subtotal/Total/VAT row or a
+            vertical gap of more than three word heights
+4. columns: numeric words of the body clustered by overlapping x-extent
+            (works for left- and right-aligned columns); clusters present
+            in no more than half of the numeric rows are dropped. Columns are
+            named after the header word above them, else by position
+            (rightmost amount, then unit price, then quantity)
+5. items:   every body row with a value starts an item; rows with only text
+            (wrapped descriptions) are appended to the item above
+
+`reconcile()` compares the sum of the amounts with the document's
+total_amount (or subtotal) field.
+"""
+
+import re
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from watcher.page_text import PageText, Word, words_from_text
+from watcher.rules import ExtractedField
+
+COLUMNS = ("quantity", "unit_price", "amount")
+
+HEADER_CONFIDENCE = 0.9  # Columns named by a header row
+POSITIONAL_CONFIDENCE = 0.7  # No header: columns named by position
+MISMATCH_PENALTY = 0.6  # quantity x unit price disagrees with the amount
+
+ROW_GAP = 0.5  # New row when the centre moves by more than this x word height
+BODY_GAP = 3.0  # Table ends at a vertical gap of more than this x word height
+COLUMN_TOLERANCE = 2.0  # pt: x-extents closer than this belong to one column
+RECONCILE_TOLERANCE = 0.015  # Rounding slack when comparing sums
+
+# Whole-word numbers: 12, 1.5, 12,500.00, 12.500,00, (45.00), -3, $19.99, 8,750.00€
+_NUMBER_RE = re.compile(
+    r"^\(?[$€£]?-?(?:\d{1,3}(?:[,.']\d{3})+|\d+)(?:[.,]\d{1,4})?[$€£]?\)?$", re.M
+)
+_MONEY_RE = re.compile(r"[.,]\d{2}\)?[$€£]?$", re.M)
+_HEADER_RE = re.compile(
+    r"^\W*(?:"
+    r"(?P<description>description|item|items|product|products|service|services|details|particulars|article)"
+    r"|(?P<quantity>qty|quantity|hours|hrs|units|pcs|menge)"
+    r"|(?P<unit_price>unit|price|rate|each)"
+    r"|(?P<amount>amount|total|net|value|betrag)"
+    r")\W*$",
+    re.I | re.M,
+)
+_STOP_RE = re.compile(
+    r"^(?:sub[\s-]*total|total|grand total|amount due|balance|vat|tax|net total|zwischensumme|summe)\b",
+    re.I | re.M,
+)
+_AMOUNT_CHARS_RE = re.compile(r"[^\d.,()\-]")
+_EU_THOUSANDS_RE = re.compile(r"[1-9]\d{0,2}(?:\.\d{3})+")
+
+
+@dataclass
+class ExtractedLineItem:
+    """One table row; `row_number` is 1-indexed within the page."""
+    row_number: int
+    description: Optional[str]
+    quantity: Optional[float]
+    unit_price: Optional[float]
+    amount: Optional[float]
+    confidence: float
+    coordinates: Optional[Dict[str, float]]
+
+
+def parse_amount(text: str) -> Optional[float]:
+    """
+    Parse a US or European formatted number ("1,234.50", "1.234,50",
+    "$ 45.00", "31,000.00 EUR", "(12.00)"). Returns None if there is no number.
+    """
+    s = _AMOUNT_CHARS_RE.sub("", text)
+    negative = s.startswith("-") or (s.startswith("(") and s.endswith(")"))
+    s = s.strip("()-")
+    if not s or not any(ch.isdigit() for ch in s):
+        return None
+    if "," in s and "." in s:
+        thousands = "," if s.rfind(".") > s.rfind(",") else "."
+        s = s.replace(thousands, "").replace(",", ".")
+    elif "," in s:
+        s = s.replace(",", ".") if re.search(r",\d{1,2}$", s) else s.replace(",", "")
+    elif _EU_THOUSANDS_RE.fullmatch(s):
+        s = s.replace(".", "")
+    try:
+        value = float(s)
+    except ValueError:
+        return None
+    return -value if negative else value
+
+
+def extract_line_items(page: PageText) -> List[ExtractedLineItem]:
+    """Line items of one page, top to bottom (empty if no table is found)."""
+    words = page.words or words_from_text(page.text)
+    if len(words) < 2:
+        return []
+    return _Layout(words).line_items()
+
+
+class _Layout:
+    """Word geometry of one page as arrays, in reading order, with row ids."""
+
+    def __init__(self, words: Sequence[Word]):
+        geometry = np.array([(w.x0, w.y0, w.x1, w.y1, w.confidence) for w in words], dtype=float)
+        centre = (geometry[:, 1] + geometry[:, 3]) / 2
+        self.height = float(np.median(np.maximum(geometry[:, 3] - geometry[:, 1], 1.0)))
+
+        by_centre = np.argsort(centre, kind="stable")
+        row = np.empty(len(words), dtype=np.int64)
+        row[by_centre] = np.concatenate(([0], np.cumsum(np.diff(centre[by_centre]) > ROW_GAP * self.height)))
+        order = np.lexsort((geometry[:, 0], row))
+
+        self.x0, self.y0, self.x1, self.y1, self.conf = geometry[order].T
+        self.row = row[order]
+        self.texts: List[str] = [words[i].text for i in order]
+        self.starts = np.flatnonzero(np.r_[True, self.row[1:] != self.row[:-1]])
+        self.n_rows = len(self.starts)
+        self.row_text = [
+            " ".join(self.texts[s:e]) for s, e in zip(self.starts, np.r_[self.starts[1:], len(self.texts)])
+        ]
+        self.numeric = _matching(_NUMBER_RE, self.texts)
+        self.numeric_per_row = np.bincount(self.row, weights=self.numeric, minlength=self.n_rows)
+
+    # -------------------------------------------------------------------------
+    # Table location
+    # -------------------------------------------------------------------------
+
+    def _header(self) -> Tuple[Optional[int], List[Tuple[str, float, float]]]:
+        """Header row and its (column kind, x0, x1) words."""
+        matches, index = _matches(_HEADER_RE, self.texts)
+        if not matches:
+            return None, []
+        kinds = np.array([list(_HEADER_RE.groupindex).index(m.lastgroup) for m in matches])
+        rows = self.row[index]
+        kinds_per_row = np.zeros((self.n_rows, len(_HEADER_RE.groupindex)), dtype=bool)
+        kinds_per_row[rows, kinds] = True
+        candidates = np.flatnonzero((kinds_per_row.sum(axis=1) >= 2) & (self.numeric_per_row == 0))
+        if not len(candidates):
+            return None, []
+        header = int(candidates[0])
+        words = [
+            (m.lastgroup, float(self.x0[i]), float(self.x1[i]))
+            for m, i, r in zip(matches, index, rows) if r == header
+        ]
+        return header, words
+
+    def _row_bounds(self) -> Tuple[np.ndarray, np.ndarray]:
+        return np.minimum.reduceat(self.y0, self.starts), np.maximum.reduceat(self.y1, self.starts)
+
+    def _body(self, header: Optional[int]) -> Tuple[int, int]:
+        """[first, end) rows of the table body."""
+        top, bottom = self._row_bounds()
+        gap_before = np.r_[0.0, top[1:] - bottom[:-1]] > BODY_GAP * self.height
+        stop = _matching(_STOP_RE, self.row_text) & (self.numeric_per_row <= 1)
+        breaks = stop | gap_before
+
+        if header is not None:
+            first = header + 1
+            if first == self.n_rows or stop[first]:
+                return first, first
+            after = np.flatnonzero(breaks[first + 1:])
+            return first, first + 1 + int(after[0]) if len(after) else self.n_rows
+
+        # No header: longest run of consecutive rows whose rightmost number is a money amount
+        index = np.arange(len(self.texts))
+        rightmost = np.maximum.reduceat(np.where(self.numeric, index, -1), self.starts)
+        money = _matching(_MONEY_RE, self.texts) & self.numeric
+        candidate = (rightmost >= 0) & money[np.maximum(rightmost, 0)] & ~self.numeric[self.starts] & ~stop
+        run_start = candidate & ~np.r_[False, candidate[:-1] & ~gap_before[1:]]
+        run_id = np.cumsum(run_start)
+        lengths = np.bincount(run_id[candidate], minlength=run_id[-1] + 1)
+        best = int(np.argmax(lengths))
+        if lengths[best] < 2:
+            return 0, 0
+        rows = np.flatnonzero(candidate & (run_id == best))
+        return int(rows[0]), int(rows[-1]) + 1
+
+    # -------------------------------------------------------------------------
+    # Columns and items
+    # -------------------------------------------------------------------------
+
+    def line_items(self) -> List[ExtractedLineItem]:
+        header, header_words = self._header()
+        first, end = self._body(header)
+        if end <= first:
+            return []
+
+        in_body = (self.row >= first) & (self.row < end)
+        numbers = np.flatnonzero(in_body & self.numeric)
+        if not len(numbers):
+            return []
+
+        # Columns: numeric words clustered by overlapping x-extent
+        numbers = numbers[np.argsort(self.x0[numbers], kind="stable")]
+        reach = np.maximum.accumulate(self.x1[numbers])
+        cluster = np.r_[0, np.cumsum(self.x0[numbers][1:] > reach[:-1] + COLUMN_TOLERANCE)]
+        cluster_starts = np.flatnonzero(np.r_[True, cluster[1:] != cluster[:-1]])
+        left = np.minimum.reduceat(self.x0[numbers], cluster_starts)
+        right = np.maximum.reduceat(self.x1[numbers], cluster_starts)
+        counts = np.bincount(cluster)
+        keep = counts > 0.5 * len(np.unique(self.row[numbers]))
+        if not keep.any():
+            return []
+
+        texts = [self.texts[i] for i in numbers]
+        values = np.array([parse_amount(t) for t in texts], dtype=float)
+        integer = np.array([not _MONEY_RE.search(t) for t in texts])
+        all_integer = np.bincount(cluster, weights=~integer, minlength=len(counts)) == 0
+        names = _name_columns(left, right, keep, all_integer, header_words)
+
+        # Values matrix: body row x (quantity, unit_price, amount)
+        n_body = end - first
+        matrix = np.full((n_body, len(COLUMNS)), np.nan)
+        column = names[cluster]
+        named = column >= 0
+        matrix[self.row[numbers][named] - first, column[named]] = values[named]
+
+        # Description: text left of the first named column
+        limit = left[names >= 0].min()
+        in_column = np.zeros(len(self.texts), dtype=bool)
+        in_column[numbers[named]] = True
+        description = in_body & ~in_column & (self.x1 <= limit + COLUMN_TOLERANCE)
+
+        has_value = ~np.isnan(matrix).all(axis=1)
+        item_of_row = np.cumsum(has_value) - 1  # Text-only rows continue the item above
+        n_items = int(has_value.sum())
+        if not n_items:
+            return []
+
+        body_words = np.flatnonzero(in_body)
+        word_item = item_of_row[self.row[body_words] - first]
+        assigned = word_item >= 0
+        body_words, word_item = body_words[assigned], word_item[assigned]
+        # Only the item's own columns and description belong to its box
+        used = description[body_words] | in_column[body_words]
+        body_words, word_item = body_words[used], word_item[used]
+
+        word_count = np.bincount(word_item, minlength=n_items)
+        confidence = np.bincount(word_item, weights=self.conf[body_words], minlength=n_items) / np.maximum(word_count, 1)
+        confidence *= HEADER_CONFIDENCE if header is not None else POSITIONAL_CONFIDENCE
+        item_values = matrix[has_value]
+        quantity, unit_price, amount = item_values.T
+        product = quantity * unit_price
+        mismatch = ~np.isnan(product) & ~np.isnan(amount) & (
+            np.abs(product - amount) > np.maximum(0.01, 0.01 * np.abs(amount))
+        )
+        confidence[mismatch] *= MISMATCH_PENALTY
+
+        box = np.full((n_items, 4), np.nan)
+        box[:, 0], box[:, 1] = np.inf, np.inf
+        box[:, 2], box[:, 3] = -np.inf, -np.inf
+        np.minimum.at(box[:, 0], word_item, self.x0[body_words])
+        np.minimum.at(box[:, 1], word_item, self.y0[body_words])
+        np.maximum.at(box[:, 2], word_item, self.x1[body_words])
+        np.maximum.at(box[:, 3], word_item, self.y1[body_words])
+
+        desc_words = body_words[description[body_words]]
+        desc_item = word_item[description[body_words]]
+        split = np.flatnonzero(np.diff(desc_item)) + 1
+        descriptions: Dict[int, str] = {
+            int(item[0]): " ".join(self.texts[i] for i in chunk)
+            for chunk, item in zip(np.split(desc_words, split), np.split(desc_item, split))
+            if len(chunk)
+        }
+
+        items = []
+        for n in range(n_items):
+            x0, y0, x1, y1 = box[n].tolist()
+            items.append(ExtractedLineItem(
+                row_number=n + 1,
+                description=descriptions.get(n),
+                quantity=_value(quantity[n]),
+                unit_price=_value(unit_price[n]),
+                amount=_value(amount[n]),
+                confidence=round(float(confidence[n]), 4),
+                coordinates=Word("", x0, y0, x1, y1).bbox if word_count[n] else None,
+            ))
+        return items
+
+
+def _matches(pattern: re.Pattern, texts: List[str]) -> Tuple[List[re.Match], np.ndarray]:
+    """Matches of a multiline pattern over all texts in one regex pass, and their text index."""
+    offsets = np.cumsum([0] + [len(t) + 1 for t in texts[:-1]])
+    matches = list(pattern.finditer("\n".join(texts)))
+    return matches, np.searchsorted(offsets, [m.start() for m in matches], side="right") - 1
+
+
+def _matching(pattern: re.Pattern, texts: List[str]) -> np.ndarray:
+    """Boolean mask of the texts containing a match."""
+    mask = np.zeros(len(texts), dtype=bool)
+    _, index = _matches(pattern, texts)
+    mask[index] = True
+    return mask
+
+
+def _name_columns(
+    left: np.ndarray,
+    right: np.ndarray,
+    keep: np.ndarray,
+    all_integer: np.ndarray,
+    header_words: List[Tuple[str, float, float]],
+) -> np.ndarray:
+    """COLUMNS index per cluster (-1 = ignored): from the header, then by position."""
+    names = np.full(len(left), -1)
+    kept = np.flatnonzero(keep)
+    header = [(kind, x0, x1) for kind, x0, x1 in header_words if kind in COLUMNS]
+    if header:
+        kind = np.array([COLUMNS.index(k) for k, _, _ in header])
+        h0 = np.array([x0 for _, x0, _ in header])
+        h1 = np.array([x1 for _, _, x1 in header])
+        # Overlap of every kept column with every header word, widened by the tolerance
+        overlap = (
+            np.minimum(right[kept, None], h1[None, :]) - np.maximum(left[kept, None], h0[None, :])
+            + COLUMN_TOLERANCE * 5
+        )
+        best = np.argmax(overlap, axis=1)
+        matched = overlap[np.arange(len(kept)), best] > 0
+        for c, k in zip(kept[matched], kind[best[matched]]):
+            if k not in names:
+                names[c] = k
+
+    # Unnamed columns, right to left: amount, unit price, quantity
+    remaining = [COLUMNS.index(n) for n in ("amount", "unit_price", "quantity") if COLUMNS.index(n) not in names]
+    unnamed = [c for c in kept[::-1] if names[c] < 0]
+    if len(unnamed) == 2 and remaining[:2] == [2, 1] and all_integer[unnamed[1]]:
+        remaining = [2, 0]
+    for c, k in zip(unnamed, remaining):
+        names[c] = k
+    return names
+
+
+def _value(x: float) -> Optional[float]:
+    return None if np.isnan(x) else float(x)
+
+
+# =============================================================================
+# Reconciliation
+# =============================================================================
+
+
+def reconcile(items: Sequence[ExtractedLineItem], fields: Sequence[ExtractedField]) -> Dict[str, Any]:
+    """
+    Compare the sum of the line-item amounts with the document's totals.
+
+    Status: "matched_total" or "matched_subtotal" (within a cent or so),
+    "mismatch", "no_total" (no total field to compare with) or "no_items".
+    """
+    amounts = [item.amount for item in items if item.amount is not None]
+    result: Dict[str, Any] = {"count": len(items), "sum": round(sum(amounts), 2)}
+    if not amounts:
+        result["status"] = "no_items"
+        return result
+
+    found: Dict[str, float] = {}
+    for name, value, _ in fields:
+        if name in ("total_amount", "subtotal") and name not in found:
+            parsed = parse_amount(value)
+            if parsed is not None:
+                found[name] = parsed
+    if not found:
+        result["status"] = "no_total"
+        return result
+
+    for name, status in (("total_amount", "matched_total"), ("subtotal", "matched_subtotal")):
+        if name in found and abs(found[name] - result["sum"]) <= RECONCILE_TOLERANCE:
+            result.update(status=status, expected=found[name], difference=0.0)
+            return result
+
+    expected = found.get("subtotal", found.get("total_amount"))
+    result.update(status="mismatch", expected=expected, difference=round(result["sum"] - expected, 2))
+    return result
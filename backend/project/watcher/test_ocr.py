@@ -0,0 +1,46 @@
+# watcher/test_ocr.py
+"""Single-pass OCR result parsing (no Tesseract binary needed)."""
+
+import pytest
+
+from core.database import ExtractionMethod
+from watcher.ocr import page_text_from_data
+
+# image_to_data rows: a page/block container (conf -1), then words of two
+# lines in paragraph 1 and one line in paragraph 2, plus an empty word
+_DATA = {
+    "text":      ["",  "Invoice", "#42", "Total", "$10.00", " ", "Thanks"],
+    "conf":      [-1,  96,        90,    80,      70,       95,  50],
+    "block_num": [1,   1,         1,     1,       1,        1,   1],
+    "par_num":   [0,   1,         1,     1,       1,        1,   2],
+    "line_num":  [0,   1,         1,     2,       2,        2,   1],
+    "left":      [0,   100,       300,   100,     300,      400, 100],
+    "top":       [0,   50,        50,    90,      90,       90,  200],
+    "width":     [0,   180,       60,    100,     120,      10,  140],
+    "height":    [0,   30,        30,    30,      30,       30,  30],
+}
+
+
+def test_text_rebuilt_in_reading_order():
+    page = page_text_from_data(_DATA)
+    assert page.text == "Invoice #42\nTotal $10.00\n\nThanks"
+    assert [w.text for w in page.words] == ["Invoice", "#42", "Total", "$10.00", "Thanks"]
+    assert page.extraction_method == ExtractionMethod.OCR
+
+
+def test_confidence_is_mean_of_words():
+    page = page_text_from_data(_DATA)
+    assert page.words[0].confidence == pytest.approx(0.96)
+    assert page.confidence == pytest.approx((96 + 90 + 80 + 70 + 50) / 500)
+
+
+def test_boxes_scaled_to_page_units():
+    page = page_text_from_data(_DATA, scale=2.0)
+    word = page.words[0]
+    assert (word.x0, word.y0, word.x1, word.y1) == (50.0, 25.0, 140.0, 40.0)
+    assert page.locate("$10.00") == {"x": 150.0, "y": 45.0, "width": 60.0, "height": 15.0}
+
+
+def test_empty_result():
+    page = page_text_from_data({key: [] for key in _DATA})
+    assert page.text == "" and page.words == [] and page.confidence == 0.0
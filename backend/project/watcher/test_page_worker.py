@@ -0,0 +1,63 @@
+# watcher/test_page_worker.py
+"""Per-process cache of open PDFs in the page pool (text-layer pages, no OCR), task errors."""
+
+import pickle
+
+import fitz  # PyMuPDF
+import pytest
+from pytesseract import TesseractNotFoundError
+
+from core.database import ExtractionMethod
+from watcher import page_worker
+from watcher.page_worker import PageTaskError, process_pdf_page
+
+
+def _write_pdf(path, label: str, pages: int) -> None:
+    doc = fitz.open()
+    for number in range(pages):
+        doc.new_page().insert_text((72, 72), f"{label} page {number}: invoice total due 100.00")
+    doc.save(str(path))
+    doc.close()
+
+
+def test_reused_path_reads_the_new_file(tmp_path):
+    path = tmp_path / "invoice.pdf"
+    _write_pdf(path, "FIRST DOCUMENT", pages=3)
+    first = process_pdf_page(1, str(path), 0)
+    assert first.page_text.extraction_method == ExtractionMethod.TEXT_LAYER
+    assert first.page_text.text.startswith("FIRST DOCUMENT page 0")
+
+    # The first file is archived and a new upload arrives under the same name
+    path.unlink()
+    _write_pdf(path, "SECOND DOCUMENT", pages=1)
+    second = process_pdf_page(2, str(path), 0, last=True)
+    assert second.page_text.text.startswith("SECOND DOCUMENT page 0")
+
+    page_worker.release_documents(1)
+    assert not page_worker._open_documents
+
+
+def test_document_closed_after_last_page(tmp_path):
+    path = tmp_path / "statement.pdf"
+    _write_pdf(path, "STATEMENT", pages=2)
+    process_pdf_page(7, str(path), 0)
+    assert len(page_worker._open_documents) == 1
+    result = process_pdf_page(7, str(path), 1, last=True)
+    assert result.page_number == 2
+    assert not page_worker._open_documents
+
+    path.rename(tmp_path / "archived.pdf")  # Nothing holds the file open
+
+
+def test_errors_cross_the_process_boundary(tmp_path, monkeypatch):
+    def no_tesseract(*args):
+        raise TesseractNotFoundError()  # Cannot be unpickled: would break the pool
+
+    monkeypatch.setattr(page_worker, "_process_pdf_page", no_tesseract)
+    path = tmp_path / "scan.pdf"
+    _write_pdf(path, "SCAN", pages=1)
+    with pytest.raises(PageTaskError) as excinfo:
+        process_pdf_page(3, str(path), 0, last=True)
+    error = pickle.loads(pickle.dumps(excinfo.value))
+    assert str(error).startswith("TesseractNotFoundError: ")
+    assert not page_worker._open_documents
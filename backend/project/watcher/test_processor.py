@@ -0,0 +1,37 @@
+# watcher/test_processor.py
+"""Persisting extraction results: reprocessing replaces the previous run."""
+
+from sqlalchemy import func, select, text
+
+from core.database import Batch, Document, Field, Page
+from watcher.page_text import PageText
+from watcher.page_worker import PageResult
+from watcher.processor import ProcessManager
+
+
+def _persist(db, batch_id, texts):
+    manager = ProcessManager.__new__(ProcessManager)  # No worker threads or pool
+    results = [PageResult(page_number=n, page_text=PageText(text=t)) for n, t in enumerate(texts, 1)]
+    fields = [[("invoice_number", t.split()[-1], 0.9)] for t in texts]
+    manager._persist_document(db, Document(batch_id=batch_id), results, fields, [[] for _ in texts])
+    db.commit()
+
+
+def _count(db, model):
+    return db.scalar(select(func.count()).select_from(model))
+
+
+def test_reprocessing_replaces_documents_and_search_entries(db):
+    batch = Batch(filename="a.pdf", original_path="/hot/a.pdf", file_hash="blake2b:a")
+    other = Batch(filename="b.pdf", original_path="/hot/b.pdf", file_hash="blake2b:b")
+    db.add_all([batch, other])
+    db.commit()
+
+    _persist(db, other.id, ["Invoice B-1"])
+    _persist(db, batch.id, ["Invoice A-1", "Page two A-2"])
+    _persist(db, batch.id, ["Invoice A-1", "Page two A-2"])  # Reprocessed
+
+    assert db.scalar(select(func.count()).where(Document.batch_id == batch.id)) == 1
+    assert (_count(db, Document), _count(db, Page), _count(db, Field)) == (2, 3, 3)
+    indexed = db.execute(text("SELECT batch_id, COUNT(*) FROM search_index GROUP BY batch_id")).all()
+    assert sorted(indexed) == [(batch.id, 2), (other.id, 1)]
@@ -0,0 +1,103 @@
+# watcher/test_reextract.py
+"""Re-extraction diff: changed, removed and unchanged fields; reviewed fields are kept; chunking."""
+
+import pytest
+from sqlalchemy import select
+
+from core import search
+from core.database import Batch, Document, Field, Page, ProcessingStatus
+from watcher.reextract import reextract
+
+_TEXT = "ACME Corp\nInvoice Number: INV-1001\nDate: 2024-03-01\nTotal: $108.00"
+
+
+def _seed(db):
+    batch = Batch(filename="a.pdf", original_path="/hot/a.pdf", file_hash="blake2b:a",
+                  status=ProcessingStatus.COMPLETED)
+    db.add(batch)
+    db.flush()
+    document = Document(batch_id=batch.id)
+    db.add(document)
+    db.flush()
+    page = Page(document_id=document.id, page_number=1, original_text=_TEXT, processed_text=_TEXT)
+    db.add(page)
+    db.flush()
+    db.add_all([
+        Field(page_id=page.id, name="invoice_number", value="INV-10", confidence=0.5),  # Old rules
+        Field(page_id=page.id, name="date", value="2024-03-01", confidence=0.5,
+              coordinates={"x": 1.0, "y": 2.0, "width": 3.0, "height": 4.0}),
+        Field(page_id=page.id, name="total_amount", value="$1.08", confidence=0.5,
+              validation_status="corrected", corrected_value="$108.00"),
+        Field(page_id=page.id, name="po_number", value="PO-7", confidence=0.5),  # No longer found
+    ])
+    search.index_pages(db, [{"page_id": page.id, "batch_id": batch.id, "content": _TEXT,
+                             "fields": "invoice_number: INV-10"}])
+    db.commit()
+    return page.id
+
+
+def _fields(db, page_id):
+    db.expire_all()
+    return {f.name: f for f in db.scalars(select(Field).where(Field.page_id == page_id))}
+
+
+def test_dry_run_reports_without_writing(db):
+    page_id = _seed(db)
+    report = reextract(dry_run=True, processes=1).as_dict()
+
+    assert report["pages"] == 1 and report["pages_changed"] == 1
+    assert report["fields"] == {"unchanged": 1, "added": 0, "removed": 1, "changed": 1, "reviewed_kept": 1}
+    changes = {c["field"]: (c["change"], c["old"], c["new"]) for c in report["changes"]}
+    assert changes == {
+        "invoice_number": ("changed", "INV-10", "INV-1001"),
+        "po_number": ("removed", "PO-7", None),
+    }
+    assert _fields(db, page_id)["invoice_number"].value == "INV-10"
+
+
+def test_apply_keeps_reviewed_and_unchanged_rows(db):
+    page_id = _seed(db)
+    before = _fields(db, page_id)
+    reextract(processes=1)
+    after = _fields(db, page_id)
+
+    assert set(after) == {"invoice_number", "date", "total_amount"}
+    assert after["invoice_number"].value == "INV-1001"
+    assert after["date"].id == before["date"].id  # Same row: coordinates survive
+    assert after["date"].coordinates["width"] == 3.0 and after["date"].confidence == 0.92
+    reviewed = after["total_amount"]
+    assert (reviewed.id, reviewed.value, reviewed.corrected_value) == (before["total_amount"].id, "$1.08", "$108.00")
+
+    index = search.search_index
+    indexed = db.scalar(select(index.c.fields).where(index.c.page_id == page_id))
+    assert "invoice_number: INV-1001" in indexed and "po_number" not in indexed
+
+    assert reextract(processes=1).pages_changed == 0  # Idempotent
+
+
+_ACME_PAGES = [
+    "Acme Solutions GmbH\nVAT ID: DE312457890\nInvoice No: INV-2024-000123",
+    "Acme Solutions GmbH\nTotal Amount Due 1,190.00\nIBAN: DE89 3704 0044 0532 0130 00",
+]
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 3, 10])
+def test_documents_are_not_split_across_chunks(db, chunk_size):
+    for n, texts in enumerate([["Invoice No: INV-1001"], _ACME_PAGES, ["Invoice No: INV-1002"]]):
+        batch = Batch(filename=f"{n}.pdf", original_path=f"/hot/{n}.pdf", file_hash=f"blake2b:{n}",
+                      status=ProcessingStatus.COMPLETED)
+        db.add(batch)
+        db.flush()
+        document = Document(batch_id=batch.id)
+        db.add(document)
+        db.flush()
+        db.add_all(Page(document_id=document.id, page_number=number, processed_text=text)
+                   for number, text in enumerate(texts, 1))
+    db.commit()
+
+    report = reextract(chunk_size=chunk_size, processes=1)
+    assert report.pages == 4
+    second_page = db.scalar(select(Page).where(Page.processed_text == _ACME_PAGES[1]))
+    fields = {f.name: f.value for f in _fields(db, second_page.id).values()}
+    assert fields["iban"] == "DE89 3704 0044 0532 0130 00"  # Acme template, detected on page 1
+    assert fields["total_amount"] == "1,190.00 EUR"
@@ -0,0 +1,108 @@
+# watcher/test_rules.py
+"""Template rule engine: anchors, vendor detection, inheritance, amounts and tables."""
+
+import pytest
+
+from watcher.page_text import PageText, Word
+from watcher.rules import RuleEngine, TemplateError, compile_template
+
+_DEFAULT = {
+    "name": "default",
+    "fields": [
+        {"name": "invoice_number", "type": "anchor", "anchor": ["Invoice No"], "region": "right",
+         "value": "\\b([A-Z]+-\\d+)\\b"},
+        {"name": "date", "type": "anchor", "anchor": ["Date"], "region": "below", "max_dy": 30,
+         "value": "(\\d{4}-\\d{2}-\\d{2})"},
+        {"name": "total_amount", "type": "regex", "pattern": "total[:\\s]*([$€£]?\\s?[\\d,]+\\.\\d{2})",
+         "currency": "$"},
+    ],
+}
+_ACME = {
+    "name": "acme",
+    "vendor": {"keywords": ["Acme Solutions", "DE312457890"], "min_hits": 2},
+    "fields": [
+        {"name": "total_amount", "type": "regex", "pattern": "total[:\\s]*(\\d+\\.\\d{2})", "format": "{0} EUR"},
+    ],
+    "tables": [
+        {"name": "line_items", "start": "^Description\\b", "end": "^Total\\b",
+         "row": "^(?P<description>.+?)\\s+(?P<amount>\\d+\\.\\d{2})$"},
+    ],
+}
+_GLOBEX = {"name": "globex", "vendor": {"keywords": ["Globex"]}}
+
+
+@pytest.fixture
+def engine():
+    return RuleEngine([compile_template(spec) for spec in (_DEFAULT, _ACME, _GLOBEX)])
+
+
+def _words(*rows):
+    """Word boxes from (text, x0, y0) tuples, 10pt high, 6pt per character."""
+    return [Word(text=t, x0=x, y0=y, x1=x + 6 * len(t), y1=y + 10) for t, x, y in rows]
+
+
+def _fields(results):
+    return {name: value for name, value, _ in results}
+
+
+def test_anchor_right_on_the_same_line(engine):
+    page = PageText(text="", words=_words(
+        ("Invoice", 50, 100), ("No:", 100, 101), ("INV-42", 130, 99),  # Slightly uneven baseline
+        ("Other", 50, 140), ("ABC-7", 130, 140),
+    ))
+    assert _fields(engine.extract(page))["invoice_number"] == "INV-42"
+
+
+def test_anchor_right_respects_max_dx(engine):
+    page = PageText(text="", words=_words(("Invoice", 50, 100), ("No", 100, 100), ("INV-42", 400, 100)))
+    assert "invoice_number" not in _fields(engine.extract(page))
+
+
+def test_anchor_below_prefers_the_anchor_column(engine):
+    page = PageText(text="", words=_words(
+        ("Ship", 50, 100), ("Date", 300, 100),
+        ("1999-01-01", 50, 115), ("2024-03-01", 290, 115),
+    ))
+    assert _fields(engine.extract(page))["date"] == "2024-03-01"
+
+
+def test_anchors_on_text_without_word_boxes(engine):
+    text = "Invoice No: INV-1001\nDate\n2024-03-01"
+    assert _fields(engine.extract(PageText(text=text))) == {"invoice_number": "INV-1001", "date": "2024-03-01"}
+
+
+def test_vendor_detection_needs_min_hits(engine):
+    assert engine.detect_vendor("ACME SOLUTIONS GmbH, VAT DE312457890") == "acme"
+    assert engine.detect_vendor("Acme Solutions, Acme Solutions") == "default"  # Distinct keywords count
+    assert engine.detect_vendor("Globex Corporation") == "globex"
+    assert engine.detect_vendor("") == "default"
+
+
+def test_vendor_rules_come_before_inherited_ones(engine):
+    text = "Acme Solutions DE312457890\nInvoice No: INV-9\nDescription Amount\nWidget 10.00\nGadget 5.50\nTotal 15.50"
+    (fields,) = engine.extract_document([PageText(text=text)])
+    assert _fields(fields) == {
+        "total_amount": "15.50 EUR",
+        "invoice_number": "INV-9",  # From the default template
+        "line_items[1].description": "Widget", "line_items[1].amount": "10.00",
+        "line_items[2].description": "Gadget", "line_items[2].amount": "5.50",
+    }
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("Total: $108.00", "$108.00"),
+    ("Total: 108.00", "$108.00"),  # As extract_basic_fields writes it
+    ("Total: $ 1,208.50", "$1,208.50"),
+    ("Total: €99.90", "€99.90"),
+])
+def test_amounts_keep_a_currency_symbol(engine, text, expected):
+    assert _fields(engine.extract(PageText(text=text)))["total_amount"] == expected
+
+
+def test_invalid_templates_are_rejected():
+    with pytest.raises(TemplateError):
+        compile_template({"name": "bad", "fields": [{"name": "x", "type": "anchor", "anchor": "A", "region": "left"}]})
+    with pytest.raises(TemplateError):
+        compile_template({"name": "bad", "fields": [{"name": "x", "pattern": "("}]})
+    with pytest.raises(TemplateError):
+        RuleEngine([compile_template({"name": "orphan", "extends": "missing"})])
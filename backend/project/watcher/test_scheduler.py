@@ -0,0 +1,42 @@
+# watcher/test_scheduler.py
+"""Page scheduler: a pool process dying fails only its tasks, then a new pool takes over."""
+
+import os
+from concurrent.futures.process import BrokenProcessPool
+
+import fitz  # PyMuPDF
+import pytest
+
+from core.database import ExtractionMethod
+from watcher.scheduler import PageScheduler
+
+
+def _crash(code: int) -> None:
+    os._exit(code)  # As a segfault or an OOM kill would: no exception, no cleanup
+
+
+@pytest.fixture
+def scheduler():
+    scheduler = PageScheduler(processes=2, threads_per_process=1)
+    try:
+        yield scheduler
+    finally:
+        scheduler.shutdown()
+
+
+def test_next_batch_processes_after_a_worker_dies(scheduler, tmp_path):
+    broken = scheduler.pool
+    with pytest.raises(BrokenProcessPool):
+        scheduler.submit(1, _crash, 1).result(timeout=120)
+
+    path = tmp_path / "invoice.pdf"
+    doc = fitz.open()
+    for number in range(2):
+        doc.new_page().insert_text((72, 72), f"NEXT BATCH page {number}: invoice total due 100.00")
+    doc.save(str(path))
+    doc.close()
+
+    results = [f.result(timeout=120) for f in scheduler.map_pdf_pages(2, str(path), 2)]
+    assert [r.page_number for r in results] == [1, 2]
+    assert results[0].page_text.extraction_method == ExtractionMethod.TEXT_LAYER
+    assert scheduler.pool is not broken
@@ -0,0 +1,94 @@
+# watcher/test_tables.py
+"""Line-item tables from word boxes: amounts, header and positional columns, reconciliation."""
+
+import pytest
+
+from watcher.page_text import PageText
+from watcher.tables import (
+    HEADER_CONFIDENCE, MISMATCH_PENALTY, ExtractedLineItem, extract_line_items, parse_amount, reconcile,
+)
+
+_INVOICE = """\
+ACME Corp                                   Invoice INV-1001
+
+Description                 Qty      Unit Price        Amount
+Consulting services           10          95.00        950.00
+Travel expenses,               1         120.50        120.50
+  Berlin workshop
+Hardware                       2       1,000.00      2,000.00
+
+Subtotal                                             3,070.50
+Total                                                3,653.90
+"""
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("1,234.50", 1234.5),
+    ("1.234,50", 1234.5),
+    ("$ 45.00", 45.0),
+    ("31,000.00 EUR", 31000.0),
+    ("(12.00)", -12.0),
+    ("-3", -3.0),
+    ("12,5", 12.5),
+    ("12,500", 12500.0),
+    ("1.250", 1250.0),
+    ("8,750.00€", 8750.0),
+    ("n/a", None),
+    ("", None),
+])
+def test_parse_amount(text, expected):
+    assert parse_amount(text) == expected
+
+
+def test_header_columns_and_wrapped_descriptions():
+    items = extract_line_items(PageText(text=_INVOICE))
+    assert [(i.row_number, i.description, i.quantity, i.unit_price, i.amount) for i in items] == [
+        (1, "Consulting services", 10.0, 95.0, 950.0),
+        (2, "Travel expenses, Berlin workshop", 1.0, 120.5, 120.5),
+        (3, "Hardware", 2.0, 1000.0, 2000.0),
+    ]
+    assert all(i.confidence == pytest.approx(HEADER_CONFIDENCE) for i in items)
+    assert items[1].coordinates["height"] > items[0].coordinates["height"]  # Spans the wrapped line
+
+
+def test_columns_by_position_without_a_header():
+    text = "Widget A     2     5.00     10.00\nWidget B     1     7.25      7.25\nThank you for your order\n"
+    items = extract_line_items(PageText(text=text))
+    assert [(i.description, i.quantity, i.unit_price, i.amount) for i in items] == [
+        ("Widget A", 2.0, 5.0, 10.0),
+        ("Widget B", 1.0, 7.25, 7.25),
+    ]
+    assert all(i.confidence < HEADER_CONFIDENCE for i in items)
+
+
+def test_quantity_times_price_mismatch_lowers_confidence():
+    text = _INVOICE.replace("950.00", "960.00")
+    first, second, _ = extract_line_items(PageText(text=text))
+    assert first.confidence == pytest.approx(second.confidence * MISMATCH_PENALTY)
+
+
+def test_no_table():
+    assert extract_line_items(PageText(text="Dear customer,\nthank you for your business.")) == []
+    assert extract_line_items(PageText(text="")) == []
+
+
+def _items(*amounts):
+    return [ExtractedLineItem(n, f"Item {n}", None, None, a, 0.9, None) for n, a in enumerate(amounts, 1)]
+
+
+@pytest.mark.parametrize("fields, status, expected", [
+    ([("total_amount", "$3,070.50", 0.9)], "matched_total", 3070.5),
+    ([("total_amount", "$3,653.90", 0.9), ("subtotal", "$3,070.50", 0.9)], "matched_subtotal", 3070.5),
+    ([("total_amount", "$3,000.00", 0.9)], "mismatch", 3000.0),
+    ([("invoice_number", "INV-1001", 0.9)], "no_total", None),
+])
+def test_reconcile(fields, status, expected):
+    result = reconcile(_items(950.0, 120.5, 2000.0), fields)
+    assert result["status"] == status and result["sum"] == 3070.5
+    assert result.get("expected") == expected
+    if status == "mismatch":
+        assert result["difference"] == 70.5
+
+
+def test_reconcile_without_amounts():
+    assert reconcile(_items(None), [("total_amount", "$10.00", 0.9)]) == {"count": 1, "sum": 0, "status": "no_items"}
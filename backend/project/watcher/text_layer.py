@@ -0,0 +1,115 @@
+# watcher/text_layer.py
+"""
+Text-layer-first extraction for PDF pages.
+
+Most vendor invoices are born-digital PDFs whose embedded text PyMuPDF can
+return in about a millisecond, while rendering + Tesseract costs seconds.
+This module decides, per page, whether the embedded text is good enough to
+use directly, and if so returns it as a `PageText` with word coordinates.
+
+A text layer is considered usable when:
+- it has at least `text_layer_min_chars` non-whitespace characters
+- at most `text_layer_max_garbage_ratio` of them are unmapped glyphs
+  (U+FFFD, private-use or control characters from broken font encodings)
+- if the page is dominated by a raster image (a scan), the words must also
+  cover at least `text_layer_min_glyph_coverage` of the page area; this
+  rejects scans that only carry a small header/stamp as real text
+"""
+
+import logging
+import unicodedata
+from dataclasses import dataclass
+from typing import Optional, Tuple
+
+import fitz  # PyMuPDF
+
+from core.config import config
+from core.database import ExtractionMethod
+from watcher.page_text import PageText, Word
+
+logger = logging.getLogger(__name__)
+
+# A page whose images cover at least this fraction of its area is treated as a scan
+SCANNED_IMAGE_COVERAGE = 0.5
+
+
+@dataclass
+class TextLayerStats:
+    """Measurements used to decide whether a text layer is usable."""
+    char_count: int
+    garbage_ratio: float
+    glyph_coverage: float  # word bbox area / page area
+    image_coverage: float  # image bbox area / page area
+
+    @property
+    def is_usable(self) -> bool:
+        if self.char_count < config.text_layer_min_chars:
+            return False
+        if self.garbage_ratio > config.text_layer_max_garbage_ratio:
+            return False
+        if (
+            self.image_coverage >= SCANNED_IMAGE_COVERAGE
+            and self.glyph_coverage < config.text_layer_min_glyph_coverage
+        ):
+            return False
+        return True
+
+
+def _is_garbage(ch: str) -> bool:
+    if ch == "\ufffd":
+        return True
+    category = unicodedata.category(ch)
+    return category in ("Co", "Cn") or (category == "Cc" and ch not in "\t\n\r")
+
+
+def _area(rect: fitz.Rect) -> float:
+    return max(0.0, rect.width) * max(0.0, rect.height)
+
+
+def analyze_text_layer(page: fitz.Page) -> Tuple[PageText, TextLayerStats]:
+    """Read the embedded text of a page and measure its quality."""
+    raw_words = page.get_text("words", sort=True)
+    text = page.get_text("text", sort=True)
+
+    words = [Word(text=w[4], x0=w[0], y0=w[1], x1=w[2], y1=w[3]) for w in raw_words]
+
+    chars = [ch for ch in text if not ch.isspace()]
+    garbage = sum(1 for ch in chars if _is_garbage(ch))
+
+    page_rect = page.rect
+    page_area = _area(page_rect) or 1.0
+    glyph_area = sum((w.x1 - w.x0) * (w.y1 - w.y0) for w in words)
+    image_area = 0.0
+    for info in page.get_image_info():
+        image_area += _area(fitz.Rect(info["bbox"]) & page_rect)
+
+    stats = TextLayerStats(
+        char_count=len(chars),
+        garbage_ratio=garbage / len(chars) if chars else 1.0,
+        glyph_coverage=min(1.0, glyph_area / page_area),
+        image_coverage=min(1.0, image_area / page_area),
+    )
+    page_text = PageText(
+        text=text.strip(),
+        words=words,
+        confidence=1.0 - stats.garbage_ratio if chars else 0.0,
+        extraction_method=ExtractionMethod.TEXT_LAYER,
+    )
+    return page_text, stats
+
+
+def extract_text_layer(page: fitz.Page) -> Optional[PageText]:
+    """
+    Return the page's embedded text if it is usable, otherwise None
+    (the caller should then fall back to render + OCR).
+    """
+    try:
+        page_text, stats = analyze_text_layer(page)
+    except Exception as e:
+        logger.warning(f"Failed to read text layer of page {page.number + 1}: {e}")
+        return None
+
+    if not stats.is_usable:
+        logger.debug(f"Page {page.number + 1}: text layer rejected ({stats})")
+        return None
+    return page_text
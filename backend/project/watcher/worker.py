@@ -0,0 +1,78 @@
+"""
+watcher/worker.py
+
+Standalone processing worker.
+
+Consumes the durable job queue (core/queue.py) and runs OCR/extraction,
+independently of the watcher. Any number of worker processes, on any number
+of machines sharing the database, can run at once: jobs are claimed
+atomically, so each batch is processed by exactly one worker.
+
+Usage (from the project root):
+    python -m watcher.worker                 # parallel_workers batch threads
+    python -m watcher.worker --workers 8     # override thread count
+    python -m watcher.worker --metrics-port 9102
+
+Run the watcher with "embedded_workers": false to make it a thin ingest
+process and scale OCR capacity by starting more of these.
+"""
+
+import argparse
+import logging
+import signal
+import threading
+from pathlib import Path
+
+from core import metrics
+from core.config import config
+from core.database import init_db
+from watcher.processor import ProcessManager
+
+logging.basicConfig(
+    level=getattr(logging, config.log_level),
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    handlers=[
+        logging.FileHandler(Path("logs") / "worker.log"),
+        logging.StreamHandler()
+    ]
+)
+logger = logging.getLogger(__name__)
+
+
+def run(workers: int = None, metrics_port: int = None) -> None:
+    """Start consuming jobs and block until SIGINT/SIGTERM."""
+    stop = threading.Event()
+
+    def _request_stop(signum, frame):
+        logger.info(f"Received signal {signum}, stopping worker...")
+        stop.set()
+
+    signal.signal(signal.SIGINT, _request_stop)
+    signal.signal(signal.SIGTERM, _request_stop)
+
+    metrics.start_http_server(config.metrics_port if metrics_port is None else metrics_port)
+    manager = ProcessManager(max_workers=workers)
+    logger.info(f"Worker {manager.worker_id} consuming jobs from {config.database_url}")
+    try:
+        while not stop.wait(1):
+            pass
+    finally:
+        # In-flight jobs finish; anything left over is picked up by other workers
+        manager.shutdown(wait=True)
+        logger.info("Worker stopped")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Invoice processing worker")
+    parser.add_argument(
+        "--workers", type=int, default=None,
+        help="Concurrent batches in this process (default: parallel_workers)",
+    )
+    parser.add_argument(
+        "--metrics-port", type=int, default=None,
+        help="Port for /metrics (default: metrics_port; 0 disables)",
+    )
+    args = parser.parse_args()
+
+    init_db()
+    run(args.workers, args.metrics_port)